@@ -0,0 +1,127 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from clip_format import FORMATS
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def discover_jobs(input_dir, output_dir, fmt='raw', force=False):
+    """
+    Walk input_dir for convertible media. Outputs mirror the source tree under output_dir.
+    Returns (jobs, skipped, conflicts) where each job is (kind, source, output_dir, output_name, fmt)
+    and conflicts lists (output, sources) for outputs more than one source would write, e.g.
+    clip.mp4 and clip.mov. Those sources are neither converted nor skipped.
+    """
+    candidates = {}
+    for root, _, files in os.walk(input_dir):
+        for filename in sorted(files):
+            stem, extension = os.path.splitext(filename)
+            extension = extension.lower()
+            if extension in VIDEO_EXTENSIONS:
+                kind, output_extension = 'video', FORMATS[fmt][0]
+            elif extension in IMAGE_EXTENSIONS:
+                kind, output_extension = 'image', '.bin'
+            else:
+                continue
+
+            source = os.path.join(root, filename)
+            target_dir = os.path.join(output_dir, os.path.relpath(root, input_dir))
+            output = os.path.join(target_dir, stem + output_extension)
+            candidates.setdefault(output, []).append((kind, source, target_dir, stem, fmt))
+
+    jobs = []
+    skipped = []
+    conflicts = []
+    for output, sources in candidates.items():
+        if len(sources) > 1:
+            conflicts.append((output, [job[1] for job in sources]))
+            continue
+        job = sources[0]
+        # Up to date if the output is newer than its source
+        if not force and os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(job[1]):
+            skipped.append(job[1])
+            continue
+        jobs.append(job)
+    return jobs, skipped, conflicts
+
+
+def _init_worker():
+    # One OpenCV thread per process, the pool already uses every core
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def run_job(job):
+    """Convert one file in a worker process, returns (source, seconds, error)."""
+    kind, source, output_dir, output_name, fmt = job
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        # The converters print per-frame progress, keep it out of the aggregate output
+        with contextlib.redirect_stdout(log):
+            if kind == 'video':
+                from video_converter import convert_video
+                convert_video(source, output_name, fmt, output_dir)
+                output = os.path.join(output_dir, output_name + FORMATS[fmt][0])
+            else:
+                from convert_png import convert_png_to_bin
+                os.makedirs(output_dir, exist_ok=True)
+                output = os.path.join(output_dir, output_name + '.bin')
+                convert_png_to_bin(source, output)
+        if not os.path.exists(output):
+            return source, time.perf_counter() - start, log.getvalue().strip() or 'no output written'
+    except Exception as e:
+        return source, time.perf_counter() - start, str(e)
+    return source, time.perf_counter() - start, None
+
+
+def batch_convert(input_dir, output_dir=None, fmt='raw', workers=None, force=False):
+    output_dir = output_dir or input_dir
+    jobs, skipped, conflicts = discover_jobs(input_dir, output_dir, fmt, force)
+    conflicting = [source for _, sources in conflicts for source in sources]
+    print(f"Found {len(jobs) + len(skipped) + len(conflicting)} media files, {len(skipped)} up to date, "
+          f"{len(jobs)} to convert")
+    failed = []
+    for output, sources in conflicts:
+        print(f"Error: {', '.join(os.path.relpath(source, input_dir) for source in sources)} "
+              f"would all write {os.path.relpath(output, output_dir)}, rename all but one")
+        failed.extend(sources)
+    if not jobs:
+        return failed
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            source, seconds, error = future.result()
+            elapsed = time.perf_counter() - start
+            eta = elapsed / done * (len(jobs) - done)
+            status = f"FAILED: {error}" if error else f"{seconds:.1f}s"
+            print(f"[{done}/{len(jobs)}] {os.path.relpath(source, input_dir)} {status} "
+                  f"(elapsed {elapsed:.0f}s, ETA {eta:.0f}s)")
+            if error:
+                failed.append(source)
+
+    converted = len(jobs) - (len(failed) - len(conflicting))
+    print(f"\nBatch complete: {converted} converted, {len(failed)} failed, "
+          f"{len(skipped)} skipped in {time.perf_counter() - start:.1f}s")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert every video and image under a folder using all CPU cores')
+    parser.add_argument('input', nargs='?', default='../media', help='Folder to scan recursively')
+    parser.add_argument('--output', help='Output folder (default: next to the sources)', default=None)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='raw', help='Video output format')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Convert even when the output is up to date')
+    args = parser.parse_args()
+
+    failed = batch_convert(args.input, args.output, args.format, args.workers, args.force)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,303 @@
+import argparse
+import os
+import struct
+import tempfile
+import time
+import numpy as np
+
+# Compressed clip container (.rle), little-endian:
+#
+#   header   magic b'LEDC', version u16, flags u16, width u16, height u16,
+#            fps * 100 u32, frame_count u32, index_offset u64
+#   frames   encoded frame data, back to back
+#   index    frame_count entries of (offset u64, size u32, encoding u8, 3 pad bytes)
+#
+# The index is written after the frames so encoding can stream, the header points at it.
+#
+# Frame encodings:
+#   ENCODING_RAW      width * height * 3 RGB bytes, same as a .bin frame
+#   ENCODING_RLE      tokens: control byte c, if c & 0x80 a run of (c & 0x7F) + 1 black pixels,
+#                     otherwise c + 1 literal RGB pixels follow
+#   ENCODING_PALETTE  palette size - 1 (u8), palette RGB bytes, then the RLE tokens with one
+#                     palette index per literal pixel instead of three bytes
+MAGIC = b'LEDC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHHIIQ')
+INDEX_ENTRY = struct.Struct('<QIB3x')
+
+ENCODING_RAW = 0
+ENCODING_RLE = 1
+ENCODING_PALETTE = 2
+
+MAX_RUN = 128
+WIDTH, HEIGHT = 40, 96
+
+
+def _runs(black):
+    """Split a per-pixel black mask into (is_black, start, length) runs of at most MAX_RUN pixels."""
+    edges = np.flatnonzero(black[1:] != black[:-1]) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [len(black)]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        is_black = bool(black[start])
+        for chunk in range(start, end, MAX_RUN):
+            yield is_black, chunk, min(MAX_RUN, end - chunk)
+
+
+def encode_rle(pixels, black):
+    out = bytearray()
+    for is_black, start, length in _runs(black):
+        if is_black:
+            out.append(0x80 | (length - 1))
+        else:
+            out.append(length - 1)
+            out += pixels[start:start + length].tobytes()
+    return bytes(out)
+
+
+def encode_palette(pixels, black, max_colors=256):
+    colors, inverse = np.unique(pixels[~black], axis=0, return_inverse=True)
+    if len(colors) == 0 or len(colors) > max_colors:
+        return None
+    indices = np.zeros(len(pixels), dtype=np.uint8)
+    indices[~black] = inverse.ravel()
+
+    out = bytearray([len(colors) - 1])
+    out += colors.astype(np.uint8).tobytes()
+    for is_black, start, length in _runs(black):
+        if is_black:
+            out.append(0x80 | (length - 1))
+        else:
+            out.append(length - 1)
+            out += indices[start:start + length].tobytes()
+    return bytes(out)
+
+
+def encode_frame(frame, palette=True):
+    """Pick the smallest encoding for one (height, width, 3) uint8 frame, returns (encoding, data)."""
+    pixels = np.ascontiguousarray(frame).reshape(-1, 3)
+    black = ~pixels.any(axis=1)
+
+    best = (ENCODING_RAW, pixels.tobytes())
+    candidates = [(ENCODING_RLE, encode_rle(pixels, black))]
+    if palette:
+        candidates.append((ENCODING_PALETTE, encode_palette(pixels, black)))
+    for encoding, data in candidates:
+        if data is not None and len(data) < len(best[1]):
+            best = (encoding, data)
+    return best
+
+
+def decode_frame(encoding, data, width=WIDTH, height=HEIGHT, out=None):
+    """Decode one frame into `out` (allocated if None), returns the (height, width, 3) array."""
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+    if encoding == ENCODING_RAW:
+        out.reshape(-1)[:] = np.frombuffer(data, dtype=np.uint8)
+        return out
+
+    pixels = out.reshape(-1, 3)
+    pos = 0
+    if encoding == ENCODING_PALETTE:
+        num_colors = data[0] + 1
+        palette = np.frombuffer(data, dtype=np.uint8, count=num_colors * 3, offset=1).reshape(-1, 3)
+        pos = 1 + num_colors * 3
+        pixel_bytes = 1
+    elif encoding == ENCODING_RLE:
+        pixel_bytes = 3
+    else:
+        raise ValueError(f"Unknown frame encoding: {encoding}")
+
+    pixel = 0
+    end = len(data)
+    while pos < end:
+        control = data[pos]
+        pos += 1
+        length = (control & 0x7F) + 1
+        if control & 0x80:
+            pixels[pixel:pixel + length] = 0
+        else:
+            literal = np.frombuffer(data, dtype=np.uint8, count=length * pixel_bytes, offset=pos)
+            if pixel_bytes == 1:
+                pixels[pixel:pixel + length] = palette[literal]
+            else:
+                pixels[pixel:pixel + length] = literal.reshape(-1, 3)
+            pos += length * pixel_bytes
+        pixel += length
+    return out
+
+
+class ClipWriter:
+    """Streams frames into an .rle container, the index is appended on close()"""
+
+    def __init__(self, filename, fps=30, width=WIDTH, height=HEIGHT, palette=True):
+        self.file = open(filename, 'wb')
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.index = []
+        self.file.write(bytes(HEADER.size))  # Placeholder until the index offset is known
+
+    def write(self, frame):
+        frame = np.asarray(frame, dtype=np.uint8).reshape(self.height, self.width, 3)
+        encoding, data = encode_frame(frame, self.palette)
+        self.index.append((self.file.tell(), len(data), encoding))
+        self.file.write(data)
+
+    def close(self):
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, self.width, self.height,
+                                    int(round(self.fps * 100)), len(self.index), index_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawWriter:
+    """Plain .bin output with the same interface as ClipWriter"""
+
+    def __init__(self, filename, **kwargs):
+        self.file = open(filename, 'wb')
+
+    def write(self, frame):
+        self.file.write(np.asarray(frame, dtype=np.uint8).tobytes())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+FORMATS = {'raw': ('.bin', RawWriter), 'rle': ('.rle', ClipWriter)}
+
+
+def open_writer(output_base, fmt='raw', **kwargs):
+    """Open `output_base` + the format's extension for writing, returns the writer."""
+    extension, writer = FORMATS[fmt]
+    return writer(output_base + extension, **kwargs)
+
+
+class ClipReader:
+    """Frame-at-a-time decoder for .rle clips with random access through the index"""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        magic, version, flags, self.width, self.height, fps, self.total_frames, index_offset = \
+            HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{filename} is not an LED clip")
+        if version > VERSION:
+            self.file.close()
+            raise ValueError(f"{filename} uses clip format version {version}, newest supported is {VERSION}")
+        self.fps = fps / 100
+        self.file.seek(index_offset)
+        self.index = [INDEX_ENTRY.unpack(self.file.read(INDEX_ENTRY.size)) for _ in range(self.total_frames)]
+        self.buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    def read_frame(self, index, out=None):
+        offset, size, encoding = self.index[index]
+        self.file.seek(offset)
+        return decode_frame(encoding, self.file.read(size), self.width, self.height,
+                            self.buffer if out is None else out)
+
+    def __iter__(self):
+        # Reuses one buffer, copy frames that need to outlive the next iteration
+        for index in range(self.total_frames):
+            yield self.read_frame(index)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_bin(filename, width=WIDTH, height=HEIGHT):
+    frames = np.fromfile(filename, dtype=np.uint8)
+    frame_size = width * height * 3
+    total_frames = len(frames) // frame_size
+    return frames[:total_frames * frame_size].reshape(total_frames, height, width, 3)
+
+
+def benchmark(filenames, palette=True, output_dir=None):
+    """
+    Compress each .bin clip, check it decodes byte-exact and report ratio and decode speed.
+    The .rle files go to `output_dir` if given, otherwise to a temporary directory.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        for filename in filenames:
+            name = os.path.splitext(os.path.basename(filename))[0] + '.rle'
+            _benchmark_clip(filename, os.path.join(output_dir or scratch, name), palette)
+
+
+def _benchmark_clip(filename, output, palette):
+    frames = read_bin(filename)
+
+    start = time.perf_counter()
+    with ClipWriter(output, palette=palette) as writer:
+        for frame in frames:
+            writer.write(frame)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ClipReader(output) as reader:
+        for n, frame in enumerate(reader):
+            if not np.array_equal(frame, frames[n]):
+                raise AssertionError(f"{filename}: frame {n} does not round-trip")
+        counts = np.bincount([entry[2] for entry in reader.index], minlength=3)
+    decode_time = time.perf_counter() - start
+
+    raw_size = frames.nbytes
+    size = os.path.getsize(output)
+    print(f"{os.path.basename(filename)}: {len(frames)} frames, {raw_size / 1e6:.2f} MB -> {size / 1e6:.2f} MB "
+          f"({raw_size / max(size, 1):.1f}x), raw/rle/palette frames {counts[0]}/{counts[1]}/{counts[2]}")
+    print(f"  encode {len(frames) / encode_time:.0f} frames/s, "
+          f"decode {raw_size / decode_time / 1e6:.1f} MB/s ({len(frames) / decode_time:.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert between raw .bin clips and compressed .rle clips')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    encode_parser = subparsers.add_parser('encode', help='Compress a .bin clip')
+    encode_parser.add_argument('input', help='Input .bin file')
+    encode_parser.add_argument('output', help='Output .rle file')
+    encode_parser.add_argument('--fps', type=float, default=30, help='Frame rate stored in the header')
+    encode_parser.add_argument('--no-palette', action='store_true', help='Disable the palette encoding')
+
+    decode_parser = subparsers.add_parser('decode', help='Decompress an .rle clip back to .bin')
+    decode_parser.add_argument('input', help='Input .rle file')
+    decode_parser.add_argument('output', help='Output .bin file')
+
+    bench_parser = subparsers.add_parser('bench', help='Report compression ratio and decode speed for .bin clips')
+    bench_parser.add_argument('files', nargs='+', help='Input .bin files')
+    bench_parser.add_argument('--no-palette', action='store_true', help='Disable the palette encoding')
+    bench_parser.add_argument('--output-dir', help='Keep the .rle files here (default: a temporary directory)')
+
+    args = parser.parse_args()
+    if args.command == 'encode':
+        with ClipWriter(args.output, fps=args.fps, palette=not args.no_palette) as writer:
+            for frame in read_bin(args.input):
+                writer.write(frame)
+    elif args.command == 'decode':
+        with ClipReader(args.input) as reader, open(args.output, 'wb') as f:
+            for frame in reader:
+                f.write(frame.tobytes())
+    else:
+        benchmark(args.files, palette=not args.no_palette, output_dir=args.output_dir)
@@ -0,0 +1,730 @@
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+
+from clip_format import FORMATS, open_writer, read_bin
+from fastled import adjust_hsv, reference_adjust_hsv
+from geometry import load_geometry
+from media_library import MediaLibrary
+
+# Offline emulation of the firmware's layer compositing (src/latest.ino updateLEDs) and of the MIDI
+# handlers that drive it, so media and MIDI sequences can be previewed and regression-tested without
+# the wall. Layers from bottom to top: SD video, image (alpha blended), LED blocks, "white" LED
+# blocks (equal non-zero RGB), strobe. Everything is computed for the whole 40x96 frame at once.
+#
+# The image blend is float32 arithmetic like on the Teensy. If the compiler contracts it into fused
+# multiply-adds the hardware may round differently by one in rare cases.
+
+WIDTH, HEIGHT = 40, 96
+LEDS_PER_GROUP = 64          # LEDS_PER_PANEL / GROUPS_PER_PANEL, one MIDI-controlled LED block
+NUM_GROUPS = 64
+BLOCKS_PER_PANEL = 4
+BLOCKS_PER_COLUMN = 12
+NUM_ROWS = 3
+BRIGHTNESS_THRESHOLD = 5     # Video pixels with luma at or below this are black
+FRAME_DELAY_MS = 33          # SD video frame period at speed 1.0
+
+# MIDI channels (1-based, as in the firmware) and CCs, see README.md
+LED_CHANNEL_LEFT = 1
+LED_CHANNEL_RIGHT = 2
+VIDEO_CHANNEL = 3
+IMAGE_CHANNEL = 4
+ROW_CHANNEL = 5
+STROBE_CHANNEL = 6
+
+HUE_CC = 1
+SATURATION_CC = 2
+VALUE_CC = 3
+X_POSITION_CC = 4
+Y_POSITION_CC = 5
+VIDEO_DIRECTION_CC = 7
+VIDEO_SCALE_CC = 8
+VIDEO_SPEED_CC = 10
+VIDEO_MIRROR_CC = 12
+BANK_CC = 20
+
+LED_INDEX = load_geometry('wall_40x96').index_table()
+GROUP_MAP = LED_INDEX // LEDS_PER_GROUP
+XS = np.arange(WIDTH, dtype=np.float32)[np.newaxis, :].repeat(HEIGHT, axis=0)
+YS = np.arange(HEIGHT, dtype=np.float32)[:, np.newaxis].repeat(WIDTH, axis=1)
+
+# Strobe pattern index -> (x_start, x_end, y_start, y_end)
+STROBE_PATTERNS = {
+    0: (0, WIDTH, 0, 48),            # Upper half
+    1: (0, WIDTH, 48, HEIGHT),       # Lower half
+    2: (0, WIDTH // 2, 0, HEIGHT),   # Left half
+    3: (WIDTH // 2, WIDTH, 0, HEIGHT),
+    4: (0, 24, 0, 48),               # Corners
+    5: (WIDTH - 24, WIDTH, 0, 48),
+    6: (0, 24, 48, HEIGHT),
+    7: (WIDTH - 24, WIDTH, 48, HEIGHT),
+    8: (0, 8, 0, HEIGHT),            # Columns 1-5
+    9: (8, 16, 0, HEIGHT),
+    10: (16, 24, 0, HEIGHT),
+    11: (24, 32, 0, HEIGHT),
+    12: (32, 40, 0, HEIGHT),
+    13: (0, WIDTH, 0, HEIGHT),       # Full screen
+}
+
+
+def arduino_map(x, in_min, in_max, out_min, out_max):
+    """Arduino map(), integer maths with C division truncating towards zero"""
+    numerator = (x - in_min) * (out_max - out_min)
+    quotient = abs(numerator) // abs(in_max - in_min)
+    return (quotient if numerator * (in_max - in_min) >= 0 else -quotient) + out_min
+
+
+def cc_to_offset(value, max_offset):
+    if value == 64:
+        return 0
+    if value < 64:
+        return arduino_map(value, 0, 63, -max_offset, -1)
+    return arduino_map(value, 65, 127, 1, max_offset)
+
+
+def velocity_to_brightness(velocity):
+    return arduino_map(velocity, 0, 127, 0, 255)
+
+
+def cc_to_scale(value):
+    # float maths with a double pow(), stored back into a float
+    if value == 64:
+        return np.float32(1.0)
+    if value < 64:
+        normalized = np.float32(value) / np.float32(64.0)
+        return np.float32(0.25 + float(normalized) ** 2 * 0.75)
+    normalized = np.float32(value - 64) / np.float32(63.0)
+    return np.float32(1.0 + float(normalized) ** 2 * 3.0)
+
+
+def cc_to_speed(value):
+    if value == 0:
+        return np.float32(0.0)
+    if value == 64:
+        return np.float32(1.0)
+    if value < 64:
+        normalized = np.float32(value - 1) / np.float32(63.0)
+        return np.float32(0.25 + float(normalized) ** 2 * 0.75)
+    normalized = np.float32(value - 64) / np.float32(63.0)
+    return np.float32(64.0 ** float(normalized))
+
+
+class Adjustments:
+    """HSVAdjustments for one layer"""
+
+    def __init__(self):
+        self.hue = 0
+        self.saturation = 255
+        self.value = 255
+
+    def __iter__(self):
+        return iter((self.hue, self.saturation, self.value))
+
+
+class Compositor:
+    """
+    Firmware state plus its MIDI handlers. Feed MIDI with note_on/note_off/control_change (channels
+    1-16) or handle_message (mido messages), advance SD video playback with update(now_ms) and get
+    the wall contents with render(). Media is read from `sd_root`, laid out like the SD card
+    (video_map.txt, image_map.txt, video/<bank>/<file>, image/<bank>/<file>).
+    """
+
+    def __init__(self, sd_root=None):
+        self.library = MediaLibrary(sd_root)
+        self.image_brightness = {}   # Mapping.brightness, by position in the image mappings
+        self._clips = {}
+
+        self.group_states = np.zeros((NUM_GROUPS, 3), dtype=np.uint8)   # RGB per LED block
+        self.strobe_base = np.zeros((NUM_GROUPS, 3), dtype=np.uint8)
+        self.strobe_active = np.zeros((HEIGHT, WIDTH), dtype=bool)
+
+        self.video_adjustments = Adjustments()
+        self.image_adjustments = Adjustments()
+        self.led_adjustments = Adjustments()
+        self.strobe_adjustments = Adjustments()
+
+        self.frame_buffer = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        self.image_buffer = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        self.video_frames = None
+        self.video_playing = False
+        self.video_pos = 0            # Next frame to read, the file position in frames
+        self.video_start = 0
+        self.video_looping = True
+        self.last_video_frame = 0
+        self.video_needs_update = False
+        self.active_video_notes = [False] * 128
+        self.image_active = False
+        self.image_filename = ''
+
+        self.video_speed = np.float32(1.0)
+        self.video_speed_modified = False
+        self.video_reversed = False
+        self.video_direction_modified = False
+        self.video_scale = np.float32(1.0)
+        self.video_scale_modified = False
+        self.image_scale = np.float32(1.0)
+        self.image_scale_modified = False
+        self.video_mirrored = False
+        self.video_mirror_modified = False
+        self.video_offset = (0, 0)
+        self.image_offset = (0, 0)
+        self.video_bank = 0
+        self.image_bank = 0
+
+        self.now_ms = 0
+
+    # MIDI input
+
+    def handle_message(self, message):
+        """Dispatch a mido message, mido channels are 0-based"""
+        if message.type == 'note_on' and message.velocity > 0:
+            self.note_on(message.channel + 1, message.note, message.velocity)
+        elif message.type in ('note_on', 'note_off'):
+            # usbMIDI delivers note on with velocity 0 as note off
+            self.note_off(message.channel + 1, message.note, message.velocity)
+        elif message.type == 'control_change':
+            self.control_change(message.channel + 1, message.control, message.value)
+
+    def note_on(self, channel, pitch, velocity):
+        self._note_event(channel, pitch, velocity, True)
+
+    def note_off(self, channel, pitch, velocity=0):
+        self._note_event(channel, pitch, velocity, False)
+
+    def _note_event(self, channel, pitch, velocity, is_on):
+        # Same handler order as the usbMIDI callbacks in setup()
+        self._led_note(channel, pitch, velocity, is_on)
+        self._video_note(channel, pitch, velocity, is_on)
+        self._image_note(channel, pitch, velocity, is_on)
+        self._row_note(channel, pitch, velocity, is_on)
+        self._strobe_note(channel, pitch, velocity, is_on)
+
+    def _led_note(self, channel, pitch, velocity, is_on):
+        if channel not in (LED_CHANNEL_LEFT, LED_CHANNEL_RIGHT) or pitch > 127:
+            return
+        note_index = 127 - pitch
+        notes_per_column = BLOCKS_PER_COLUMN * 3
+        if channel == LED_CHANNEL_LEFT:
+            column = note_index // notes_per_column
+            if column > 2:
+                return
+        else:
+            column = 3 + note_index // notes_per_column
+            if column > 4:
+                return
+
+        remaining = note_index % notes_per_column
+        color_section = remaining // BLOCKS_PER_COLUMN    # 0 blue, 1 red, 2 green
+        block_in_column = remaining % BLOCKS_PER_COLUMN
+        panel_in_column = block_in_column // BLOCKS_PER_PANEL
+        block_in_panel = block_in_column % BLOCKS_PER_PANEL
+        if column % 2 == 1:
+            # Odd columns are wired bottom to top
+            panel_in_column = 2 - panel_in_column
+            block_in_panel = BLOCKS_PER_PANEL - 1 - block_in_panel
+
+        group = (column * NUM_ROWS + panel_in_column) * BLOCKS_PER_PANEL + block_in_panel
+        self.group_states[group, (2, 0, 1)[color_section]] = velocity_to_brightness(velocity) if is_on else 0
+
+    def _row_note(self, channel, pitch, velocity, is_on):
+        if channel != ROW_CHANNEL or pitch > 127:
+            return
+        note_index = 127 - pitch
+        color_section = note_index // 12
+        if color_section >= 3:
+            return
+        row = (note_index % 12) * 8
+        groups = np.unique(GROUP_MAP[row:row + 8])
+        self.group_states[groups, (2, 0, 1)[color_section]] = velocity_to_brightness(velocity) if is_on else 0
+
+    def _strobe_note(self, channel, pitch, velocity, is_on):
+        if channel != STROBE_CHANNEL or pitch > 127:
+            return
+        brightness = velocity_to_brightness(velocity) if is_on else 0
+
+        if 103 <= pitch <= 114:
+            # White row strobes
+            row = (114 - pitch) * 8
+            self._set_strobe((0, WIDTH, row, row + 8), is_on, brightness, (True, True, True))
+            return
+
+        is_white = pitch >= 115
+        is_blue = 89 <= pitch < 103
+        is_red = 76 <= pitch < 89
+        is_green = 63 <= pitch < 76
+        is_cyan = 50 <= pitch < 63
+        is_magenta = 37 <= pitch < 50
+        is_yellow = 24 <= pitch < 37
+        if is_white:
+            pattern = 127 - pitch
+        elif is_blue:
+            pattern = 102 - pitch
+        elif is_red:
+            pattern = 88 - pitch
+        elif is_green:
+            pattern = 75 - pitch
+        elif is_cyan:
+            pattern = 62 - pitch
+        elif is_magenta:
+            pattern = 49 - pitch
+        else:
+            pattern = 36 - pitch
+
+        if pattern in STROBE_PATTERNS:
+            components = (is_white or is_red or is_magenta or is_yellow,
+                          is_white or is_green or is_cyan or is_yellow,
+                          is_white or is_blue or is_cyan or is_magenta)
+            self._set_strobe(STROBE_PATTERNS[pattern], is_on, brightness, components)
+
+    def _set_strobe(self, rect, is_on, brightness, components):
+        x_start, x_end, y_start, y_end = rect
+        self.strobe_active[y_start:y_end, x_start:x_end] = is_on
+        groups = np.unique(GROUP_MAP[y_start:y_end, x_start:x_end])
+        if is_on and brightness > 0:
+            self.strobe_base[groups] = [brightness if on else 0 for on in components]
+        else:
+            self.strobe_base[groups] = 0
+
+    def _video_note(self, channel, pitch, velocity, is_on):
+        if channel != VIDEO_CHANNEL:
+            return
+        if is_on and velocity > 0:
+            if self.video_playing:
+                self.stop_video()
+                self.active_video_notes = [False] * 128
+            self.active_video_notes[pitch] = True
+            mapping = self.library.lookup('video', self.video_bank, pitch)
+            if mapping is not None:
+                self.start_video(mapping)
+                return
+        else:
+            self.active_video_notes[pitch] = False
+        self.video_needs_update = True
+
+    def _image_note(self, channel, pitch, velocity, is_on):
+        if channel != IMAGE_CHANNEL:
+            return
+        if is_on:
+            mapping = self.library.lookup('image', self.image_bank, pitch)
+            if mapping is not None:
+                self.image_brightness[mapping.index] = velocity_to_brightness(velocity)
+                self.start_image(mapping)
+        else:
+            self.stop_image()
+
+    def control_change(self, channel, control, value):
+        adjustments = None
+        if channel == VIDEO_CHANNEL:
+            if control == BANK_CC:
+                self.video_bank = value
+                return
+            if control == VIDEO_DIRECTION_CC:
+                self.video_direction_modified = True
+                self.video_reversed = value == 127
+                return
+            if control == VIDEO_SPEED_CC:
+                self.video_speed_modified = True
+                self.video_speed = cc_to_speed(value)
+                return
+            if control == VIDEO_SCALE_CC:
+                self.video_scale_modified = True
+                self.video_scale = cc_to_scale(value)
+                return
+            if control == VIDEO_MIRROR_CC:
+                self.video_mirror_modified = True
+                self.video_mirrored = value == 127
+                return
+            adjustments = self.video_adjustments
+        elif channel in (LED_CHANNEL_LEFT, LED_CHANNEL_RIGHT):
+            adjustments = self.led_adjustments
+        elif channel == IMAGE_CHANNEL:
+            if control == BANK_CC:
+                self.image_bank = value
+                return
+            adjustments = self.image_adjustments
+            if control == VIDEO_SCALE_CC:
+                self.image_scale_modified = True
+                self.image_scale = cc_to_scale(value)
+                return
+        elif channel == STROBE_CHANNEL:
+            adjustments = self.strobe_adjustments
+
+        if adjustments is None:
+            return
+        if control == HUE_CC:
+            adjustments.hue = (value * 2) & 0xFF
+        elif control == SATURATION_CC:
+            adjustments.saturation = arduino_map(value, 0, 127, 0, 255)
+        elif control == VALUE_CC:
+            adjustments.value = arduino_map(value, 0, 127, 0, 255)
+        elif control in (X_POSITION_CC, Y_POSITION_CC):
+            axis = 0 if control == X_POSITION_CC else 1
+            offset = cc_to_offset(value, WIDTH if axis == 0 else HEIGHT)
+            if channel == VIDEO_CHANNEL:
+                self.video_offset = tuple(offset if i == axis else v for i, v in enumerate(self.video_offset))
+            elif channel == IMAGE_CHANNEL:
+                self.image_offset = tuple(offset if i == axis else v for i, v in enumerate(self.image_offset))
+
+    # Media
+
+    def _load_clip(self, path):
+        if path not in self._clips:
+            self._clips[path] = read_bin(path) if os.path.exists(path) else None
+        return self._clips[path]
+
+    def start_video(self, mapping):
+        if self.video_playing:
+            self.stop_video()
+        frames = self._load_clip(self.library.path('video', mapping))
+        if frames is not None:
+            self.play_frames(frames)
+
+    def play_frames(self, frames):
+        """startVideo once the file is open, `frames` is a (N, 96, 40, 3) clip"""
+        self.video_frames = frames
+        self.video_playing = True
+        if self.video_direction_modified and self.video_reversed:
+            # Reverse playback starts from the last full frame
+            self.video_start = max(len(frames) - 1, 0)
+            self.video_pos = self.video_start
+            if self.video_pos < len(frames):
+                self._read_frame()
+        else:
+            self.video_start = 0
+            self.video_pos = 0
+        self.last_video_frame = self.now_ms
+
+    def stop_video(self):
+        if self.video_playing:
+            self.video_frames = None
+            self.video_playing = False
+            self.video_pos = 0
+            self.video_start = 0
+            self.frame_buffer[:] = 0
+
+    def _read_frame(self):
+        self.frame_buffer[:] = self.video_frames[self.video_pos]
+        self.video_pos += 1
+
+    def start_image(self, mapping):
+        path = self.library.path('image', mapping)
+        if not os.path.exists(path):
+            return
+        data = np.fromfile(path, dtype=np.uint8, count=self.image_buffer.size)
+        self.show_image(data, mapping.filename)
+
+    def show_image(self, data, filename=''):
+        """startImage once the file is open. Short files only overwrite the start of the buffer."""
+        data = np.asarray(data, dtype=np.uint8).reshape(-1)
+        self.image_buffer.reshape(-1)[:len(data)] = data
+        self.image_active = True
+        self.image_filename = filename[:12]
+
+    def stop_image(self):
+        self.image_active = False
+        self.image_buffer[:] = 0
+
+    def update(self, now_ms):
+        """handleSDVideo: stop on note off, loop, and read the next frame when it is due"""
+        self.now_ms = now_ms
+        if self.video_needs_update:
+            if not any(self.active_video_notes):
+                self.stop_video()
+            self.video_needs_update = False
+
+        if not self.video_playing:
+            return
+        total = len(self.video_frames)
+        if self.video_pos >= total:
+            if self.video_looping:
+                self.video_pos = self.video_start
+            else:
+                self.stop_video()
+                return
+
+        reversed_ = self.video_reversed if self.video_direction_modified else False
+        speed = self.video_speed if self.video_speed_modified else np.float32(1.0)
+        delay = int(np.float32(FRAME_DELAY_MS) / speed) if speed > 0 else 99999999
+        if now_ms - self.last_video_frame < delay:
+            return
+
+        if reversed_:
+            if self.video_pos >= 2:
+                self.video_pos -= 2
+            elif self.video_pos >= 1:
+                self.video_pos -= 1
+            elif self.video_looping:
+                self.video_pos = max(total - 1, 0)
+            else:
+                self.stop_video()
+                return
+
+        if self.video_pos < total:
+            self._read_frame()
+            self.last_video_frame = now_ms
+            if reversed_ and self.video_pos <= 1 and self.video_looping and total >= 1:
+                self.video_pos = total - 1
+        elif self.video_looping:
+            self.video_pos = max(total - 1, 0) if reversed_ else self.video_start
+            if self.video_pos < total:
+                self._read_frame()
+                self.last_video_frame = now_ms
+        else:
+            self.stop_video()
+
+    # Compositing
+
+    def _image_brightness(self):
+        # First mapping with the same file name in any bank, like the firmware's strcmp loop
+        for mapping in self.library.mappings['image']:
+            if mapping.filename == self.image_filename:
+                return self.image_brightness.get(mapping.index, 0)
+        return 255
+
+    @staticmethod
+    def _source_coords(scale, offset):
+        # float vidX = (x - centerX) / scale + centerX - offsetX, in float32 like the Teensy FPU
+        scale = np.float32(scale)
+        src_x = (XS - np.float32(WIDTH // 2)) / scale + np.float32(WIDTH // 2) - np.float32(offset[0])
+        src_y = (YS - np.float32(HEIGHT // 2)) / scale + np.float32(HEIGHT // 2) - np.float32(offset[1])
+        inside = (src_x >= 0) & (src_x < WIDTH) & (src_y >= 0) & (src_y < HEIGHT)
+        return (np.where(inside, src_x, 0).astype(np.intp), np.where(inside, src_y, 0).astype(np.intp), inside)
+
+    def render(self):
+        """updateLEDs for the whole frame, returns the (96, 40, 3) RGB wall contents"""
+        rgb = np.zeros((HEIGHT, WIDTH, 3), dtype=np.int32)
+
+        # Video, bottom layer
+        if self.video_playing:
+            scale = self.video_scale if self.video_scale_modified else 1.0
+            src_x, src_y, inside = self._source_coords(scale, self.video_offset)
+            if self.video_mirror_modified and self.video_mirrored:
+                src_x = (WIDTH - 1) - src_x
+            pixels = self.frame_buffer[src_y, src_x].astype(np.int32)
+            luma = (pixels[..., 0] * 77 + pixels[..., 1] * 150 + pixels[..., 2] * 29) >> 8
+            visible = inside & (luma > BRIGHTNESS_THRESHOLD)
+            rgb[visible] = adjust_hsv(pixels[visible], *self.video_adjustments)
+
+        # Image, alpha blended over the video where it covers the wall
+        if self.image_active:
+            scale = self.image_scale if self.image_scale_modified else 1.0
+            src_x, src_y, inside = self._source_coords(scale, self.image_offset)
+            original = self.image_buffer[src_y[inside], src_x[inside]]
+            brightness = self._image_brightness()
+            image = (adjust_hsv(original, *self.image_adjustments).astype(np.int32) * brightness) >> 8
+
+            alpha = image.max(axis=-1).astype(np.float32) / np.float32(255.0)
+            if brightness != 255:
+                alpha = alpha * np.float32(0.5)
+            else:
+                alpha = np.where(original.max(axis=-1) == 255, alpha, alpha * np.float32(0.5))
+            alpha = alpha[:, np.newaxis]
+            below = rgb[inside].astype(np.float32)
+            rgb[inside] = ((np.float32(1) - alpha) * below + alpha * image.astype(np.float32)).astype(np.int32)
+
+        # LED blocks, each colour component adjusted on its own and combined with max
+        states = self.group_states
+        lit = states.any(axis=1)
+        components = np.zeros((NUM_GROUPS, 3, 3), dtype=np.uint8)
+        components[:, [0, 1, 2], [0, 1, 2]] = states
+        blocks = adjust_hsv(components, *self.led_adjustments).max(axis=1)
+        white = (states[:, 0] > 0) & (states[:, 0] == states[:, 1]) & (states[:, 0] == states[:, 2])
+        group_rgb = np.where(white[:, np.newaxis], states, blocks)
+        group_on = (lit | white)[GROUP_MAP]
+        rgb = np.where(group_on[..., np.newaxis], group_rgb[GROUP_MAP], rgb)
+
+        # Strobe, on top of everything
+        strobe = np.where(self.strobe_base.any(axis=1)[:, np.newaxis],
+                          adjust_hsv(self.strobe_base, *self.strobe_adjustments), 0)
+        rgb = np.where(self.strobe_active[..., np.newaxis], strobe[GROUP_MAP], rgb)
+        return rgb.astype(np.uint8)
+
+    def render_leds(self):
+        """render() in wire order, (3840, 3) as passed to leds.setPixel"""
+        leds = np.empty((WIDTH * HEIGHT, 3), dtype=np.uint8)
+        leds[LED_INDEX.reshape(-1)] = self.render().reshape(-1, 3)
+        return leds
+
+
+def reference_render(compositor):
+    """Per-pixel translation of updateLEDs, for checking Compositor.render"""
+    c = compositor
+    out = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            group = GROUP_MAP[y, x]
+            if c.strobe_active[y, x]:
+                r, g, b = (int(v) for v in c.strobe_base[group])
+                if r or g or b:
+                    r, g, b = reference_adjust_hsv(r, g, b, *c.strobe_adjustments)
+                out[y, x] = r, g, b
+                continue
+
+            sr, sg, sb = (int(v) for v in c.group_states[group])
+            r = g = b = 0
+            if sr > 0 and sr == sg == sb:
+                out[y, x] = sr, sg, sb
+                continue
+
+            if c.video_playing:
+                scale = np.float32(c.video_scale if c.video_scale_modified else 1.0)
+                vid_x = np.float32(x - WIDTH // 2) / scale + np.float32(WIDTH // 2) - np.float32(c.video_offset[0])
+                vid_y = np.float32(y - HEIGHT // 2) / scale + np.float32(HEIGHT // 2) - np.float32(c.video_offset[1])
+                if 0 <= vid_x < WIDTH and 0 <= vid_y < HEIGHT:
+                    src_x, src_y = int(vid_x), int(vid_y)
+                    if c.video_mirror_modified and c.video_mirrored:
+                        src_x = (WIDTH - 1) - src_x
+                    r, g, b = (int(v) for v in c.frame_buffer[src_y, src_x])
+                    if (r * 77 + g * 150 + b * 29) >> 8 > BRIGHTNESS_THRESHOLD:
+                        r, g, b = reference_adjust_hsv(r, g, b, *c.video_adjustments)
+                    else:
+                        r = g = b = 0
+
+            if c.image_active:
+                scale = np.float32(c.image_scale if c.image_scale_modified else 1.0)
+                img_x = np.float32(x - WIDTH // 2) / scale + np.float32(WIDTH // 2) - np.float32(c.image_offset[0])
+                img_y = np.float32(y - HEIGHT // 2) / scale + np.float32(HEIGHT // 2) - np.float32(c.image_offset[1])
+                if 0 <= img_x < WIDTH and 0 <= img_y < HEIGHT:
+                    original = [int(v) for v in c.image_buffer[int(img_y), int(img_x)]]
+                    brightness = c._image_brightness()
+                    ir, ig, ib = reference_adjust_hsv(*original, *c.image_adjustments)
+                    ir, ig, ib = (ir * brightness) >> 8, (ig * brightness) >> 8, (ib * brightness) >> 8
+                    alpha = np.float32(max(ir, ig, ib)) / np.float32(255.0)
+                    if not (max(original) == 255 and brightness == 255):
+                        alpha = alpha * np.float32(0.5)
+                    one = np.float32(1)
+                    r = int((one - alpha) * np.float32(r) + alpha * np.float32(ir))
+                    g = int((one - alpha) * np.float32(g) + alpha * np.float32(ig))
+                    b = int((one - alpha) * np.float32(b) + alpha * np.float32(ib))
+
+            if sr or sg or sb:
+                parts = [reference_adjust_hsv(sr, 0, 0, *c.led_adjustments),
+                         reference_adjust_hsv(0, sg, 0, *c.led_adjustments),
+                         reference_adjust_hsv(0, 0, sb, *c.led_adjustments)]
+                r, g, b = (max(part[i] for part in parts) for i in range(3))
+            out[y, x] = r, g, b
+    return out
+
+
+def random_state(seed):
+    """A compositor with every layer active and random adjustments, for verify and bench"""
+    rng = np.random.default_rng(seed)
+    compositor = Compositor()
+    compositor.play_frames(rng.integers(0, 256, (4, HEIGHT, WIDTH, 3), dtype=np.uint8))
+    compositor.show_image(rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8), 'test.bin')
+    compositor.library.load_map('image', ['60,0,test.bin'])
+    compositor.image_brightness[0] = int(rng.choice([255, 200]))
+    for _ in range(12):
+        compositor.note_on(int(rng.choice([1, 2])), int(rng.integers(0, 128)), int(rng.integers(1, 128)))
+    compositor.note_on(5, int(rng.integers(92, 128)), 127)
+    compositor.note_on(6, int(rng.integers(24, 128)), int(rng.integers(1, 128)))
+    for channel in (1, 3, 4, 6):
+        for control in (HUE_CC, SATURATION_CC, VALUE_CC):
+            compositor.control_change(channel, control, int(rng.integers(0, 128)))
+    for channel in (3, 4):
+        for control in (X_POSITION_CC, Y_POSITION_CC, VIDEO_SCALE_CC):
+            compositor.control_change(channel, control, int(rng.integers(40, 90)))
+    compositor.control_change(3, VIDEO_MIRROR_CC, int(rng.choice([0, 127])))
+    compositor.update(FRAME_DELAY_MS)
+    return compositor
+
+
+def verify(num_states=4):
+    """Compare the vectorized render against the per-pixel translation on random states"""
+    failures = 0
+    for seed in range(num_states):
+        compositor = random_state(seed)
+        expected = reference_render(compositor)
+        actual = compositor.render()
+        differ = int((actual != expected).any(axis=-1).sum())
+        print(f"state {seed}: {'OK' if not differ else f'FAILED, {differ} pixels differ'}")
+        failures += differ > 0
+    return failures
+
+
+def benchmark(num_frames=300):
+    compositor = random_state(0)
+    compositor.render()
+    start = time.perf_counter()
+    for n in range(num_frames):
+        compositor.update(n * FRAME_DELAY_MS)
+        compositor.render()
+    elapsed = time.perf_counter() - start
+    print(f"All layers active: {elapsed / num_frames * 1e3:.2f} ms/frame, {num_frames / elapsed:.0f} fps")
+
+    compositor = Compositor()
+    compositor.play_frames(random_state(1).video_frames)
+    start = time.perf_counter()
+    for n in range(num_frames):
+        compositor.update(n * FRAME_DELAY_MS)
+        compositor.render()
+    elapsed = time.perf_counter() - start
+    print(f"Video only: {elapsed / num_frames * 1e3:.2f} ms/frame, {num_frames / elapsed:.0f} fps")
+
+
+def render_midi(midi_file, sd_root, output, fps=30, scale=8):
+    """Play a MIDI file through the compositor and write the wall as a preview .mp4 or a .bin/.rle clip."""
+    import mido
+
+    compositor = Compositor(sd_root)
+    messages = []
+    now = 0.0
+    for message in mido.MidiFile(midi_file):
+        now += message.time
+        if not message.is_meta:
+            messages.append((now, message))
+    duration = now + 1.0
+
+    base, extension = os.path.splitext(output)
+    fmt = {ext: name for name, (ext, _) in FORMATS.items()}.get(extension)
+    if fmt is not None:
+        writer = open_writer(base, fmt, fps=fps)
+        write = writer.write
+    else:
+        writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*'mp4v'), fps, (WIDTH * scale, HEIGHT * scale))
+        write = lambda frame: writer.write(cv2.resize(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+                                                      (WIDTH * scale, HEIGHT * scale),
+                                                      interpolation=cv2.INTER_NEAREST))
+
+    pending = 0
+    num_frames = int(duration * fps)
+    for n in range(num_frames):
+        t = n / fps
+        while pending < len(messages) and messages[pending][0] <= t:
+            compositor.handle_message(messages[pending][1])
+            pending += 1
+        compositor.update(int(t * 1000))
+        write(compositor.render())
+    if fmt is not None:
+        writer.close()
+    else:
+        writer.release()
+    print(f"Rendered {num_frames} frames ({duration:.1f}s, {len(messages)} MIDI messages) to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline emulation of the firmware layer compositor')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help='Render a MIDI file to a preview video or clip')
+    render_parser.add_argument('midi', help='MIDI file to play')
+    render_parser.add_argument('output', help='Output .mp4 preview, or .bin/.rle clip')
+    render_parser.add_argument('--sd', default='../media/sd', help='Folder laid out like the SD card')
+    render_parser.add_argument('--fps', type=float, default=30, help='Output frame rate')
+    render_parser.add_argument('--scale', type=int, default=8, help='Preview pixels per LED')
+
+    verify_parser = subparsers.add_parser('verify', help='Check the vectorized compositor against the per-pixel version')
+    verify_parser.add_argument('--states', type=int, default=4, help='Random states to compare')
+
+    bench_parser = subparsers.add_parser('bench', help='Measure compositing speed')
+    bench_parser.add_argument('--frames', type=int, default=300, help='Frames to render')
+
+    args = parser.parse_args()
+    if args.command == 'render':
+        render_midi(args.midi, args.sd, args.output, args.fps, args.scale)
+    elif args.command == 'verify':
+        raise SystemExit(1 if verify(args.states) else 0)
+    else:
+        benchmark(args.frames)
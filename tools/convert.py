@@ -1,50 +1,37 @@
+import argparse
 import cv2
-import numpy as np
 import os
 
+from clip_format import FORMATS, open_writer
+from pipeline import Pipeline, led_steps
+
 brightness_offset = 0 # -20
 contrast_factor = 1.0 # 0.9
 black_threshold = 20
 
-def convert_video_to_binary(input_file, output_file, contrast_factor=0.9, brightness_offset=-20, black_threshold=20):
-    def adjust_contrast_brightness(image, contrast=1.0, brightness=0):
-        return cv2.addWeighted(image, contrast, image, 0, brightness)
-
-    def apply_black_threshold(image, threshold):
-        return np.where(image < threshold, 0, image)
+def convert_video_to_binary(input_file, output_base, contrast_factor=0.9, brightness_offset=-20, black_threshold=20,
+                            fmt='raw'):
+    # Resize, CLAHE, contrast/brightness and black threshold, set up once per clip
+    led_pipeline = Pipeline(led_steps(contrast_factor, brightness_offset, black_threshold))
 
     cap = cv2.VideoCapture(input_file)
-    with open(output_file, 'wb') as f:
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    with open_writer(output_base, fmt, fps=fps) as f:
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
-            frame = cv2.resize(frame, (40, 96))
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-            # Convert to LAB color space
-            lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
-            l, a, b = cv2.split(lab)
-
-            # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization) to L-channel
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-            cl = clahe.apply(l)
 
-            # Merge the CLAHE enhanced L-channel back with A and B channels
-            limg = cv2.merge((cl,a,b))
+            # Downscale and enhance for the LED panel
+            final = led_pipeline.run(frame)
 
-            # Convert back to RGB color space
-            enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
-
-            # Apply custom contrast and brightness adjustment
-            adjusted = adjust_contrast_brightness(enhanced, contrast_factor, brightness_offset)
-
-            # Apply black threshold
-            final = apply_black_threshold(adjusted, black_threshold)
-
-            f.write(final.astype(np.uint8).tobytes())
+            f.write(final)
     cap.release()
 
+parser = argparse.ArgumentParser(description='Convert the media videos to LED clips')
+parser.add_argument('--format', choices=sorted(FORMATS), default='raw', help='raw .bin frames or compressed .rle clip')
+args = parser.parse_args()
+
 video_folder = '../media/'
 output_folder = '../media/'
 os.makedirs(output_folder, exist_ok=True)
@@ -54,6 +41,6 @@ video_files = ['tron96.mp4']
 for video_file in video_files:
     print(video_file)
     input_path = os.path.join(video_folder, video_file)
-    output_path = os.path.join(output_folder, video_file.replace('.mp4', '.bin'))
-    convert_video_to_binary(input_path, output_path, contrast_factor, brightness_offset, black_threshold)
-    print(f"Converted {video_file} to {output_path}")
+    output_base = os.path.join(output_folder, os.path.splitext(video_file)[0])
+    convert_video_to_binary(input_path, output_base, contrast_factor, brightness_offset, black_threshold, args.format)
+    print(f"Converted {video_file} to {output_base + FORMATS[args.format][0]}")
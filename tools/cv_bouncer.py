@@ -3,6 +3,8 @@ import numpy as np
 import random
 import os
 
+from particles import Particles
+
 # Video settings
 width, height = 320, 160  # 10 times larger than 32x16
 fps = 30
@@ -20,10 +22,10 @@ out = cv2.VideoWriter(os.path.join(output_dir, 'ball.mp4'), fourcc, fps, (width,
 # Ball properties
 ball_radius = 10
 ball_color = (255, 0, 0)  # Blue (BGR format)
-ball_x = width // 2
-ball_y = height // 2
-ball_speed_x = random.choice([-12, 12])  # Slowed down from 20 to 12
-ball_speed_y = random.choice([-12, 12])
+ball_speed = 12  # Slowed down from 20 to 12
+ball = Particles([(width // 2, height // 2)],
+                 [(random.choice([-ball_speed, ball_speed]), random.choice([-ball_speed, ball_speed]))],
+                 ball_color, ball_radius)
 
 # Edge flash properties
 edge_flash_duration = 5  # frames
@@ -54,26 +56,22 @@ for frame in range(total_frames):
     # Create a black background
     img = np.zeros((height, width, 3), dtype=np.uint8)
 
-    # Update ball position
-    ball_x += ball_speed_x
-    ball_y += ball_speed_y
+    # Update ball position, bouncing off the edges
+    left, right, top, bottom = ball.update((0, 0, width - 1, height - 1))
+    ball_x, ball_y = ball.pos[0].astype(int).tolist()
 
-    # Check for collisions with edges
-    if ball_x - ball_radius <= 0:
-        ball_speed_x = abs(ball_speed_x)
+    # Flash the edges it hit
+    if left[0]:
         left_flash = edge_flash_duration
         left_flash_pos = max(0, min(ball_y - edge_flash_length // 2, height - edge_flash_length))
-    elif ball_x + ball_radius >= width - 1:
-        ball_speed_x = -abs(ball_speed_x)
+    elif right[0]:
         right_flash = edge_flash_duration
         right_flash_pos = max(0, min(ball_y - edge_flash_length // 2, height - edge_flash_length))
 
-    if ball_y - ball_radius <= 0:
-        ball_speed_y = abs(ball_speed_y)
+    if top[0]:
         top_flash = edge_flash_duration
         top_flash_pos = max(0, min(ball_x - edge_flash_length // 2, width - edge_flash_length))
-    elif ball_y + ball_radius >= height - 1:
-        ball_speed_y = -abs(ball_speed_y)
+    elif bottom[0]:
         bottom_flash = edge_flash_duration
         bottom_flash_pos = max(0, min(ball_x - edge_flash_length // 2, width - edge_flash_length))
 
@@ -92,7 +90,7 @@ for frame in range(total_frames):
         bottom_flash -= 1
 
     # Draw the ball
-    cv2.circle(img, (int(ball_x), int(ball_y)), ball_radius, ball_color, -1)
+    ball.draw(img)
 
     # Write the frame
     out.write(img)
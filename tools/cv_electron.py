@@ -1,8 +1,9 @@
 import cv2
 import numpy as np
-import os
 import math
-import random
+
+from generator import Canvas, Effect, main
+from particles import Particles
 
 # Video settings
 width, height = 400, 960
@@ -10,17 +11,6 @@ fps = 30
 duration = 6  # seconds (increased to accommodate explosion)
 total_frames = fps * duration
 
-# Ensure the output directory exists
-output_dir = "../media"
-os.makedirs(output_dir, exist_ok=True)
-
-# Create a VideoWriter object
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-out = cv2.VideoWriter(os.path.join(output_dir, 'atom.mp4'), fourcc, fps, (width, height))
-
-# Create a binary file for 32x96 output
-binary_output = open(os.path.join(output_dir, 'atom.bin'), 'wb')
-
 # Atom properties
 max_atom_size = 600  # Increased to fit the taller resolution
 min_atom_size = 1
@@ -39,6 +29,7 @@ trace_length = 20  # Increased for more visible traces
 explosion_start = int(total_frames * 0.8)  # Start explosion at 80% of the video
 num_particles = 300  # Increased number of particles
 particle_max_speed = 15  # Increased speed
+particle_seed = 6
 
 # Create nucleus with rotating red and blue spheres
 def create_nucleus(size, angle):
@@ -75,29 +66,22 @@ def create_nucleus(size, angle):
 
     return cv2.GaussianBlur(nucleus, (3, 3), 0)
 
-# Create explosion particles
-particles = []
-for _ in range(num_particles):
-    particle = {
-        'x': width // 2,
-        'y': height // 2,
-        'vx': random.uniform(-1, 1) * particle_max_speed,
-        'vy': random.uniform(-1, 1) * particle_max_speed,
-        'color': random.choice([(255, 0, 0), (0, 0, 255), (255, 255, 0)]),  # Red, Blue, or Cyan
-        'size': random.randint(1, 3)
-    }
-    particles.append(particle)
-
-def adjust_contrast_brightness(image, contrast=1.0, brightness=0):
-    return cv2.addWeighted(image, contrast, image, 0, brightness)
-
-def apply_black_threshold(image, threshold):
-    return np.where(image < threshold, 0, image)
-
-# Animation loop
-for frame in range(total_frames):
+# Explosion particles, seeded so every process and every run draws the same explosion. They are
+# already one step out on the first explosion frame and fade out over the rest of the video
+particles = Particles.burst(num_particles, (width // 2, height // 2), particle_max_speed,
+                            [(255, 0, 0), (0, 0, 255), (255, 255, 0)],  # Red, Blue, or Cyan
+                            [1, 2, 3], np.random.default_rng(particle_seed),
+                            born=explosion_start, life=total_frames - explosion_start)
+particles.pos += particles.vel
+
+# Trace step i is drawn half a frame further back per step, fading with i
+trace_steps = np.arange(trace_length) * 0.5
+trace_alpha = (255 * (1 - np.arange(trace_length) / trace_length)).astype(np.int64)
+trace_colors = np.repeat(np.array(electron_color) * trace_alpha[:, None] // 255, 2, axis=0)
+
+def render(frame, scale=1.0, zoom=1.0):
     # Create a black background
-    img = np.zeros((height, width, 3), dtype=np.uint8)
+    canvas = Canvas(width, height, scale, zoom)
 
     if frame < explosion_start:
         # Normal atom animation
@@ -112,106 +96,38 @@ for frame in range(total_frames):
         atom_center_y = int(height // 2)
         atom_center = (atom_center_x, atom_center_y)
 
-        # Draw nucleus
+        # Draw nucleus, clipped to the frame
         nucleus_angle = frame * 0.1
-        nucleus_img = create_nucleus(atom_size, nucleus_angle)
-        x_offset = atom_center[0] - atom_size // 2
-        y_offset = atom_center[1] - atom_size // 2
-
-        # Ensure the nucleus is within the frame
-        x_start = max(0, x_offset)
-        y_start = max(0, y_offset)
-        x_end = min(width, x_offset + atom_size)
-        y_end = min(height, y_offset + atom_size)
-
-        img_x_start = x_start - x_offset
-        img_y_start = y_start - y_offset
-        img_x_end = img_x_start + (x_end - x_start)
-        img_y_end = img_y_start + (y_end - y_start)
-
-        img[y_start:y_end, x_start:x_end] = nucleus_img[img_y_start:img_y_end, img_x_start:img_x_end]
+        canvas.paste(lambda side: create_nucleus(side, nucleus_angle),
+                     atom_center[0] - atom_size // 2, atom_center[1] - atom_size // 2, atom_size)
 
         # Calculate electron speed (increases as zoom progresses)
         electron_speed = base_electron_speed * (1 + progress * 5)
 
-        # Calculate electron positions
-        angle1 = frame * electron_speed
-        angle2 = frame * electron_speed + math.pi
-        e1_x = int(atom_center[0] + orbit_radius * math.cos(angle1))
-        e1_y = int(atom_center[1] + orbit_radius * math.sin(angle1))
-        e2_x = int(atom_center[0] + orbit_radius * math.cos(angle2))
-        e2_y = int(atom_center[1] + orbit_radius * math.sin(angle2))
-
-        # Draw electron traces
-        for i in range(trace_length):
-            trace_angle1 = (frame - i * 0.5) * electron_speed
-            trace_angle2 = (frame - i * 0.5) * electron_speed + math.pi
-            trace_radius = max(2, min_orbit_radius + (orbit_radius - min_orbit_radius) * ((frame - i * 0.5) / frame) if frame > 0 else min_orbit_radius)
-            trace_x1 = int(atom_center[0] + trace_radius * math.cos(trace_angle1))
-            trace_y1 = int(atom_center[1] + trace_radius * math.sin(trace_angle1))
-            trace_x2 = int(atom_center[0] + trace_radius * math.cos(trace_angle2))
-            trace_y2 = int(atom_center[1] + trace_radius * math.sin(trace_angle2))
-
-            alpha = int(255 * (1 - i / trace_length))
-            color = tuple(int(c * alpha / 255) for c in electron_color)
-            cv2.circle(img, (trace_x1, trace_y1), electron_size, color, -1)
-            cv2.circle(img, (trace_x2, trace_y2), electron_size, color, -1)
-
-        # Draw electrons
-        cv2.circle(img, (e1_x, e1_y), electron_size, electron_color, -1)
-        cv2.circle(img, (e2_x, e2_y), electron_size, electron_color, -1)
+        # Electron traces, both electrons per step, then the electrons on top, in one splat
+        trace_angle = (frame - trace_steps) * electron_speed
+        if frame > 0:
+            trace_radius = np.maximum(2, min_orbit_radius + (orbit_radius - min_orbit_radius) * ((frame - trace_steps) / frame))
+        else:
+            trace_radius = np.full(trace_length, max(2, min_orbit_radius))
+        angles = np.stack([trace_angle, trace_angle + math.pi], axis=1).reshape(-1)
+        radii = np.repeat(trace_radius, 2)
+        angle = frame * electron_speed
+        angles = np.append(angles, [angle, angle + math.pi])
+        radii = np.append(radii, [orbit_radius, orbit_radius])
+        centers = np.stack([atom_center[0] + radii * np.cos(angles), atom_center[1] + radii * np.sin(angles)], axis=1)
+        canvas.discs(centers, electron_size, np.concatenate([trace_colors, [electron_color] * 2]))
 
     else:
-        # Explosion animation
-        explosion_progress = (frame - explosion_start) / (total_frames - explosion_start)
-
-        for particle in particles:
-            particle['x'] += particle['vx']
-            particle['y'] += particle['vy']
-
-            # Fade out particles
-            alpha = int(255 * (1 - explosion_progress))
-            color = tuple(int(c * alpha / 255) for c in particle['color'])
-
-            cv2.circle(img, (int(particle['x']), int(particle['y'])), particle['size'], color, -1)
+        # Explosion animation, fading out
+        canvas.discs(particles.positions(frame), particles.size, particles.colors(frame))
 
     # Add some glow
-    img_glow = cv2.GaussianBlur(img, (15, 15), 0)  # Increased blur size
-    img = cv2.addWeighted(img, 1, img_glow, 0.5, 0)
-
-    # Write the frame to MP4
-    out.write(img)
-
-    # Process frame for binary output
-    small_frame = cv2.resize(img, (40, 96))
-    frame_rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-    # Convert to LAB color space
-    lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
-    l, a, b = cv2.split(lab)
-
-    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization) to L-channel
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-    cl = clahe.apply(l)
-
-    # Merge the CLAHE enhanced L-channel back with A and B channels
-    limg = cv2.merge((cl,a,b))
-
-    # Convert back to RGB color space
-    enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
-
-    # Apply custom contrast and brightness adjustment
-    adjusted = adjust_contrast_brightness(enhanced, contrast=0.9, brightness=-20)
-
-    # Apply black threshold
-    final = apply_black_threshold(adjusted, threshold=20)
+    canvas.glow(15, 0.5)  # Increased blur size
 
-    # Write to binary file
-    binary_output.write(final.astype(np.uint8).tobytes())
+    return canvas.img
 
-# Release the VideoWriter and close the binary file
-out.release()
-binary_output.close()
+EFFECT = Effect('atom', render, total_frames, fps, width, height, 'generator_dim')
 
-print(f"Video generated: {os.path.join(output_dir, 'atom.mp4')}")
-print(f"Binary file generated: {os.path.join(output_dir, 'atom.bin')}")
+if __name__ == "__main__":
+    main(EFFECT)
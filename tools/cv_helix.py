@@ -1,7 +1,7 @@
 import cv2
-import numpy as np
 import math
-import os
+
+from generator import Canvas, Effect, main
 
 # Video settings
 width, height = 400, 960
@@ -9,23 +9,6 @@ fps = 30
 duration = 10  # seconds
 total_frames = fps * duration
 
-# Ensure the output directory exists
-output_dir = "../media"
-os.makedirs(output_dir, exist_ok=True)
-
-# Create a VideoWriter object
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-out = cv2.VideoWriter(os.path.join(output_dir, 'helix.mp4'), fourcc, fps, (width, height))
-
-# Create a binary file for LED output
-binary_output = open(os.path.join(output_dir, 'helix.bin'), 'wb')
-
-def adjust_contrast_brightness(image, contrast=1.0, brightness=0):
-    return cv2.addWeighted(image, contrast, image, 0, brightness)
-
-def apply_black_threshold(image, threshold):
-    return np.where(image < threshold, 0, image)
-
 # Helix properties
 helix_points = 100  # Increased number of points for smoother helix
 radius = 100  # Initial radius of the helix
@@ -39,7 +22,7 @@ point_radius = 6  # Slightly smaller points for better look
 RED = (0, 0, 255)
 BLUE = (255, 0, 0)
 
-def draw_helix(img, frame, zoom_factor):
+def draw_helix(canvas, frame, zoom_factor):
     center_x = width // 2
     center_y = height // 2
 
@@ -114,68 +97,35 @@ def draw_helix(img, frame, zoom_factor):
             color = tuple(int(c * brightness) for c in point['color'])
 
             # Draw line segment
-            points = np.array([(int(p['x']), int(p['y'])) for p in segment])
+            points = [(p['x'], p['y']) for p in segment]
             if len(points) > 1:
                 thickness = max(1, int((line_thickness + 3 * z_normalized) * zoom_factor))
-                cv2.polylines(img, [points], False, color, thickness, lineType=cv2.LINE_AA)
+                canvas.polylines(points, False, color, thickness, line_type=cv2.LINE_AA)
 
             # Draw point
-            point_size = int((point_radius + 3 * z_normalized) * zoom_factor)
-            cv2.circle(img, (int(point['x']), int(point['y'])),
-                      point_size, color, -1, lineType=cv2.LINE_AA)
+            point_size = (point_radius + 3 * z_normalized) * zoom_factor
+            canvas.circle((point['x'], point['y']), point_size, color, -1, line_type=cv2.LINE_AA)
 
             # Remove drawn segment to avoid redrawing
             segments.pop(phase_key, None)
 
-# Animation loop
-for frame in range(total_frames):
+def render(frame, scale=1.0, zoom=1.0):
     # Create a black background
-    img = np.zeros((height, width, 3), dtype=np.uint8)
+    canvas = Canvas(width, height, scale, zoom)
 
     # Calculate zoom factor (starting very zoomed in, then zooming out)
     t = frame / total_frames
     zoom_factor = 3.0 - t * zoom_speed * 2.5  # Start more zoomed in, zoom out more
 
     # Draw the helix
-    draw_helix(img, frame, zoom_factor)
+    draw_helix(canvas, frame, zoom_factor)
 
     # Add stronger glow effect
-    img_glow = cv2.GaussianBlur(img, (21, 21), 0)
-    img = cv2.addWeighted(img, 1, img_glow, 0.7, 0)
-
-    # Write the frame to MP4
-    out.write(img)
-
-    # Process frame for binary output
-    small_frame = cv2.resize(img, (40, 96))
-    frame_rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-    # Convert to LAB color space
-    lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
-    l, a, b = cv2.split(lab)
-
-    # Apply CLAHE
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-    cl = clahe.apply(l)
-
-    # Merge channels
-    limg = cv2.merge((cl,a,b))
-
-    # Convert back to RGB
-    enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
-
-    # Adjust contrast and brightness
-    adjusted = adjust_contrast_brightness(enhanced, contrast=1.2, brightness=-10)
-
-    # Apply threshold
-    final = apply_black_threshold(adjusted, threshold=20)
+    canvas.glow(21, 0.7)
 
-    # Write to binary file
-    binary_output.write(final.astype(np.uint8).tobytes())
+    return canvas.img
 
-# Release everything
-out.release()
-binary_output.close()
+EFFECT = Effect('helix', render, total_frames, fps, width, height, 'generator')
 
-print(f"Video generated: {os.path.join(output_dir, 'helix.mp4')}")
-print(f"Binary file generated: {os.path.join(output_dir, 'helix.bin')}")
\ No newline at end of file
+if __name__ == "__main__":
+    main(EFFECT)
@@ -1,7 +1,6 @@
-import cv2
-import numpy as np
 import math
-import os
+
+from generator import Canvas, Effect, main
 
 # Video settings
 width, height = 400, 960
@@ -18,17 +17,6 @@ def calculate_x_position(frame):
     progress = frame / total_frames
     return int(-pacman_radius + progress * total_distance)  # Start completely off-screen
 
-# Ensure the output directory exists
-output_dir = "../media"
-os.makedirs(output_dir, exist_ok=True)
-
-# Create a VideoWriter object
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-out = cv2.VideoWriter(os.path.join(output_dir, 'packman.mp4'), fourcc, fps, (width, height))
-
-# Create a binary file for LED output
-binary_output = open(os.path.join(output_dir, 'packman.bin'), 'wb')
-
 # Colors
 BLACK = (0, 0, 0)
 YELLOW = (0, 255, 255)
@@ -38,91 +26,51 @@ BRIGHT_WHITE = (255, 255, 255)  # Bright white for pills
 pill_radius = 20
 pill_positions = [120, 240, 360]  # Adjusted X-coordinates of pills
 
-def adjust_contrast_brightness(image, contrast=1.0, brightness=0):
-    return cv2.addWeighted(image, contrast, image, 0, brightness)
-
-def apply_black_threshold(image, threshold):
-    return np.where(image < threshold, 0, image)
-
-def draw_pacman(img, x, y, angle):
+def draw_pacman(canvas, x, y, angle):
     # Draw the main body as an arc
     start_angle = angle
     end_angle = 2 * math.pi - angle
-    cv2.ellipse(img, (x, y), (pacman_radius, pacman_radius),
-                0, start_angle * 180 / math.pi, end_angle * 180 / math.pi, YELLOW, -1)
+    canvas.ellipse((x, y), (pacman_radius, pacman_radius),
+                   0, start_angle * 180 / math.pi, end_angle * 180 / math.pi, YELLOW, -1)
 
     # Draw lines to close the mouth (thicker lines for better visibility)
-    mouth_end_1 = (int(x + pacman_radius * math.cos(start_angle)),
-                   int(y - pacman_radius * math.sin(start_angle)))
-    mouth_end_2 = (int(x + pacman_radius * math.cos(end_angle)),
-                   int(y - pacman_radius * math.sin(end_angle)))
+    mouth_end_1 = (x + pacman_radius * math.cos(start_angle),
+                   y - pacman_radius * math.sin(start_angle))
+    mouth_end_2 = (x + pacman_radius * math.cos(end_angle),
+                   y - pacman_radius * math.sin(end_angle))
 
-    cv2.line(img, (x, y), mouth_end_1, YELLOW, 4)
-    cv2.line(img, (x, y), mouth_end_2, YELLOW, 4)
+    canvas.line((x, y), mouth_end_1, YELLOW, 4)
+    canvas.line((x, y), mouth_end_2, YELLOW, 4)
 
-def draw_pill(img, x):
+def draw_pill(canvas, x):
     # Draw pill with a slight glow effect for better visibility
-    cv2.circle(img, (x, height // 2), pill_radius + 4, (128, 128, 128), -1)  # Outer glow
-    cv2.circle(img, (x, height // 2), pill_radius, BRIGHT_WHITE, -1)         # Inner bright part
+    canvas.circle((x, height // 2), pill_radius + 4, (128, 128, 128), -1)  # Outer glow
+    canvas.circle((x, height // 2), pill_radius, BRIGHT_WHITE, -1)         # Inner bright part
 
-for frame in range(total_frames):
+def render(frame, scale=1.0, zoom=1.0):
     # Create a black background
-    img = np.zeros((height, width, 3), dtype=np.uint8)
+    canvas = Canvas(width, height, scale, zoom)
 
-    # Calculate Pac-Man's position
+    # Calculate Pac-Man's position, partially visible on every frame of the journey
     pacman_x = calculate_x_position(frame)
     pacman_y = height // 2
 
-    # Only generate frame if Pac-Man is at least partially visible
-    if pacman_x >= -pacman_radius and pacman_x <= width + pacman_radius:
-        # Calculate mouth angle (oscillating between 0 and pi/4, slower movement)
-        mouth_angle = abs(math.pi / 4 * math.sin(frame * 0.2))
-
-        # Draw Pac-Man
-        draw_pacman(img, pacman_x, pacman_y, mouth_angle)
-
-        # Draw and check collision with pills
-        for pill_x in pill_positions:
-            if pacman_x - pacman_radius > pill_x:
-                continue  # Pill has been passed, don't draw it
-            if abs(pacman_x - pill_x) > pacman_radius:
-                draw_pill(img, pill_x)
-
-        # Write the frame to MP4
-        out.write(img)
-
-        # Process frame for binary output
-        small_frame = cv2.resize(img, (40, 96))
-        frame_rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        # Convert to LAB color space
-        lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
-        l, a, b = cv2.split(lab)
-
-        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization) to L-channel
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-        cl = clahe.apply(l)
-
-        # Merge the CLAHE enhanced L-channel back with A and B channels
-        limg = cv2.merge((cl,a,b))
-
-        # Convert back to RGB color space
-        enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
+    # Calculate mouth angle (oscillating between 0 and pi/4, slower movement)
+    mouth_angle = abs(math.pi / 4 * math.sin(frame * 0.2))
 
-        # Apply custom contrast and brightness adjustment
-        adjusted = adjust_contrast_brightness(enhanced, contrast=1.2, brightness=-10)
+    # Draw Pac-Man
+    draw_pacman(canvas, pacman_x, pacman_y, mouth_angle)
 
-        # Apply black threshold
-        final = apply_black_threshold(adjusted, threshold=20)
+    # Draw and check collision with pills
+    for pill_x in pill_positions:
+        if pacman_x - pacman_radius > pill_x:
+            continue  # Pill has been passed, don't draw it
+        if abs(pacman_x - pill_x) > pacman_radius:
+            draw_pill(canvas, pill_x)
 
-        # Write to binary file
-        binary_output.write(final.astype(np.uint8).tobytes())
-    elif pacman_x > width + pacman_radius:
-        break  # Stop when Pac-Man has completely exited
+    return canvas.img
 
-# Release the VideoWriter and close the binary file
-out.release()
-binary_output.close()
+EFFECT = Effect('packman', render, total_frames, fps, width, height, 'generator')
 
-print(f"Video generated: {os.path.join(output_dir, 'packman.mp4')}")
-print(f"Binary file generated: {os.path.join(output_dir, 'packman.bin')}")
+if __name__ == "__main__":
+    main(EFFECT)
@@ -0,0 +1,157 @@
+import argparse
+import os
+import struct
+import numpy as np
+
+from framing import FRAME_RGB, OVERHEAD
+
+FRAME_DELTA = 1  # Changed pixel runs against the previous frame, see DeltaEncoder
+
+WIDTH, HEIGHT = 40, 96
+FRAME_SIZE = WIDTH * HEIGHT * 3
+RUN = struct.Struct('<HH')  # First pixel, pixel count
+
+
+class DeltaEncoder:
+    """
+    Encodes frames as runs of changed pixels against the previously sent frame.
+
+    Delta payload: repeated [first_pixel u16][count u16][count * 3 RGB bytes], pixels in
+    row-major order. Runs separated by up to `merge_gap` unchanged pixels are merged since a
+    run header costs more than re-sending a pixel. A full FRAME_RGB keyframe goes out every
+    `keyframe_interval` frames, and whenever the delta would not be smaller.
+    """
+
+    def __init__(self, keyframe_interval=30, merge_gap=1, width=WIDTH, height=HEIGHT):
+        self.keyframe_interval = keyframe_interval
+        self.merge_gap = merge_gap
+        self.num_pixels = width * height
+        self.previous = None
+        self.since_keyframe = 0
+
+    def force_keyframe(self):
+        self.previous = None
+
+    def encode(self, frame):
+        """Returns (frame_type, payload) for a (height, width, 3) uint8 frame or its raw bytes."""
+        if not isinstance(frame, np.ndarray):
+            frame = np.frombuffer(frame, dtype=np.uint8)
+        pixels = frame.reshape(self.num_pixels, 3)
+
+        if self.previous is None or self.since_keyframe >= self.keyframe_interval - 1:
+            return self._keyframe(pixels)
+
+        changed = (pixels != self.previous).any(axis=1)
+        if not changed.any():
+            self.since_keyframe += 1
+            return FRAME_DELTA, b''
+
+        starts, ends = self._runs(changed)
+        size = len(starts) * RUN.size + int((ends - starts).sum()) * 3
+        if size >= pixels.nbytes:
+            return self._keyframe(pixels)
+
+        payload = bytearray(size)
+        pos = 0
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            RUN.pack_into(payload, pos, start, end - start)
+            pos += RUN.size
+            run = pixels[start:end].tobytes()
+            payload[pos:pos + len(run)] = run
+            pos += len(run)
+
+        # Runs include the merged gaps, so this keeps the reference identical to the decoder's
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self.previous[start:end] = pixels[start:end]
+        self.since_keyframe += 1
+        return FRAME_DELTA, bytes(payload)
+
+    def _keyframe(self, pixels):
+        self.previous = pixels.copy()
+        self.since_keyframe = 0
+        return FRAME_RGB, pixels.tobytes()
+
+    def _runs(self, changed):
+        # Run boundaries from the edges of the changed mask
+        padded = np.concatenate(([False], changed, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        starts, ends = edges[0::2], edges[1::2]
+
+        # Merge runs separated by short gaps
+        if len(starts) > 1 and self.merge_gap > 0:
+            keep = (starts[1:] - ends[:-1]) > self.merge_gap
+            starts = np.concatenate(([starts[0]], starts[1:][keep]))
+            ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+        return starts, ends
+
+
+class DeltaDecoder:
+    """Reference decoder, mirrors what the firmware needs to do with FRAME_RGB/FRAME_DELTA payloads"""
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.frame = None
+
+    def reset(self):
+        # Call after lost frames, deltas are ignored until the next keyframe
+        self.frame = None
+
+    def decode(self, frame_type, payload):
+        """Returns the current (height, width, 3) frame, or None while waiting for a keyframe."""
+        if frame_type == FRAME_RGB:
+            self.frame = np.frombuffer(payload, dtype=np.uint8).reshape(self.height, self.width, 3).copy()
+            return self.frame
+        if frame_type != FRAME_DELTA:
+            raise ValueError(f"Unknown frame type: {frame_type}")
+        if self.frame is None:
+            return None
+
+        pixels = self.frame.reshape(-1, 3)
+        pos = 0
+        while pos < len(payload):
+            start, count = RUN.unpack_from(payload, pos)
+            pos += RUN.size
+            pixels[start:start + count] = np.frombuffer(payload, dtype=np.uint8, count=count * 3, offset=pos).reshape(count, 3)
+            pos += count * 3
+        return self.frame
+
+
+def clip_stats(filename, keyframe_interval=30, baud_rate=2000000, verify=True):
+    """Encode a .bin clip, check the round trip and print bytes-per-frame statistics."""
+    frames = np.fromfile(filename, dtype=np.uint8)
+    total_frames = len(frames) // FRAME_SIZE
+    frames = frames[:total_frames * FRAME_SIZE].reshape(total_frames, HEIGHT, WIDTH, 3)
+
+    encoder = DeltaEncoder(keyframe_interval)
+    decoder = DeltaDecoder()
+    sizes = np.empty(total_frames, dtype=np.int64)
+    keyframes = 0
+    for n, frame in enumerate(frames):
+        frame_type, payload = encoder.encode(frame)
+        sizes[n] = len(payload) + OVERHEAD
+        keyframes += frame_type == FRAME_RGB
+        if verify and not np.array_equal(decoder.decode(frame_type, payload), frame):
+            raise AssertionError(f"{filename}: frame {n} does not round-trip")
+
+    # 8N1 serial framing, 10 bits on the wire per byte
+    link_bytes_per_second = baud_rate / 10
+    raw = FRAME_SIZE + OVERHEAD
+    print(f"{os.path.basename(filename)}: {total_frames} frames, {keyframes} keyframes")
+    print(f"  bytes/frame  mean {sizes.mean():.0f}  median {np.median(sizes):.0f}  "
+          f"p95 {np.percentile(sizes, 95):.0f}  max {sizes.max()}  (raw {raw})")
+    print(f"  ratio {raw / sizes.mean():.2f}x, max sustainable FPS at {baud_rate} baud: "
+          f"{link_bytes_per_second / sizes.mean():.1f} mean / {link_bytes_per_second / sizes.max():.1f} worst case "
+          f"(raw {link_bytes_per_second / raw:.1f})")
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report delta-encoded bytes per frame for .bin clips')
+    parser.add_argument('files', nargs='+', help='Binary clips to analyse')
+    parser.add_argument('--keyframe-interval', type=int, default=30, help='Frames between keyframes')
+    parser.add_argument('--baud', type=int, default=2000000, help='Link baud rate used for the FPS estimate')
+    args = parser.parse_args()
+
+    for filename in args.files:
+        clip_stats(filename, args.keyframe_interval, args.baud)
@@ -0,0 +1,318 @@
+import argparse
+import bisect
+import os
+import select
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from framing import open_loopback
+
+FRAME_SIZE = 40 * 96 * 3     # SERIAL_BUFFER_SIZE in the firmware
+READ_TIMEOUT = 1.0           # Serial.readBytes default timeout
+BURST = 4096                 # Bytes the throttle lets through at once after an idle period
+
+
+class FakeTeensy:
+    """
+    Pseudo-terminal stand-in for the wall's USB serial port. Open `path` with serial.Serial like
+    the real device. A reader thread consumes the stream the way handleSerialVideo does: once any
+    byte is available it calls readBytes for exactly one frame, a full frame is shown, a short read
+    after the timeout is thrown away (so the following frames are misaligned).
+
+    With byte_rate set, reading is throttled to that many bytes per second; the pty buffer then
+    fills up and the sender's writes block, like a slow device.
+
+    Records completed frames as (time, start_offset, data) and short reads as (time, start_offset,
+    bytes), offsets counting every byte consumed since start().
+    """
+
+    def __init__(self, frame_size=FRAME_SIZE, byte_rate=None, timeout=READ_TIMEOUT, keep_frames=True):
+        self.frame_size = frame_size
+        self.byte_rate = byte_rate
+        self.timeout = timeout
+        self.keep_frames = keep_frames
+        self.path, self.master, self.slave = open_loopback()
+        self.frames = []
+        self.partial = []
+        self.offset = 0
+        self.last_data_time = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def drain(self, idle=0.2, limit=10.0):
+        """Wait until nothing has arrived for `idle` seconds, for when the sender has finished"""
+        deadline = time.perf_counter() + limit
+        while time.perf_counter() < deadline:
+            last = self.last_data_time
+            if last is not None and time.perf_counter() - last >= idle:
+                break
+            time.sleep(idle / 4)
+
+    def _wait_readable(self, timeout):
+        readable, _, _ = select.select([self.master], [], [], timeout)
+        return bool(readable)
+
+    def _run(self):
+        budget = BURST
+        refilled = time.perf_counter()
+        while not self.stop_event.is_set():
+            # if (Serial.available() > 0) handleSerialVideo();
+            if not self._wait_readable(0.05):
+                continue
+
+            # readBytes(serialBuffer, SERIAL_BUFFER_SIZE): read until full or the timeout runs out
+            start_offset = self.offset
+            start = time.perf_counter()
+            frame = bytearray()
+            while len(frame) < self.frame_size:
+                now = time.perf_counter()
+                remaining = start + self.timeout - now
+                if remaining <= 0 or self.stop_event.is_set():
+                    break
+                wanted = self.frame_size - len(frame)
+                if self.byte_rate:
+                    budget = min(BURST, budget + (now - refilled) * self.byte_rate)
+                    refilled = now
+                    if budget < 1:
+                        time.sleep(min(remaining, (1 - budget) / self.byte_rate))
+                        continue
+                    wanted = min(wanted, int(budget))
+                if not self._wait_readable(min(remaining, 0.05)):
+                    continue
+                try:
+                    data = os.read(self.master, wanted)
+                except OSError:
+                    return
+                frame += data
+                self.offset += len(data)
+                self.last_data_time = time.perf_counter()
+                if self.byte_rate:
+                    budget -= len(data)
+
+            if len(frame) == self.frame_size:
+                self.frames.append((time.perf_counter(), start_offset, bytes(frame) if self.keep_frames else None))
+            elif frame:
+                self.partial.append((time.perf_counter(), start_offset, len(frame)))
+
+    def save(self, filename):
+        """Write the received frames as a .bin clip"""
+        with open(filename, 'wb') as f:
+            for _, _, data in self.frames:
+                if data is not None:
+                    f.write(data)
+
+
+class RecordingSerial:
+    """Wraps an open serial port and timestamps every write by its starting byte offset"""
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.write_times = []
+        self.write_offsets = []
+        self.offset = 0
+
+    def write(self, data):
+        self.write_times.append(time.perf_counter())
+        self.write_offsets.append(self.offset)
+        written = self.ser.write(data)
+        self.offset += len(data)
+        return written
+
+    def sent_time(self, offset):
+        """When the write containing byte `offset` started"""
+        return self.write_times[bisect.bisect_right(self.write_offsets, offset) - 1]
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+
+def report(name, device, sender, elapsed, frame_size=FRAME_SIZE):
+    """Summarise one run: achieved fps, latency from first byte written to frame shown, drops and misalignment"""
+    aligned = [(t, offset) for t, offset, _ in device.frames if offset % frame_size == 0]
+    misaligned = len(device.frames) - len(aligned)
+    sent = sender.offset // frame_size
+    latencies = sorted((t - sender.sent_time(offset)) * 1000 for t, offset in aligned)
+    # Rate between the first and last frame shown, so startup and draining don't count
+    times = [t for t, _, _ in device.frames]
+    fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 else 0.0
+    if latencies:
+        p50, p95 = (latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] for p in (50, 95))
+        latency = f"latency p50 {p50:.1f}ms p95 {p95:.1f}ms max {latencies[-1]:.1f}ms"
+    else:
+        latency = "latency n/a"
+    print(f"{name}: sent {sent} frames ({sender.offset / elapsed / 1e3:.0f} KB/s), shown {len(device.frames)} "
+          f"({fps:.1f} fps) | {latency} | dropped {sent - len(aligned)} | "
+          f"misaligned {misaligned} | short reads {len(device.partial)}")
+    return {'sent': sent, 'shown': len(device.frames), 'fps': fps,
+            'misaligned': misaligned, 'short_reads': len(device.partial), 'latencies_ms': latencies}
+
+
+def _open(device):
+    import serial
+    return RecordingSerial(serial.Serial(device.path, 2000000))
+
+
+def _bench_video_bin_stream(device, clip, seconds, fps):
+    from video_bin_stream import BinVideo, stream_frames
+
+    ser = _open(device)
+    with BinVideo(clip) as video:
+        stream_frames(video, ser, fps, duration=seconds)
+    return ser
+
+
+def _bench_video_stream(device, source, seconds, fps):
+    from video_stream import VideoStreamer
+
+    ser = _open(device)
+    streamer = VideoStreamer(ser=ser)
+    streamer.stream_video(source, target_fps=fps, preview=False, duration=seconds)
+    return ser
+
+
+def _bench_send(device, source, seconds, fps, switch_every=0.5):
+    import mido
+    from send import VideoPlayer
+
+    # Two notes on the same clip, switching back and forth to exercise note on latency
+    ser = _open(device)
+    player = VideoPlayer(ser, {60: source, 61: source}, video_folder='')
+    start = time.perf_counter()
+    note = 60
+    while time.perf_counter() - start < seconds:
+        player.handle_message(mido.Message('note_on', note=note, velocity=100))
+        time.sleep(switch_every)
+        note = 121 - note
+    player.handle_message(mido.Message('note_off', note=121 - note))
+    time.sleep(0.1)
+    player.close()
+    print(player.note_on_latency.format())
+    print(player.note_off_latency.format())
+    print(player.cache.summary())
+    ser.close()
+    return ser
+
+
+def _bench_live(device, source, seconds, fps):
+    import mido
+    from live import LiveParams, stream_live
+    from generator import load_effect
+
+    # Tunnel rendered in realtime, with a CC sweep half way through to exercise the parameters
+    ser = _open(device)
+    params = LiveParams()
+    stream_live(load_effect('tunnel'), ser, fps, params=params, duration=seconds / 2)
+    for control, value in ((10, 100), (1, 40), (8, 90)):
+        params.handle_message(mido.Message('control_change', control=control, value=value))
+    stream_live(load_effect('tunnel'), ser, fps, params=params, duration=seconds / 2)
+    ser.close()
+    return ser
+
+
+TOOLS = {
+    'video_bin_stream': _bench_video_bin_stream,
+    'video_stream': _bench_video_stream,
+    'send': _bench_send,
+    'live': _bench_live,
+}
+
+
+def _synthetic_media(folder, fps, num_frames=90, width=40, height=96):
+    # A .bin clip and the same frames as an mp4 at a typical source size
+    clip = os.path.join(folder, 'bench.bin')
+    source = os.path.join(folder, 'bench.mp4')
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), fps, (640, 360))
+    y, x = np.mgrid[0:height, 0:width]
+    with open(clip, 'wb') as f:
+        for n in range(num_frames):
+            frame = np.stack([(x * 6 + n * 3) % 256, (y * 2 + n) % 256, np.full_like(x, n * 5 % 256)], axis=-1)
+            f.write(frame.astype(np.uint8).tobytes())
+            writer.write(cv2.resize(frame.astype(np.uint8), (640, 360), interpolation=cv2.INTER_NEAREST))
+    writer.release()
+    return clip, source
+
+
+def benchmark(tools, seconds=5.0, fps=30, byte_rate=None):
+    """Drive each streaming tool against a fresh fake device and report what the device saw"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        clip, source = _synthetic_media(tmp, fps)
+        for name in tools:
+            with FakeTeensy(byte_rate=byte_rate, keep_frames=False) as device:
+                start = time.perf_counter()
+                sender = TOOLS[name](device, clip if name == 'video_bin_stream' else source, seconds, fps)
+                device.drain()
+                results[name] = report(name, device, sender, time.perf_counter() - start)
+    return results
+
+
+def serve(byte_rate=None, record=None):
+    """Run a fake device until Ctrl-C, printing stats every second"""
+    with FakeTeensy(byte_rate=byte_rate, keep_frames=record is not None) as device:
+        print(f"Fake Teensy on {device.path} (frame {device.frame_size} bytes"
+              f"{f', throttled to {byte_rate} B/s' if byte_rate else ''}), Ctrl-C to stop")
+        shown = 0
+        try:
+            while True:
+                time.sleep(1.0)
+                frames = len(device.frames)
+                misaligned = sum(offset % device.frame_size != 0 for _, offset, _ in device.frames)
+                print(f"FPS: {frames - shown} | shown {frames} | misaligned {misaligned} | "
+                      f"short reads {len(device.partial)}")
+                shown = frames
+        except KeyboardInterrupt:
+            pass
+        if record:
+            device.save(record)
+            print(f"Saved {len(device.frames)} frames to {record}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pseudo-terminal stand-in for the Teensy serial video input')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run a fake device and print its port path')
+    serve_parser.add_argument('--byte-rate', type=int, default=None, help='Throttle reading to this many bytes/s')
+    serve_parser.add_argument('--record', default=None, help='Save received frames to this .bin file on exit')
+
+    bench_parser = subparsers.add_parser('bench', help='Drive the streaming tools against a fake device')
+    bench_parser.add_argument('tools', nargs='*', help=f"Tools to run (default: all of {', '.join(TOOLS)})")
+    bench_parser.add_argument('--seconds', type=float, default=5.0, help='Streaming time per tool')
+    bench_parser.add_argument('--fps', type=float, default=30, help='Target frame rate')
+    bench_parser.add_argument('--byte-rate', type=int, default=None, help='Throttle the device to this many bytes/s')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.byte_rate, args.record)
+    else:
+        unknown = set(args.tools) - set(TOOLS)
+        if unknown:
+            parser.error(f"unknown tools: {', '.join(sorted(unknown))}")
+        benchmark(args.tools or list(TOOLS), args.seconds, args.fps, args.byte_rate)
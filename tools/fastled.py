@@ -0,0 +1,412 @@
+import argparse
+import sys
+import time
+from functools import lru_cache
+import numpy as np
+
+# NumPy ports of the FastLED colour functions the firmware uses in updateLEDs, operating on whole
+# arrays of pixels. Integer behaviour (uint8 wrap-around, truncating division, FASTLED_SCALE8_FIXED)
+# follows the FastLED/lib8tion C code, the reference_* functions are straight scalar translations
+# used to check the vectorized versions. The conversions run off precomputed tables (see below).
+#
+#   python fastled.py verify   test vectors plus vectorized vs scalar on edge values and random colours
+#   python fastled.py bench    frames per second at 40x96 (or --size)
+
+HUE_RED, HUE_ORANGE, HUE_YELLOW, HUE_GREEN = 0, 32, 64, 96
+HUE_AQUA, HUE_BLUE, HUE_PURPLE, HUE_PINK = 128, 160, 192, 224
+
+
+def scale8(i, scale):
+    """lib8tion scale8 with FASTLED_SCALE8_FIXED: (i * (1 + scale)) >> 8"""
+    return (np.asarray(i, dtype=np.int32) * (1 + np.asarray(scale, dtype=np.int32))) >> 8
+
+
+def scale8_video(i, scale):
+    """Like scale8 but never scales a non-zero value down to zero"""
+    i = np.asarray(i, dtype=np.int32)
+    scale = np.asarray(scale, dtype=np.int32)
+    return ((i * scale) >> 8) + ((i != 0) & (scale != 0))
+
+
+def qadd8(i, j):
+    return np.minimum(np.asarray(i, dtype=np.int32) + j, 255)
+
+
+def qsub8(i, j):
+    return np.maximum(np.asarray(i, dtype=np.int32) - j, 0)
+
+
+def sqrt16(x):
+    """lib8tion integer square root, floor(sqrt(x)) capped at 255"""
+    return np.minimum(np.floor(np.sqrt(np.asarray(x, dtype=np.float64))).astype(np.int32), 255)
+
+
+# 256-entry tables. Every sqrt16 and division in the two conversions has a uint8 operand, and
+# with FASTLED_SCALE8_FIXED the saturation/value special cases fall out of the general formulas,
+# so the conversions reduce to table lookups plus a few multiplies and shifts.
+BYTES = np.arange(256, dtype=np.int32)
+SQRT_TABLE = sqrt16(BYTES * 256)                         # sqrt16(x * 256), also V for unsaturated colours
+SATURATION_TABLE = 255 - SQRT_TABLE                      # S from the white component
+RECIPROCAL_TABLE = 65535 // np.maximum(BYTES, 1)         # Scale-up factors, 257 (identity) at 255
+DESAT_TABLE = scale8_video(255 - BYTES, 255 - BYTES)     # White added by hsv2rgb for a saturation
+VALUE_TABLE = 1 + np.where(BYTES != 255, scale8_video(BYTES, BYTES), 255)   # hsv2rgb dimming, as 1 + scale
+
+
+def scale8_table(scale):
+    """scale8(0..255, scale) as a 256-entry table"""
+    return scale8(BYTES, scale)
+
+
+def _rainbow(hue):
+    # The fully saturated, full brightness colour for each hue, yellow boost Y1
+    offset8 = (hue & 0x1F) << 3
+    third = scale8(offset8, 256 // 3)
+    twothirds = scale8(offset8, (256 * 2) // 3)
+    section = hue >> 5
+    zero = np.zeros_like(third)
+    r = np.choose(section, [255 - third, zero + 171, 171 - twothirds, zero, zero, third, 85 + third, 170 + third])
+    g = np.choose(section, [third, 85 + third, 170 + third, 255 - third, 171 - twothirds, zero, zero, zero])
+    b = np.choose(section, [zero, zero, zero, third, 85 + twothirds, 255 - third, 171 - third, 85 - third])
+    return np.stack([r, g, b], axis=-1)
+
+
+RAINBOW_TABLE = _rainbow(BYTES)
+
+
+def _hue(r, g, b):
+    # rgb2hsv_approximate's hue for scaled-up components, one of which is zero
+    highest = np.maximum(np.maximum(r, g), b)
+    red_highest = highest == r
+    green_highest = ~red_highest & (highest == g)
+    blue_highest = ~red_highest & ~green_highest
+    yellow_green = (scale8(qsub8(171, r), 47) + scale8(qsub8(g, 171), 96)) & 0xFF
+    h = np.select(
+        [red_highest & (g == 0),
+         red_highest & ((r - g) > g),
+         red_highest,
+         green_highest & (b == 0),
+         green_highest & ((g - b) > b),
+         green_highest,
+         blue_highest & (r == 0),
+         blue_highest & ((b - r) > r)],
+        [(HUE_PURPLE + HUE_PINK) // 2 + scale8(qsub8(r, 128), 96),
+         HUE_RED + scale8(g, 96),
+         HUE_ORANGE + scale8(qsub8(((g - 85) + (171 - r)) & 0xFF, 4), 96),
+         HUE_YELLOW + yellow_green // 2,
+         HUE_GREEN + scale8(b, 96),
+         HUE_AQUA + scale8(qsub8(b, 85), 48),
+         HUE_AQUA + (HUE_BLUE - HUE_AQUA) // 4 + scale8(qsub8(b, 128), 48),
+         HUE_BLUE + scale8(r, 96)],
+        HUE_PURPLE + scale8(qsub8(r, 85), 96))
+    return ((h + 1) & 0xFF).astype(np.uint8)
+
+
+def _hue_table():
+    # After the white component is removed one channel is zero, so the hue only depends on which
+    # one and on the other two: a (3, 256, 256) table indexed by zero channel, then the others in order
+    high, low = np.divmod(np.arange(1 << 16, dtype=np.int32), 256)
+    zero = np.zeros_like(high)
+    return np.stack([_hue(zero, high, low), _hue(high, zero, low), _hue(high, low, zero)]).reshape(-1)
+
+
+HUE_TABLE = _hue_table()
+
+
+def rgb2hsv_approximate(rgb):
+    """(..., 3) uint8 RGB to (..., 3) uint8 HSV, FastLED's rgb2hsv_approximate"""
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    r, g, b = (rgb[..., channel].astype(np.int32) for channel in range(3))
+
+    # Remove the common white component
+    desat = np.minimum(np.minimum(r, g), b)
+    r -= desat
+    g -= desat
+    b -= desat
+    s = SATURATION_TABLE[desat]
+
+    # Scale up to compensate for desaturation, then for low totals. Results are stored back into
+    # uint8, the table's 257 at s/total 255 leaves the values alone
+    scaleup = RECIPROCAL_TABLE[s]
+    r, g, b = ((r * scaleup) >> 8) & 0xFF, ((g * scaleup) >> 8) & 0xFF, ((b * scaleup) >> 8) & 0xFF
+    total = r + g + b
+    scaleup = RECIPROCAL_TABLE[np.minimum(total, 255)]
+    r, g, b = ((r * scaleup) >> 8) & 0xFF, ((g * scaleup) >> 8) & 0xFF, ((b * scaleup) >> 8) & 0xFF
+
+    hsv = np.empty(rgb.shape, dtype=np.uint8)
+    hsv[..., 0] = HUE_TABLE[np.where(r == 0, (g << 8) | b, np.where(g == 0, 65536 | (r << 8) | b, 131072 | (r << 8) | g))]
+    hsv[..., 1] = s
+    hsv[..., 2] = np.where(total > 255, 255, SQRT_TABLE[np.minimum(desat + total, 255)])
+
+    # Grays have hue and saturation 0 and keep the white component as value
+    gray = total == 0
+    hsv[gray] = 0
+    hsv[..., 2][gray] = (255 - s)[gray]
+    return hsv
+
+
+def _hsv2rgb(hue, desat, value_scale):
+    # Rainbow colour, desaturated towards white, then dimmed. desat and value_scale come from
+    # DESAT_TABLE and VALUE_TABLE (composed with any adjustment tables)
+    rgb = RAINBOW_TABLE[hue]
+    desat = desat[..., np.newaxis]
+    rgb = ((rgb * (256 - desat)) >> 8) + desat
+    return ((rgb * value_scale[..., np.newaxis]) >> 8).astype(np.uint8)
+
+
+def hsv2rgb_rainbow(hsv):
+    """(..., 3) uint8 HSV to (..., 3) uint8 RGB, FastLED's hsv2rgb_rainbow (yellow boost Y1)"""
+    hsv = np.asarray(hsv, dtype=np.uint8)
+    return _hsv2rgb(hsv[..., 0], DESAT_TABLE[hsv[..., 1]], VALUE_TABLE[hsv[..., 2]])
+
+
+@lru_cache(maxsize=64)
+def _adjust_tables(hue, saturation, value):
+    # Hue rotation and the saturation/value scale8 folded into the hsv2rgb tables
+    return ((BYTES + hue) & 0xFF, DESAT_TABLE[scale8_table(saturation)], VALUE_TABLE[scale8_table(value)])
+
+
+def adjust_hsv(rgb, hue=0, saturation=255, value=255):
+    """
+    The firmware's per-layer HSV adjustment: rgb2hsv_approximate, hue += hue, saturation and
+    value through scale8, back with hsv2rgb_rainbow.
+    """
+    hsv = rgb2hsv_approximate(rgb)
+    hue_table, desat_table, value_table = _adjust_tables(int(hue), int(saturation), int(value))
+    return _hsv2rgb(hue_table[hsv[..., 0]], desat_table[hsv[..., 1]], value_table[hsv[..., 2]])
+
+
+# Scalar translations of the C code, slow but easy to compare line by line with FastLED
+def _scale8(i, scale):
+    return (i * (1 + scale)) >> 8
+
+
+def _scale8_video(i, scale):
+    return ((i * scale) >> 8) + (1 if i and scale else 0)
+
+
+def _qsub8(i, j):
+    return max(i - j, 0)
+
+
+def _sqrt16(x):
+    return min(int(np.floor(np.sqrt(x))), 255)
+
+
+def reference_rgb2hsv_approximate(r, g, b):
+    desat = min(r, g, b)
+    r, g, b = r - desat, g - desat, b - desat
+    s = 255 - desat
+    if s != 255:
+        s = 255 - _sqrt16((255 - s) * 256)
+    if r + g + b == 0:
+        return 0, 0, 255 - s
+
+    if s < 255:
+        if s == 0:
+            s = 1
+        scaleup = 65535 // s
+        r = (r * scaleup // 256) & 0xFF
+        g = (g * scaleup // 256) & 0xFF
+        b = (b * scaleup // 256) & 0xFF
+
+    total = r + g + b
+    if total < 255:
+        if total == 0:
+            total = 1
+        scaleup = 65535 // total
+        r = (r * scaleup // 256) & 0xFF
+        g = (g * scaleup // 256) & 0xFF
+        b = (b * scaleup // 256) & 0xFF
+
+    if total > 255:
+        v = 255
+    else:
+        v = min(desat + total, 255)
+        if v != 255:
+            v = _sqrt16(v * 256)
+
+    highest = max(r, g, b)
+    if highest == r:
+        if g == 0:
+            h = (HUE_PURPLE + HUE_PINK) // 2 + _scale8(_qsub8(r, 128), 96)
+        elif (r - g) > g:
+            h = HUE_RED + _scale8(g, 96)
+        else:
+            h = HUE_ORANGE + _scale8(_qsub8(((g - 85) + (171 - r)) & 0xFF, 4), 96)
+    elif highest == g:
+        if b == 0:
+            radj = _scale8(_qsub8(171, r), 47)
+            gadj = _scale8(_qsub8(g, 171), 96)
+            h = HUE_YELLOW + ((radj + gadj) & 0xFF) // 2
+        elif (g - b) > b:
+            h = HUE_GREEN + _scale8(b, 96)
+        else:
+            h = HUE_AQUA + _scale8(_qsub8(b, 85), 48)
+    else:
+        if r == 0:
+            h = HUE_AQUA + (HUE_BLUE - HUE_AQUA) // 4 + _scale8(_qsub8(b, 128), 48)
+        elif (b - r) > r:
+            h = HUE_BLUE + _scale8(r, 96)
+        else:
+            h = HUE_PURPLE + _scale8(_qsub8(r, 85), 96)
+    return (h + 1) & 0xFF, s, v
+
+
+def reference_hsv2rgb_rainbow(hue, sat, val):
+    offset8 = (hue & 0x1F) << 3
+    third = _scale8(offset8, 256 // 3)
+    twothirds = _scale8(offset8, (256 * 2) // 3)
+    section = hue >> 5
+    if section == 0:
+        r, g, b = 255 - third, third, 0
+    elif section == 1:
+        r, g, b = 171, 85 + third, 0
+    elif section == 2:
+        r, g, b = 171 - twothirds, 170 + third, 0
+    elif section == 3:
+        r, g, b = 0, 255 - third, third
+    elif section == 4:
+        r, g, b = 0, 171 - twothirds, 85 + twothirds
+    elif section == 5:
+        r, g, b = third, 0, 255 - third
+    elif section == 6:
+        r, g, b = 85 + third, 0, 171 - third
+    else:
+        r, g, b = 170 + third, 0, 85 - third
+
+    if sat != 255:
+        if sat == 0:
+            r = g = b = 255
+        else:
+            desat = _scale8_video(255 - sat, 255 - sat)
+            satscale = 255 - desat
+            r = (_scale8(r, satscale) + desat) & 0xFF
+            g = (_scale8(g, satscale) + desat) & 0xFF
+            b = (_scale8(b, satscale) + desat) & 0xFF
+
+    if val != 255:
+        val = _scale8_video(val, val)
+        if val == 0:
+            r = g = b = 0
+        else:
+            r, g, b = _scale8(r, val), _scale8(g, val), _scale8(b, val)
+    return r, g, b
+
+
+def reference_adjust_hsv(r, g, b, hue=0, saturation=255, value=255):
+    h, s, v = reference_rgb2hsv_approximate(r, g, b)
+    return reference_hsv2rgb_rainbow((h + hue) & 0xFF, _scale8(s, saturation), _scale8(v, value))
+
+
+# Known input/output pairs: primaries and the section boundaries of the rainbow, white, black,
+# and the quirks of the approximate inverse (orange lands on 112, magenta wraps round to 1)
+HSV2RGB_VECTORS = [
+    ((0, 255, 255), (255, 0, 0)),
+    ((32, 255, 255), (171, 85, 0)),
+    ((64, 255, 255), (171, 170, 0)),
+    ((96, 255, 255), (0, 255, 0)),
+    ((128, 255, 255), (0, 171, 85)),
+    ((160, 255, 255), (0, 0, 255)),
+    ((192, 255, 255), (85, 0, 171)),
+    ((224, 255, 255), (170, 0, 85)),
+    ((0, 0, 255), (255, 255, 255)),
+    ((42, 0, 0), (0, 0, 0)),
+    ((100, 128, 255), (64, 247, 71)),
+    ((160, 255, 128), (0, 0, 65)),
+    ((200, 100, 50), (6, 4, 8)),
+]
+
+RGB2HSV_VECTORS = [
+    ((255, 0, 0), (1, 255, 255)),
+    ((0, 255, 0), (96, 255, 255)),
+    ((0, 0, 255), (161, 255, 255)),
+    ((255, 255, 0), (64, 255, 255)),
+    ((0, 255, 255), (161, 255, 255)),
+    ((255, 0, 255), (1, 255, 255)),
+    ((255, 255, 255), (0, 0, 255)),
+    ((0, 0, 0), (0, 0, 0)),
+    ((128, 128, 128), (0, 0, 181)),
+    ((255, 128, 0), (112, 255, 255)),
+    ((10, 20, 30), (145, 205, 108)),
+    ((200, 100, 50), (86, 142, 198)),
+]
+
+# (hue, saturation, value) adjustments checked against the scalar translation
+ADJUSTMENTS = [(0, 255, 255), (37, 180, 200), (128, 255, 64), (254, 0, 255), (200, 90, 0)]
+
+# Values around the branch points of both conversions (the 85/128/171 splits, 0, 1 and 254/255)
+EDGE_VALUES = [0, 1, 2, 3, 4, 84, 85, 86, 127, 128, 129, 170, 171, 172, 253, 254, 255]
+
+
+def verify(samples=100000, seed=0):
+    """Test vectors, then the vectorized conversions against the scalar translations. Returns failures."""
+    failures = []
+    for name, function, vectors in (('hsv2rgb_rainbow', hsv2rgb_rainbow, HSV2RGB_VECTORS),
+                                    ('rgb2hsv_approximate', rgb2hsv_approximate, RGB2HSV_VECTORS)):
+        inputs, expected = (np.array(side, dtype=np.uint8) for side in zip(*vectors))
+        actual = function(inputs)
+        for given, want, got in zip(inputs, expected, actual):
+            if not np.array_equal(want, got):
+                failures.append(f"{name}{tuple(given)}: expected {tuple(want)}, got {tuple(got)}")
+        print(f"{name} test vectors: {len(vectors)} checked")
+
+    # Every combination of edge values plus random triples, through each conversion and adjustment
+    rng = np.random.default_rng(seed)
+    grid = np.stack(np.meshgrid(EDGE_VALUES, EDGE_VALUES, EDGE_VALUES), axis=-1).reshape(-1, 3)
+    triples = np.concatenate([grid, rng.integers(0, 256, (samples, 3))]).astype(np.uint8)
+    checks = [('rgb2hsv_approximate', rgb2hsv_approximate(triples), reference_rgb2hsv_approximate),
+              ('hsv2rgb_rainbow', hsv2rgb_rainbow(triples), reference_hsv2rgb_rainbow)]
+    for adjustment in ADJUSTMENTS:
+        checks.append((f"adjust_hsv{adjustment}", adjust_hsv(triples, *adjustment),
+                       lambda r, g, b, adjustment=adjustment: reference_adjust_hsv(r, g, b, *adjustment)))
+    for name, actual, reference in checks:
+        differ = sum(tuple(int(v) for v in got) != reference(*(int(v) for v in given))
+                     for given, got in zip(triples, actual))
+        print(f"{name}: {'OK' if not differ else 'FAILED'}, {differ} of {len(triples)} inputs differ")
+        if differ:
+            failures.append(f"{name}: {differ} inputs differ")
+    return failures
+
+
+def benchmark(frames=300, width=40, height=96):
+    """Frames per second for whole-frame conversions, against the scalar translation"""
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (8, height, width, 3), dtype=np.uint8)
+    for name, function in (('rgb2hsv_approximate', rgb2hsv_approximate),
+                           ('hsv2rgb_rainbow', hsv2rgb_rainbow),
+                           ('adjust_hsv', lambda image: adjust_hsv(image, 20, 200, 230))):
+        function(images[0])
+        start = time.perf_counter()
+        for n in range(frames):
+            function(images[n % len(images)])
+        elapsed = (time.perf_counter() - start) / frames
+        print(f"{name} {width}x{height}: {elapsed * 1e3:.2f} ms/frame, {1 / elapsed:.0f} fps")
+
+    # The scalar code is timed on a few thousand pixels and scaled up to the frame size
+    pixels = images[0].reshape(-1, 3)[:4096].tolist()
+    start = time.perf_counter()
+    for r, g, b in pixels:
+        reference_adjust_hsv(r, g, b, 20, 200, 230)
+    elapsed = (time.perf_counter() - start) / len(pixels) * width * height
+    print(f"reference_adjust_hsv {width}x{height}: {elapsed * 1e3:.2f} ms/frame, {1 / elapsed:.1f} fps")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='NumPy ports of the FastLED colour conversions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = subparsers.add_parser('verify', help='Run the test vectors and compare against the scalar code')
+    verify_parser.add_argument('--samples', type=int, default=100000, help='Random colours on top of the edge grid')
+
+    bench_parser = subparsers.add_parser('bench', help='Measure conversion speed')
+    bench_parser.add_argument('--frames', type=int, default=300, help='Frames per conversion')
+    bench_parser.add_argument('--size', type=int, nargs=2, default=(40, 96), metavar=('WIDTH', 'HEIGHT'))
+
+    args = parser.parse_args()
+    if args.command == 'verify':
+        failures = verify(args.samples)
+        for failure in failures:
+            print(f"FAILED: {failure}")
+        sys.exit(1 if failures else 0)
+    else:
+        benchmark(args.frames, *args.size)
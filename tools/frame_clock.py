@@ -0,0 +1,84 @@
+import time
+from fractions import Fraction
+
+
+class FrameClock:
+    """
+    Frame scheduler anchored to a single monotonic start time.
+
+    Tick n is due at start + n / fps, so sleep overshoot on one frame never shifts the
+    following ones. If the caller falls more than a tick behind, the missed ticks are
+    skipped (counted as dropped) instead of being sent late back to back.
+    """
+
+    def __init__(self, fps):
+        if fps <= 0:
+            raise ValueError(f"Invalid FPS: {fps}")
+        self.fps = float(fps)
+        self.frame_time = 1.0 / self.fps
+        self.start_time = None
+        self.tick = -1
+        self.dropped = 0
+        self.lateness = []
+
+    def start(self, start_time=None):
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.tick = -1
+
+    def deadline(self, tick):
+        return self.start_time + tick * self.frame_time
+
+    def elapsed_ticks(self):
+        return int((time.perf_counter() - self.start_time) * self.fps)
+
+    def wait_next(self):
+        """Sleep until the next tick is due and return its index."""
+        if self.start_time is None:
+            self.start()
+
+        tick = self.tick + 1
+        current = self.elapsed_ticks()
+        if current > tick:
+            # Running late, jump to the tick the wall clock is on
+            self.dropped += current - tick
+            tick = current
+
+        deadline = self.deadline(tick)
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        self.lateness.append(time.perf_counter() - deadline)
+        self.tick = tick
+        return tick
+
+    def source_frame(self, tick, source_fps):
+        """Index of the source frame that should be showing at `tick` for a clip authored at `source_fps`."""
+        if source_fps == self.fps:
+            return tick
+        # Exact ratio of the two rates, float rounding would land just under a frame boundary
+        return int(tick * Fraction(source_fps) / Fraction(self.fps))
+
+    def jitter_percentiles(self, percentiles=(50, 95, 99)):
+        """Lateness of tick wakeups in milliseconds, keyed by percentile (plus 'max')."""
+        if not self.lateness:
+            return {}
+        ordered = sorted(self.lateness)
+        result = {}
+        for p in percentiles:
+            index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+            result[p] = ordered[index] * 1000
+        result['max'] = ordered[-1] * 1000
+        return result
+
+    def jitter_summary(self):
+        stats = self.jitter_percentiles()
+        if not stats:
+            return "jitter n/a"
+        parts = [f"p{p} {value:.2f}ms" for p, value in stats.items() if p != 'max']
+        parts.append(f"max {stats['max']:.2f}ms")
+        return "jitter " + " ".join(parts)
+
+    def reset_stats(self):
+        self.dropped = 0
+        self.lateness = []
@@ -0,0 +1,222 @@
+import argparse
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Frame layout (little-endian):
+#   magic    4 bytes  b'LEDF'
+#   type     1 byte   payload type, see FRAME_* below
+#   flags    1 byte   reserved, 0
+#   sequence 2 bytes  increments per frame, wraps at 65536
+#   length   4 bytes  payload length
+#   payload  length bytes
+#   crc      4 bytes  CRC32 of type..payload (everything after the magic)
+MAGIC = b'LEDF'
+HEADER = struct.Struct('<4sBBHI')
+CRC = struct.Struct('<I')
+OVERHEAD = HEADER.size + CRC.size
+MAX_PAYLOAD = 65536
+FRAME_SIZE = 40 * 96 * 3  # Largest payload the panel stream carries, a raw frame
+
+FRAME_RGB = 0  # Raw 40x96 RGB frame, row-major
+
+
+def encode_frame(payload, sequence, frame_type=FRAME_RGB):
+    """Wrap a payload (bytes-like) in a frame, returns bytes."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {len(payload)} bytes exceeds MAX_PAYLOAD ({MAX_PAYLOAD})")
+    header = HEADER.pack(MAGIC, frame_type, 0, sequence & 0xFFFF, len(payload))
+    crc = zlib.crc32(payload, zlib.crc32(header[len(MAGIC):]))
+    return b''.join((header, payload, CRC.pack(crc)))
+
+
+class FrameEncoder:
+    """Keeps the sequence counter for one outgoing stream"""
+
+    def __init__(self, frame_type=FRAME_RGB):
+        self.frame_type = frame_type
+        self.sequence = 0
+
+    def encode(self, payload, frame_type=None):
+        frame = encode_frame(payload, self.sequence, self.frame_type if frame_type is None else frame_type)
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        return frame
+
+
+class FrameDecoder:
+    """
+    Reference decoder for the framed stream. Bytes can be fed in arbitrary pieces.
+
+    After a bad CRC or an implausible header the decoder rescans for the magic one byte
+    past the bad frame's start instead of trusting its length, so a dropped or corrupted
+    byte costs at most the frame it hit.
+
+    The header has no CRC of its own, so a corrupted length is only caught once that many bytes
+    have arrived. Lengths above `max_payload` are rejected straight away: pass the largest
+    payload the stream can carry (FRAME_SIZE for the panel) to wait at most one frame.
+    """
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.max_payload = max_payload
+        self.buffer = bytearray()
+        self.pos = 0
+        self.expected_sequence = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.header_errors = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+
+    def feed(self, data):
+        """Append received bytes and return a list of (sequence, frame_type, payload) tuples."""
+        self.buffer += data
+        frames = []
+        buf = self.buffer
+
+        while True:
+            start = buf.find(MAGIC, self.pos)
+            if start < 0:
+                # Keep a possible partial magic at the end
+                keep = max(self.pos, len(buf) - (len(MAGIC) - 1))
+                self.skipped_bytes += keep - self.pos
+                self.pos = keep
+                break
+            self.skipped_bytes += start - self.pos
+            self.pos = start
+
+            if len(buf) - start < HEADER.size:
+                break
+            _, frame_type, flags, sequence, length = HEADER.unpack_from(buf, start)
+            if length > self.max_payload or flags != 0:
+                self.header_errors += 1
+                self.pos = start + 1
+                continue
+
+            end = start + HEADER.size + length
+            if len(buf) < end + CRC.size:
+                break
+
+            payload = bytes(buf[start + HEADER.size:end])
+            crc = zlib.crc32(payload, zlib.crc32(buf[start + len(MAGIC):start + HEADER.size]))
+            if crc != CRC.unpack_from(buf, end)[0]:
+                self.crc_errors += 1
+                self.pos = start + 1
+                continue
+
+            if self.expected_sequence is not None:
+                self.lost_frames += (sequence - self.expected_sequence) & 0xFFFF
+            self.expected_sequence = (sequence + 1) & 0xFFFF
+            self.frames += 1
+            frames.append((sequence, frame_type, payload))
+            self.pos = end + CRC.size
+
+        # Drop consumed bytes once they make up most of the buffer
+        if self.pos > len(buf) // 2:
+            del buf[:self.pos]
+            self.pos = 0
+        return frames
+
+
+def open_loopback():
+    """
+    Pseudo-terminal pair standing in for the Teensy: returns (device_path, master_fd, slave_fd).
+    Open device_path with serial.Serial like a real port and read the master end.
+    """
+    master, slave = os.openpty()
+    path = os.ttyname(slave)
+    return path, master, slave
+
+
+def benchmark(num_frames=300, frame_size=FRAME_SIZE, corrupt_every=0, chunk_size=1024, corrupt='bytes',
+              max_payload=FRAME_SIZE):
+    """
+    Push framed frames through a pty with pyserial and decode them on the other end.
+    With corrupt_every=N every Nth frame is corrupted: corrupt='bytes' drops one byte and flips
+    another, corrupt='length' sets the header's length to 61440. The decoder is bounded to
+    `max_payload`. Frames must decode again from the one after each corruption, each no later
+    than one frame's worth of bytes after its own last byte arrived.
+    """
+    import serial
+
+    path, master, slave = open_loopback()
+    ser = serial.Serial(path, 2000000)
+    decoder = FrameDecoder(max_payload)
+    received = []   # (sequence, decode time, bytes fed by then)
+    feed_size = 256
+
+    def reader():
+        # The last frame is never corrupted, so seeing it means everything has arrived
+        fed = 0
+        while not received or received[-1][0] != num_frames - 1:
+            try:
+                data = os.read(master, 65536)
+            except OSError:
+                break
+            # Small pieces, so when a frame decodes is known to within feed_size bytes
+            for i in range(0, len(data), feed_size):
+                piece = data[i:i + feed_size]
+                fed += len(piece)
+                for sequence, _, _ in decoder.feed(piece):
+                    received.append((sequence, time.perf_counter(), fed))
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    encoder = FrameEncoder()
+    payload = bytes(range(256)) * (frame_size // 256) + bytes(frame_size % 256)
+    corrupted = []
+    ends = []       # Stream offset just past each frame
+    start = time.perf_counter()
+    for n in range(num_frames):
+        frame = bytearray(encoder.encode(payload))
+        if corrupt_every and n % corrupt_every == corrupt_every - 1 and n < num_frames - 1:
+            if corrupt == 'length':
+                frame[8:12] = struct.pack('<I', 0xF000)
+            else:
+                del frame[len(frame) // 3]
+                frame[len(frame) // 2] ^= 0xFF
+            corrupted.append(n)
+        ends.append((ends[-1] if ends else 0) + len(frame))
+        for i in range(0, len(frame), chunk_size):
+            ser.write(frame[i:i + chunk_size])
+    ser.flush()
+    thread.join(timeout=5)
+    elapsed = time.perf_counter() - start
+
+    ser.close()
+    os.close(master)
+    os.close(slave)
+
+    # Every frame after a corrupted one must decode again
+    sequences = {sequence for sequence, _, _ in received}
+    unrecovered = [n for n in corrupted if n + 1 < num_frames and n + 1 not in sequences]
+    # A frame held back behind a corrupted length shows up as decode lag
+    lag = max((fed - ends[sequence] for sequence, _, fed in received), default=0)
+    stalled = lag > frame_size + OVERHEAD
+    sent_bytes = num_frames * (frame_size + OVERHEAD)
+    print(f"Sent {num_frames} frames ({sent_bytes / 1e6:.2f} MB) in {elapsed:.2f}s: "
+          f"{sent_bytes / elapsed / 1e6:.2f} MB/s, {len(received) / elapsed:.1f} frames/s decoded")
+    print(f"Decoded {decoder.frames}, lost {decoder.lost_frames}, corrupted {len(corrupted)}, "
+          f"CRC errors {decoder.crc_errors}, header errors {decoder.header_errors}, "
+          f"skipped {decoder.skipped_bytes} bytes")
+    print(f"Resynced on the next frame after every corruption: {'yes' if not unrecovered else 'no ' + str(unrecovered)}")
+    print(f"Longest decode lag {lag} bytes ({lag / (frame_size + OVERHEAD):.2f} frames): "
+          f"{'stalled past one frame' if stalled else 'within one frame'}")
+    return not unrecovered and not stalled and decoder.frames == num_frames - len(corrupted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the framed serial protocol over a pseudo-terminal loopback')
+    parser.add_argument('--frames', type=int, default=300, help='Number of frames to send')
+    parser.add_argument('--corrupt-every', type=int, default=0, help='Corrupt every Nth frame (0 = never)')
+    parser.add_argument('--corrupt', choices=['bytes', 'length'], default='bytes',
+                        help='Drop and flip a byte, or corrupt the header length field')
+    parser.add_argument('--max-payload', type=int, default=FRAME_SIZE,
+                        help=f'Longest payload the decoder accepts (default one panel frame, '
+                             f'{MAX_PAYLOAD} for the protocol limit)')
+    args = parser.parse_args()
+
+    ok = benchmark(args.frames, corrupt_every=args.corrupt_every, corrupt=args.corrupt, max_payload=args.max_payload)
+    raise SystemExit(0 if ok else 1)
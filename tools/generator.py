@@ -0,0 +1,387 @@
+import argparse
+import importlib
+import os
+import tempfile
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from clip_format import FORMATS, open_writer
+from particles import splat
+from pipeline import HEIGHT, WIDTH, load_pipeline
+
+# Procedural effects as pure functions of the frame index. render(frame, scale, zoom) returns the
+# BGR image for that frame (live.py also passes fractional frames), so frames can be rendered in
+# any order, on any process, and still come out identical. Each effect module defines EFFECT and
+# renders itself when run as a script, generator.py renders and benchmarks them by name.
+#
+# Effects draw through a Canvas in their full-size (width x height) coordinates. At scale 1 that
+# is exactly the original cv2 drawing, for the LED output the pipeline then resizes 400x960 down
+# to 40x96. With a supersample factor k the canvas is 40k x 96k instead: coordinates are passed
+# to cv2 as sub-pixel fixed point, lines are anti-aliased, and the frame is area-averaged down to
+# the panel, drawing ~(10 / k)^2 times fewer pixels.
+Effect = namedtuple('Effect', 'name render total_frames fps width height preset')
+
+SHIFT = 4                       # Fractional bits for cv2 coordinates on a scaled canvas
+
+# Effect name -> module defining EFFECT
+EFFECTS = {
+    'matrix': 'cv_matrix',
+    'tunnel': 'tunnel',
+    'cube': 'cube',
+    'helix': 'cv_helix',
+    'planet': 'cv_planet',
+    'atom': 'cv_electron',
+    'cube_explode': 'cv_explode',
+    'packman': 'cv_packman',
+    'tetra': 'cv_tetra',
+    'fly': 'cv_vector_space',
+}
+
+# Worker processes by default, unless there is only one core to render on
+DEFAULT_WORKERS = os.cpu_count() if (os.cpu_count() or 1) > 1 else 0
+
+_pipelines = {}
+
+
+class Canvas:
+    """
+    Black BGR image for drawing in full-size coordinates, rasterised at `scale` and magnified by
+    `zoom` about the centre. At scale and zoom 1 points are truncated with int() and drawn as
+    given, like the effects always did.
+    """
+
+    def __init__(self, width, height, scale=1.0, zoom=1.0):
+        self.scale = scale
+        self.zoom = zoom
+        self.center = (width / 2, height / 2)
+        self.img = np.zeros((round(height * scale), round(width * scale), 3), dtype=np.uint8)
+
+    def point(self, x, y):
+        if self.zoom != 1:
+            x = (x - self.center[0]) * self.zoom + self.center[0]
+            y = (y - self.center[1]) * self.zoom + self.center[1]
+        if self.scale == 1:
+            return int(x), int(y)
+        # Pixel centres line up: full-size pixel x covers [x, x + 1)
+        one = 1 << SHIFT
+        return int(round(((x + 0.5) * self.scale - 0.5) * one)), int(round(((y + 0.5) * self.scale - 0.5) * one))
+
+    def points(self, xy):
+        """point() over an (..., 2) array of x, y, as int32"""
+        xy = np.asarray(xy, dtype=np.float64)
+        if self.zoom != 1:
+            xy = (xy - self.center) * self.zoom + self.center
+        if self.scale == 1:
+            return xy.astype(np.int32)      # Truncates towards zero like int()
+        return np.round(((xy + 0.5) * self.scale - 0.5) * (1 << SHIFT)).astype(np.int32)
+
+    def length(self, value):
+        value *= self.zoom
+        return int(value) if self.scale == 1 else int(round(value * self.scale * (1 << SHIFT)))
+
+    def thickness(self, value):
+        if value < 0 or (self.scale == 1 and self.zoom == 1):
+            return value
+        return max(1, round(value * self.scale * self.zoom))
+
+    def stroke(self, color, value):
+        """
+        (color, thickness) for an outline. A stroke narrower than one canvas pixel is drawn one
+        pixel wide and dimmed by its width, so it keeps about the light it has at full size.
+        """
+        width = value * self.scale * self.zoom
+        if value < 0 or self.scale == 1 or width >= 1:
+            return color, self.thickness(value)
+        return tuple(float(c) * width for c in color), 1
+
+    def _draw_args(self, line_type):
+        return (line_type, 0) if self.scale == 1 else (cv2.LINE_AA, SHIFT)
+
+    def line(self, p1, p2, color, thickness=1, line_type=cv2.LINE_8):
+        cv2.line(self.img, self.point(*p1), self.point(*p2), *self.stroke(color, thickness),
+                 *self._draw_args(line_type))
+
+    def circle(self, center, radius, color, thickness=1, line_type=cv2.LINE_8):
+        cv2.circle(self.img, self.point(*center), self.length(radius), *self.stroke(color, thickness),
+                   *self._draw_args(line_type))
+
+    def ellipse(self, center, axes, angle, start_angle, end_angle, color, thickness=1, line_type=cv2.LINE_8):
+        cv2.ellipse(self.img, self.point(*center), (self.length(axes[0]), self.length(axes[1])), angle,
+                    start_angle, end_angle, *self.stroke(color, thickness), *self._draw_args(line_type))
+
+    def _points(self, points):
+        return self.points(points).reshape((-1, 1, 2))
+
+    def polylines(self, points, closed, color, thickness=1, line_type=cv2.LINE_8):
+        cv2.polylines(self.img, [self._points(points)], closed, *self.stroke(color, thickness),
+                      *self._draw_args(line_type))
+
+    def polygons(self, polygons, fill_colors, outlines=(), line_type=cv2.LINE_8):
+        """
+        Filled polygons painted one after another, each then outlined by every (colors, thickness)
+        in `outlines`, colors being per polygon or one tuple for all. `polygons` is an (N, vertices,
+        2) array, transformed to pixels in one go.
+        """
+        pixels = self.points(polygons).reshape(len(polygons), -1, 1, 2)
+        line_type, shift = self._draw_args(line_type)
+        outlines = [([colors] * len(pixels) if isinstance(colors, tuple) else colors, thickness)
+                    for colors, thickness in outlines]
+        for n, points in enumerate(pixels):
+            cv2.fillPoly(self.img, [points], fill_colors[n], line_type, shift)
+            for colors, thickness in outlines:
+                cv2.polylines(self.img, [points], True, *self.stroke(colors[n], thickness), line_type, shift)
+
+    def lines(self, segments, color, thickness=1, line_type=cv2.LINE_8):
+        """Many same-coloured lines, an (N, 2, 2) array of segment end points, in one cv2 call"""
+        cv2.polylines(self.img, self.points(segments), False, *self.stroke(color, thickness),
+                      *self._draw_args(line_type))
+
+    def fill_poly(self, points, color, line_type=cv2.LINE_8):
+        line_type, shift = self._draw_args(line_type)
+        cv2.fillPoly(self.img, [self._points(points)], color, line_type, shift)
+
+    def rectangle(self, p1, p2, color, thickness=1, line_type=cv2.LINE_8):
+        cv2.rectangle(self.img, self.point(*p1), self.point(*p2), *self.stroke(color, thickness),
+                      *self._draw_args(line_type))
+
+    def discs(self, centers, radii, colors):
+        """
+        Filled circles splatted in one go (particles.splat), later ones over earlier: (N, 2)
+        centres, radii and BGR colours per disc or one for all. On a scaled canvas centres round
+        to whole pixels, the area-averaging down to the panel smooths them.
+        """
+        radii = np.asarray(radii, dtype=np.float64) * self.zoom
+        if self.scale == 1:
+            splat(self.img, self.points(centers), radii.astype(np.int64), colors)
+        else:
+            pixels = (self.points(centers) + (1 << (SHIFT - 1))) >> SHIFT
+            splat(self.img, pixels, np.round(radii * self.scale).astype(np.int64), colors)
+
+    def paste(self, render, x, y, size):
+        """
+        Square image with its top-left at (x, y) and sides of `size` full-size pixels, clipped to
+        the canvas. render(side) draws it at the side length it covers on the canvas.
+        """
+        if self.scale == 1 and self.zoom == 1:
+            side = size
+        else:
+            x, y = ((np.array([x, y]) - self.center) * self.zoom + self.center) * self.scale
+            side = max(1, round(size * self.zoom * self.scale))
+        x, y = int(x), int(y)
+        height, width = self.img.shape[:2]
+        x_start, y_start = max(0, x), max(0, y)
+        x_end, y_end = min(width, x + side), min(height, y + side)
+        if x_start < x_end and y_start < y_end:
+            self.img[y_start:y_end, x_start:x_end] = render(side)[y_start - y:y_end - y, x_start - x:x_end - x]
+
+    def glow(self, ksize, weight):
+        """img + weight * GaussianBlur(img, ksize), the blur radius scaled with the canvas"""
+        if self.scale == 1:
+            blurred = cv2.GaussianBlur(self.img, (ksize, ksize), 0)
+        else:
+            # The sigma OpenCV derives from ksize at full size, scaled
+            sigma = (0.3 * ((ksize - 1) * 0.5 - 1) + 0.8) * self.scale
+            blurred = cv2.GaussianBlur(self.img, (0, 0), sigma)
+        self.img = cv2.addWeighted(self.img, 1, blurred, weight, 0)
+
+
+def load_effect(name):
+    return importlib.import_module(EFFECTS.get(name, name)).EFFECT
+
+
+def _init_worker():
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def render_frame(effect, frame, supersample=None, image=True, zoom=1.0):
+    """
+    (image, LED frame) for one frame index. With `supersample` k the effect draws at k times the
+    panel size and is area-averaged down, image is then the small drawing. image=False skips
+    returning it when nothing writes the mp4.
+    """
+    if effect.preset not in _pipelines:
+        _pipelines[effect.preset] = load_pipeline(effect.preset)
+    if supersample:
+        img = effect.render(frame, supersample * WIDTH / effect.width, zoom)
+        led = cv2.resize(img, (WIDTH, HEIGHT), interpolation=cv2.INTER_AREA)
+    else:
+        img = led = effect.render(frame, 1.0, zoom)
+    return (img if image else None), _pipelines[effect.preset].run(led)
+
+
+def _render_chunk(name, frames, supersample, image):
+    # Worker side: effects are looked up by name, their render functions are module globals
+    effect = load_effect(name)
+    return [render_frame(effect, frame, supersample, image) for frame in frames]
+
+
+def render_frames(effect, workers=0, chunk_size=8, frames=None, supersample=None, image=True):
+    """
+    Yield (image, LED frame) for frames 0..frames-1 (default: the whole effect) in order.
+    With workers > 0, chunks of frames render on a process pool with a bounded number in flight.
+    """
+    total = effect.total_frames if frames is None else frames
+    if workers <= 0:
+        for frame in range(total):
+            yield render_frame(effect, frame, supersample, image)
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for start in range(0, total, chunk_size):
+            chunk = range(start, min(start + chunk_size, total))
+            pending.append(pool.submit(_render_chunk, effect.name, chunk, supersample, image))
+            # Emit the oldest chunk first so the writers see frames in order
+            while len(pending) > workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def generate(effect, output_dir="../media", fmt='raw', workers=0, frames=None, mp4=True, supersample=None):
+    """
+    Render an effect to <output_dir>/<name>.bin (or .rle) and optionally the .mp4 preview, which
+    is at the drawing size (full size, or the supersampled canvas). Returns seconds taken.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, effect.name)
+    start = time.perf_counter()
+    out = None
+    with open_writer(base, fmt, fps=effect.fps) as binary_output:
+        for img, final in render_frames(effect, workers, frames=frames, supersample=supersample, image=mp4):
+            if mp4:
+                if out is None:
+                    out = cv2.VideoWriter(base + '.mp4', cv2.VideoWriter_fourcc(*'mp4v'), effect.fps,
+                                          (img.shape[1], img.shape[0]))
+                out.write(img)
+            binary_output.write(final)
+    if out is not None:
+        out.release()
+    return time.perf_counter() - start
+
+
+def run(effect, output_dir="../media", fmt='raw', workers=0, mp4=True, supersample=None):
+    elapsed = generate(effect, output_dir, fmt, workers, mp4=mp4, supersample=supersample)
+    seconds = effect.total_frames / effect.fps
+    print(f"{effect.name}: {effect.total_frames} frames in {elapsed:.1f}s "
+          f"({effect.total_frames / elapsed:.1f} fps, {seconds / elapsed:.2f}x realtime)")
+    if mp4:
+        print(f"Video generated: {os.path.join(output_dir, effect.name + '.mp4')}")
+    print(f"Binary file generated: {os.path.join(output_dir, effect.name + FORMATS[fmt][0])}")
+
+
+def _add_render_arguments(parser):
+    parser.add_argument('--output-dir', default='../media', help='Output folder')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='raw', help='raw .bin frames or compressed .rle clip')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Render processes (0 = in this process)')
+    parser.add_argument('--supersample', type=int, default=None, metavar='K',
+                        help='Draw at K times the panel size (e.g. 2 or 4) and area-average down, '
+                             'instead of drawing full size')
+    parser.add_argument('--no-mp4', action='store_true', help='Skip the mp4 preview')
+
+
+def main(effect):
+    """Command line for an effect module run as a script"""
+    parser = argparse.ArgumentParser(description=f'Render the {effect.name} effect to mp4 and LED binary')
+    _add_render_arguments(parser)
+    args = parser.parse_args()
+    run(effect, args.output_dir, args.format, args.workers, not args.no_mp4, args.supersample)
+
+
+def benchmark(names, workers, frames=None):
+    """
+    Time each effect rendered frame by frame in one process (how the scripts used to run)
+    against the process pool, and check both give the same LED frames.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            effect = load_effect(name)
+            count = min(frames or effect.total_frames, effect.total_frames)
+            times = {}
+            for label, worker_count in (('serial', 0), (f'pool x{workers}', workers)):
+                folder = os.path.join(tmp, label.split()[0])
+                times[label] = generate(effect, folder, workers=worker_count, frames=count)
+            with open(os.path.join(tmp, 'serial', name + '.bin'), 'rb') as a, \
+                    open(os.path.join(tmp, 'pool', name + '.bin'), 'rb') as b:
+                identical = a.read() == b.read()
+            serial, pool = times.values()
+            realtime = count / effect.fps
+            print(f"{name:8s} {count} frames: serial {count / serial:6.1f} fps ({realtime / serial:.2f}x realtime), "
+                  f"pool x{workers} {count / pool:6.1f} fps ({realtime / pool:.2f}x realtime), "
+                  f"speedup {serial / pool:.2f}x, outputs {'identical' if identical else 'DIFFER'}")
+            results[name] = times
+    return results
+
+
+def frame_difference(reference, frames):
+    """
+    Visual difference of LED frames against the full-size path: mean absolute error and PSNR over
+    all channel values, and the share of LEDs whose brightest channel is off by more than 32.
+    """
+    reference = reference.astype(np.int16)
+    diff = np.abs(frames.astype(np.int16) - reference)
+    mse = float(np.mean(diff.astype(np.float64) ** 2))
+    psnr = 10 * np.log10(255 ** 2 / mse) if mse else float('inf')
+    return {'mae': float(diff.mean()), 'psnr': psnr, 'leds_off': float(np.mean(diff.max(axis=-1) > 32))}
+
+
+def compare(names, factors=(2, 4), frames=None):
+    """LED output speed and difference per supersample factor against the full-size path, no mp4"""
+    results = {}
+    for name in names:
+        effect = load_effect(name)
+        count = min(frames or effect.total_frames, effect.total_frames)
+        timings = {}
+        outputs = {}
+        for factor in (None,) + tuple(factors):
+            start = time.perf_counter()
+            outputs[factor] = np.stack([final for _, final in render_frames(effect, frames=count, supersample=factor,
+                                                                            image=False)])
+            timings[factor] = time.perf_counter() - start
+        reference = outputs[None]
+        print(f"{name}: full size {count / timings[None]:6.1f} fps")
+        for factor in factors:
+            metrics = frame_difference(reference, outputs[factor])
+            print(f"  {factor}x ({WIDTH * factor}x{HEIGHT * factor}) {count / timings[factor]:6.1f} fps, "
+                  f"speedup {timings[None] / timings[factor]:5.1f}x | MAE {metrics['mae']:.2f} "
+                  f"PSNR {metrics['psnr']:.1f} dB, {metrics['leds_off']:.1%} LEDs off by >32")
+            results[(name, factor)] = dict(metrics, speedup=timings[None] / timings[factor])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render procedural effects in parallel')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help='Render effects to mp4 and LED binary')
+    render_parser.add_argument('effects', nargs='*', help=f"Effects (default: all of {', '.join(EFFECTS)})")
+    _add_render_arguments(render_parser)
+
+    bench_parser = subparsers.add_parser('bench', help='Time serial against pooled rendering per effect')
+    bench_parser.add_argument('effects', nargs='*', help=f"Effects (default: all of {', '.join(EFFECTS)})")
+    bench_parser.add_argument('--workers', type=int, default=max(1, DEFAULT_WORKERS), help='Render processes')
+    bench_parser.add_argument('--frames', type=int, default=None, help='Frames per effect (default: all)')
+
+    compare_parser = subparsers.add_parser('compare', help='Speed and visual difference of supersampled rendering')
+    compare_parser.add_argument('effects', nargs='*', help=f"Effects (default: all of {', '.join(EFFECTS)})")
+    compare_parser.add_argument('--supersample', type=int, nargs='+', default=[2, 4], metavar='K',
+                                help='Factors to compare against full size')
+    compare_parser.add_argument('--frames', type=int, default=None, help='Frames per effect (default: all)')
+
+    args = parser.parse_args()
+    unknown = set(args.effects) - set(EFFECTS)
+    if unknown:
+        parser.error(f"unknown effects: {', '.join(sorted(unknown))}")
+    if args.command == 'render':
+        for name in args.effects or EFFECTS:
+            run(load_effect(name), args.output_dir, args.format, args.workers, not args.no_mp4, args.supersample)
+    elif args.command == 'compare':
+        compare(args.effects or list(EFFECTS), args.supersample, args.frames)
+    else:
+        benchmark(args.effects or list(EFFECTS), args.workers, args.frames)
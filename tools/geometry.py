@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import numpy as np
+
+PANELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'panels')
+DEFAULT_CONFIG = 'wall_40x96'
+
+
+class PanelGeometry:
+    """
+    Wiring description of an LED wall built from identical rectangular panels.
+
+    panel_order        'columns' chains panels down each grid column, 'rows' across each grid row
+    panel_serpentine   every other column/row of panels is chained in the opposite direction
+    pixel_order        'rows' or 'columns', the direction of the LED lines inside a panel
+    pixel_serpentine   every other LED line runs in the opposite direction
+    pixel_reverse_first  the first LED line runs right-to-left ('rows') or bottom-to-top ('columns')
+    rotations          per-panel mounting rotation (0 or 180), indexed [row][column]
+    leds_per_strip     LEDs driven by one OctoWS2811 pin
+    """
+
+    def __init__(self, panel_width, panel_height, columns, rows,
+                 panel_order='columns', panel_serpentine=True,
+                 pixel_order='rows', pixel_serpentine=True, pixel_reverse_first=False,
+                 rotations=None, leds_per_strip=512, description=''):
+        if panel_order not in ('columns', 'rows'):
+            raise ValueError(f"Invalid panel_order: {panel_order}")
+        if pixel_order not in ('columns', 'rows'):
+            raise ValueError(f"Invalid pixel_order: {pixel_order}")
+        if rotations is None:
+            rotations = [[0] * columns for _ in range(rows)]
+        rotations = np.asarray(rotations, dtype=np.int32)
+        if rotations.shape != (rows, columns):
+            raise ValueError(f"rotations must be {rows}x{columns}, got {rotations.shape[0]}x{rotations.shape[1]}")
+        if not np.isin(rotations, (0, 180)).all():
+            raise ValueError("Only 0 and 180 degree panel rotations are supported")
+
+        self.panel_width = panel_width
+        self.panel_height = panel_height
+        self.columns = columns
+        self.rows = rows
+        self.panel_order = panel_order
+        self.panel_serpentine = panel_serpentine
+        self.pixel_order = pixel_order
+        self.pixel_serpentine = pixel_serpentine
+        self.pixel_reverse_first = pixel_reverse_first
+        self.rotations = rotations
+        self.leds_per_strip = leds_per_strip
+        self.description = description
+
+        self.width = panel_width * columns
+        self.height = panel_height * rows
+        self.leds_per_panel = panel_width * panel_height
+        self.total_leds = self.width * self.height
+        self.num_strips = -(-self.total_leds // leds_per_strip)
+
+        self._index_table = None
+        self._wire_table = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+    def _compile(self):
+        y, x = np.indices((self.height, self.width))
+        column = x // self.panel_width
+        row = y // self.panel_height
+        x_in_panel = x % self.panel_width
+        y_in_panel = y % self.panel_height
+
+        # Position of the panel along the data chain
+        if self.panel_order == 'columns':
+            line, pos, line_length = column, row, self.rows
+        else:
+            line, pos, line_length = row, column, self.columns
+        if self.panel_serpentine:
+            pos = np.where(line % 2 == 1, line_length - 1 - pos, pos)
+        panel_index = line * line_length + pos
+
+        # Undo the panel's mounting rotation
+        rotated = self.rotations[row, column] == 180
+        x_in_panel = np.where(rotated, self.panel_width - 1 - x_in_panel, x_in_panel)
+        y_in_panel = np.where(rotated, self.panel_height - 1 - y_in_panel, y_in_panel)
+
+        # Position of the LED along the panel's own chain
+        if self.pixel_order == 'rows':
+            line, pos, line_length = y_in_panel, x_in_panel, self.panel_width
+        else:
+            line, pos, line_length = x_in_panel, y_in_panel, self.panel_height
+        reverse = np.full(line.shape, self.pixel_reverse_first)
+        if self.pixel_serpentine:
+            reverse ^= (line % 2 == 1)
+        pos = np.where(reverse, line_length - 1 - pos, pos)
+        led_in_panel = line * line_length + pos
+
+        table = panel_index * self.leds_per_panel + led_in_panel
+        self._index_table = table.astype(np.intp)
+        self._index_table.setflags(write=False)
+
+        wire = np.empty(self.total_leds, dtype=np.intp)
+        wire[self._index_table.ravel()] = np.arange(self.total_leds, dtype=np.intp)
+        self._wire_table = wire
+        self._wire_table.setflags(write=False)
+
+    def index_table(self):
+        """(height, width) array, entry [y, x] is the LED index of that pixel."""
+        if self._index_table is None:
+            self._compile()
+        return self._index_table
+
+    def wire_table(self):
+        """Inverse permutation, entry [led] is the row-major pixel index driving that LED."""
+        if self._wire_table is None:
+            self._compile()
+        return self._wire_table
+
+    def led_index(self, x, y):
+        if not (0 <= x < self.width) or not (0 <= y < self.height):
+            raise ValueError("Coordinates out of bounds.")
+        return int(self.index_table()[y, x])
+
+    def remap_frame(self, frame):
+        """Reorder a (height, width, 3) frame into wire order, shape (total_leds, 3)."""
+        return np.take(frame.reshape(-1, 3), self.wire_table(), axis=0)
+
+    def remap_frames(self, frames):
+        """Reorder a (N, height, width, 3) clip into wire order, shape (N, total_leds, 3)."""
+        frames = np.asarray(frames)
+        return np.take(frames.reshape(frames.shape[0], -1, 3), self.wire_table(), axis=1)
+
+    def split_strips(self, wire_frame):
+        """Split a wire-order frame into one array per OctoWS2811 pin."""
+        return [wire_frame[i:i + self.leds_per_strip]
+                for i in range(0, self.total_leds, self.leds_per_strip)]
+
+    def verify(self, reference=None, expected=()):
+        """
+        Check that the table is a bijection onto 0..total_leds-1 and optionally matches a
+        reference led_index(x, y) function and hand-written ((x, y), index) pairs.
+        Returns a list of problems, empty when everything matches.
+        """
+        problems = []
+        table = self.index_table()
+        if table.min() < 0 or table.max() >= self.total_leds:
+            problems.append(f"indices out of range: {table.min()}..{table.max()}")
+        else:
+            counts = np.bincount(table.ravel(), minlength=self.total_leds)
+            if (counts != 1).any():
+                problems.append(f"{int((counts == 0).sum())} LEDs unmapped, {int((counts > 1).sum())} LEDs mapped twice")
+
+        if reference is not None:
+            mismatches = 0
+            for y in range(self.height):
+                for x in range(self.width):
+                    if reference(x, y) != table[y, x]:
+                        if mismatches < 5:
+                            problems.append(f"({x}, {y}): table {table[y, x]}, reference {reference(x, y)}")
+                        mismatches += 1
+            if mismatches > 5:
+                problems.append(f"... {mismatches} mismatches in total")
+
+        for (x, y), index in expected:
+            if table[y, x] != index:
+                problems.append(f"({x}, {y}): table {table[y, x]}, expected {index}")
+
+        return problems
+
+
+_geometry_cache = {}
+
+
+def load_geometry(config=DEFAULT_CONFIG):
+    """Load a geometry from a JSON file or a bundled config name in tools/panels, cached per path."""
+    path = config
+    if not os.path.exists(path):
+        path = os.path.join(PANELS_DIR, f'{config}.json')
+    path = os.path.abspath(path)
+    if path not in _geometry_cache:
+        with open(path) as f:
+            _geometry_cache[path] = PanelGeometry.from_config(json.load(f))
+    return _geometry_cache[path]
+
+
+def verify_bundled():
+    """Verify the bundled configs against the hand-written mappings in layout.py and indexer.py."""
+    import layout
+    import indexer
+
+    checks = [
+        ('wall_40x96', layout.led_index, layout.TEST_COORDINATES),
+        ('wall_32x96', indexer.map_xy_to_led_index, indexer.TEST_COORDINATES),
+    ]
+    ok = True
+    for name, reference, expected in checks:
+        problems = load_geometry(name).verify(reference, expected)
+        print(f"{name}: {'OK' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"  {problem}")
+        ok = ok and not problems
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compile and verify LED panel geometry')
+    parser.add_argument('--config', help='Geometry JSON file or bundled name (default: verify all bundled configs)')
+    args = parser.parse_args()
+
+    if args.config is None:
+        raise SystemExit(0 if verify_bundled() else 1)
+
+    geometry = load_geometry(args.config)
+    print(f"{geometry.width}x{geometry.height}, {geometry.total_leds} LEDs on {geometry.num_strips} strips")
+    problems = geometry.verify()
+    print('OK' if not problems else 'FAILED')
+    for problem in problems:
+        print(f"  {problem}")
+    raise SystemExit(1 if problems else 0)
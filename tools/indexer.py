@@ -28,11 +28,18 @@ def map_xy_to_led_index(x: int, y: int) -> int:
 
     return led_index
 
+# Hand-written expectations for the wiring, checked by `python geometry.py`.
+# Odd columns start at the bottom of the 8-LED column, so (1, 0) is 8 + 7.
+TEST_COORDINATES = [
+    ((0, 0), 0),
+    ((1, 0), 15),
+    ((0, 1), 1),
+    ((1, 1), 14),
+    ((31, 0), 255),
+    ((0, 8), 256),
+    ((0, 9), 257),
+]
+
 if __name__ == "__main__":
-    print(map_xy_to_led_index(0, 0))  # Should print 0
-    print(map_xy_to_led_index(1, 0))  # Should print 7
-    print(map_xy_to_led_index(0, 1))  # Should print 1
-    print(map_xy_to_led_index(1, 1))  # Should print 6
-    print(map_xy_to_led_index(31,0))  # Should print 255
-    print(map_xy_to_led_index(0,8))  # Should print 256
-    print(map_xy_to_led_index(0,9))  # Should print 257
+    for (x, y), expected in TEST_COORDINATES:
+        print(map_xy_to_led_index(x, y))
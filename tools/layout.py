@@ -1,3 +1,7 @@
+import numpy as np
+
+from geometry import load_geometry
+
 def led_index(x, y):
     """
     Calculate the LED index for the given (x, y) coordinate in the LED matrix.
@@ -77,27 +81,65 @@ def led_index(x, y):
 
     return total_led_index
 
+# Display dimensions (must match the firmware's width/height)
+WIDTH = 40
+HEIGHT = 96
+
+
+# Hand-written expectations for the wiring, checked by `python geometry.py`
+TEST_COORDINATES = [
+    ((0, 0), 7),        # Top-left corner of the entire matrix
+    ((8, 0), 1535),     # Start of second column, top row
+    ((9, 0), 1534),
+    ((10, 0), 1533),
+    ((11, 0), 1532),
+    ((12, 0), 1531),
+    ((13, 0), 1530),
+    ((14, 0), 1529),
+    ((15, 0), 1528),
+    ((16, 0), 1543),    # Start of third column, top row
+    ((17, 0), 1542),
+    ((18, 0), 1541),
+    ((19, 0), 1540),
+    ((20, 0), 1539),
+    ((21, 0), 1538),
+]
+
+# Wire-order permutation compiled from panels/wall_40x96.json, which describes the
+# same wiring as led_index above. table[led] is the row-major pixel index (y * width + x)
+# driving LED `led`, so `frame.reshape(-1, 3)[table]` reorders a frame into OctoWS2811 order.
+LED_INDEX_TABLE = load_geometry('wall_40x96').wire_table()
+
+
+def remap_frame(frame, table=LED_INDEX_TABLE):
+    """
+    Reorder a (96, 40, 3) frame into LED wire order.
+
+    Returns an array of shape (3840, 3) whose row i is the color of LED i.
+    """
+    return np.take(frame.reshape(-1, 3), table, axis=0)
+
+
+def remap_frames(frames, table=LED_INDEX_TABLE):
+    """
+    Reorder a (N, 96, 40, 3) clip into LED wire order, returns shape (N, 3840, 3).
+    """
+    frames = np.asarray(frames)
+    return np.take(frames.reshape(frames.shape[0], -1, 3), table, axis=1)
+
+
 # Example usage:
 if __name__ == "__main__":
-    # Test coordinates
-    test_coordinates = [
-        (0, 0),             # Top-left corner of the entire matrix
-        (8, 0),             # Start of second column, top row, should give 1535 ***
-        (9, 0),             # Start of second column, top row, should give 1534
-        (10, 0),             # Start of second column, top row, should give 1533
-        (11, 0),             # Start of second column, top row, should give 1532
-        (12, 0),             # Start of second column, top row, should give 1531
-        (13, 0),             # Start of second column, top row, should give 1530
-        (14, 0),             # Start of second column, top row, should give 1529
-        (15, 0),             # Start of second column, top row, should give 1528
-        (16, 0),             #  should give 1543  ***
-        (17, 0),             #  should give 1542  ***
-        (18, 0),             #  should give 1541  ***
-        (19, 0),             #  should give 1540  ***
-        (20, 0),             #  should give 1539  ***
-        (21, 0),             #  should give 1538  ***
-    ]
-
-    for x, y in test_coordinates:
+    for (x, y), expected in TEST_COORDINATES:
         index = led_index(x, y)
-        print(f"LED index at coordinate ({x}, {y}): {index}")
+        print(f"LED index at coordinate ({x}, {y}): {index} (expected {expected})")
+
+    # Remap a whole frame with the precomputed table
+    import time
+    frame = np.random.randint(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(1000):
+        wire = remap_frame(frame)
+    elapsed = (time.perf_counter() - start) / 1000
+    print(f"remap_frame: {elapsed * 1e6:.1f} us per frame")
+    assert (wire[led_index(8, 0)] == frame[0, 8]).all()
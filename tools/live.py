@@ -0,0 +1,210 @@
+import argparse
+import time
+
+import numpy as np
+
+from compositor import HUE_CC, VIDEO_SCALE_CC, VIDEO_SPEED_CC, cc_to_scale, cc_to_speed
+from fastled import adjust_hsv
+from frame_clock import FrameClock
+from framing import FrameEncoder
+from generator import EFFECTS, load_effect, render_frame
+from video_bin_stream import send_frame
+
+# Generators streamed straight to the panel, no offline render. Any generator.py effect is a
+# plugin: live_frames() walks its frame function at the panel rate, drawing supersampled at LED
+# size, while MIDI CCs modulate it with the same mappings the firmware uses for SD videos:
+#
+#   CC 10  speed  0 = pause, 64 = normal, up to 64x (cc_to_speed)
+#   CC 1   hue    value * 2, applied with the firmware's HSV adjustment
+#   CC 8   zoom   64 = 1x, below zooms out to 0.25x, above in to 4x (cc_to_scale)
+#
+# Rendering has to fit the frame period along with the serial write, so before streaming the
+# effect is profiled and the largest supersample factor whose p95 cost fits in BUDGET_SHARE of
+# the period is used.
+
+BUDGET_SHARE = 0.5
+SUPERSAMPLE = 2
+
+
+class LiveParams:
+    """Effect parameters set from MIDI CCs, read once per frame by the render loop"""
+
+    def __init__(self, channel=None):
+        self.channel = channel      # 1-based MIDI channel to listen on, None for any
+        self.speed = 1.0
+        self.hue = 0
+        self.zoom = 1.0
+
+    def handle_message(self, msg):
+        if msg.type != 'control_change' or (self.channel is not None and msg.channel + 1 != self.channel):
+            return
+        if msg.control == VIDEO_SPEED_CC:
+            self.speed = float(cc_to_speed(msg.value))
+        elif msg.control == HUE_CC:
+            self.hue = (msg.value * 2) & 0xFF
+        elif msg.control == VIDEO_SCALE_CC:
+            self.zoom = float(cc_to_scale(msg.value))
+
+    def __str__(self):
+        return f"speed {self.speed:.2f} hue {self.hue} zoom {self.zoom:.2f}"
+
+
+def profile(effect, supersample, samples=30):
+    """Render cost in ms of `samples` frames spread over the effect, sorted"""
+    render_frame(effect, 0, supersample, image=False)   # Builds the LED pipeline, not part of the cost
+    costs = []
+    for n in range(samples):
+        frame = n * effect.total_frames // samples
+        start = time.perf_counter()
+        render_frame(effect, frame, supersample, image=False)
+        costs.append((time.perf_counter() - start) * 1000)
+    return sorted(costs)
+
+
+def _p95(costs):
+    return costs[min(len(costs) - 1, int(0.95 * len(costs)))]
+
+
+def choose_supersample(effect, fps, requested=SUPERSAMPLE, share=BUDGET_SHARE):
+    """Largest factor from `requested` down to 1 whose p95 render cost fits the budget, and that p95"""
+    budget = share * 1000 / fps
+    factor = max(1, requested)
+    while True:
+        p95 = _p95(profile(effect, factor))
+        if p95 <= budget or factor == 1:
+            return factor, p95
+        factor = max(1, factor // 2)
+
+
+def live_frames(effect, params, clock, supersample=SUPERSAMPLE, stats=None):
+    """
+    Yield LED frames (96x40 RGB) forever, one per clock tick. The effect position advances by
+    params.speed source frames per source frame period of wall time, so dropped ticks don't slow
+    it down, and wraps at the end of the effect. Render times in ms are appended to `stats`.
+    """
+    position = 0.0
+    last_tick = None
+    while True:
+        tick = clock.wait_next()
+        if last_tick is not None:
+            position = (position + params.speed * (tick - last_tick) * effect.fps / clock.fps) % effect.total_frames
+        last_tick = tick
+
+        start = time.perf_counter()
+        _, frame = render_frame(effect, position, supersample, image=False, zoom=params.zoom)
+        if params.hue:
+            frame = adjust_hsv(frame, params.hue)
+        if stats is not None:
+            stats.append((time.perf_counter() - start) * 1000)
+        yield frame
+
+
+def stream_live(effect, ser, fps=30, supersample=SUPERSAMPLE, params=None, framed=False, duration=None):
+    """Stream an effect to an open serial port until interrupted or for `duration` seconds"""
+    params = params or LiveParams()
+    factor, p95 = choose_supersample(effect, fps, supersample)
+    budget = 1000 / fps
+    print(f"{effect.name}: {factor}x supersample, render p95 {p95:.1f}ms of a {budget:.1f}ms frame")
+    if p95 > BUDGET_SHARE * budget:
+        print(f"  over {BUDGET_SHARE:.0%} of the frame even at 1x, frames will drop if serial writes are slow")
+    elif factor < supersample:
+        print(f"  lowered from {supersample}x to stay within {BUDGET_SHARE:.0%} of the frame")
+
+    clock = FrameClock(fps)
+    encoder = FrameEncoder() if framed else None
+    costs = []
+    all_costs = []
+    sent = 0
+    clock.start()
+    report_time = clock.start_time
+    for frame in live_frames(effect, params, clock, factor, costs):
+        data = np.ascontiguousarray(frame, dtype=np.uint8).tobytes()
+        send_frame(ser, encoder.encode(data) if encoder else data)
+        sent += 1
+
+        now = time.perf_counter()
+        if now - report_time >= 1.0:
+            ordered = sorted(costs)
+            over = sum(cost > budget for cost in costs)
+            print(f"FPS: {sent / (now - report_time):.2f} | dropped {clock.dropped} | render p50 "
+                  f"{ordered[len(ordered) // 2]:.1f}ms p95 {_p95(ordered):.1f}ms, {over} over budget | "
+                  f"{clock.jitter_summary()} | {params}")
+            all_costs.extend(costs)
+            costs.clear()
+            clock.reset_stats()
+            sent = 0
+            report_time = now
+        if duration is not None and now - clock.start_time >= duration:
+            break
+    all_costs.extend(costs)
+    return all_costs
+
+
+def budget_report(names, fps=30, factors=(1, 2, 4)):
+    """Render cost per effect and supersample factor against the frame period"""
+    budget = 1000 / fps
+    print(f"Frame budget {budget:.1f}ms at {fps} fps, live streaming keeps render p95 under "
+          f"{BUDGET_SHARE * budget:.1f}ms")
+    for name in names:
+        effect = load_effect(name)
+        parts = []
+        for factor in factors:
+            costs = profile(effect, factor)
+            fits = 'ok' if _p95(costs) <= BUDGET_SHARE * budget else 'OVER'
+            parts.append(f"{factor}x p50 {costs[len(costs) // 2]:5.1f}ms p95 {_p95(costs):5.1f}ms {fits}")
+        print(f"{name:8s} " + ' | '.join(parts))
+
+
+def run(effect, port, baud=2000000, fps=30, supersample=SUPERSAMPLE, midi_port=None, channel=None,
+        framed=False, duration=None):
+    import serial
+
+    params = LiveParams(channel)
+    midi_input = None
+    if midi_port:
+        import mido
+        midi_input = mido.open_input(midi_port, callback=params.handle_message)
+    ser = serial.Serial(port, baud)
+    try:
+        stream_live(effect, ser, fps, supersample, params, framed, duration)
+    except KeyboardInterrupt:
+        print("\nStream stopped by user")
+    finally:
+        if midi_input is not None:
+            midi_input.close()
+        ser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Stream procedural effects live to the LED panel')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Render an effect in realtime and stream it over serial')
+    run_parser.add_argument('effect', choices=sorted(EFFECTS))
+    run_parser.add_argument('--port', default='/dev/cu.usbmodem144533101', help='Serial port')
+    run_parser.add_argument('--baud', type=int, default=2000000, help='Baud rate')
+    run_parser.add_argument('--fps', type=float, default=30, help='Panel frame rate')
+    run_parser.add_argument('--supersample', type=int, default=SUPERSAMPLE,
+                            help='Largest supersample factor to draw at, lowered if it does not fit the frame')
+    run_parser.add_argument('--midi-port', default=None, help='MIDI input for speed (CC 10), hue (CC 1) and zoom (CC 8)')
+    run_parser.add_argument('--channel', type=int, default=None, help='Only listen to this MIDI channel (1-16)')
+    run_parser.add_argument('--framed', action='store_true', help='Wrap frames with sync header, sequence number and CRC')
+    run_parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+
+    budget_parser = subparsers.add_parser('budget', help='Per-frame render cost of each effect against the frame period')
+    budget_parser.add_argument('effects', nargs='*', help=f"Effects (default: all of {', '.join(EFFECTS)})")
+    budget_parser.add_argument('--fps', type=float, default=30, help='Panel frame rate')
+    budget_parser.add_argument('--supersample', type=int, nargs='+', default=[1, 2, 4], help='Factors to measure')
+
+    args = parser.parse_args()
+    factors = args.supersample if args.command == 'budget' else [args.supersample]
+    if min(factors) < 1:
+        parser.error(f"--supersample must be at least 1, not {min(factors)}")
+    if args.command == 'run':
+        run(load_effect(args.effect), args.port, args.baud, args.fps, args.supersample, args.midi_port,
+            args.channel, args.framed, args.duration)
+    else:
+        unknown = set(args.effects) - set(EFFECTS)
+        if unknown:
+            parser.error(f"unknown effects: {', '.join(sorted(unknown))}")
+        budget_report(args.effects or list(EFFECTS), args.fps, args.supersample)
@@ -0,0 +1,224 @@
+import argparse
+import os
+import re
+import sys
+from collections import namedtuple
+
+# Host-side view of the SD card media layout the firmware plays from:
+#
+#   video_map.txt, image_map.txt     one MIDI_NOTE,BANK_NUMBER,FILE_NAME per line
+#   video/<bank>/<file>              raw 40x96 RGB frames
+#   image/<bank>/<file>              one raw frame
+#
+# Map files are parsed exactly like loadMappings (trimmed lines, String.toInt, byte note/bank,
+# 12-character filename buffer, at most MAX_MAPPINGS entries), then indexed by (bank, note).
+# The firmware scans its array for the first match, so the index keeps the first entry for each
+# key and validate() reports the later ones as unreachable.
+
+MAX_MAPPINGS = 512
+FILENAME_LENGTH = 12                  # char filename[13]
+FRAME_SIZE = 40 * 96 * 3
+MAP_FILES = {'video': 'video_map.txt', 'image': 'image_map.txt'}
+
+# FAT short names: 1-8 character name, optional 1-3 character extension
+SHORT_NAME = re.compile(r"^[A-Za-z0-9!#$%&'()\-@^_`{}~]{1,8}(\.[A-Za-z0-9!#$%&'()\-@^_`{}~]{1,3})?$")
+
+# index is the position in the firmware's mapping array, line the 1-based line in the map file
+Mapping = namedtuple('Mapping', 'index line note bank filename')
+
+
+def _to_int(text):
+    # Arduino String.toInt(): leading integer, 0 if there is none
+    text = text.strip()
+    digits = len(text) - len(text.lstrip('+-'))
+    end = digits
+    while end < len(text) and text[end].isdigit():
+        end += 1
+    try:
+        return int(text[:end])
+    except ValueError:
+        return 0
+
+
+def parse_map(lines):
+    """
+    Parse map file lines like loadMappings. Returns (mappings, problems), problems being
+    (line, message) for everything the firmware silently ignores, truncates or wraps.
+    """
+    mappings = []
+    problems = []
+    skipped = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if len(mappings) >= MAX_MAPPINGS:
+            skipped.append(number)
+            continue
+        first = line.find(',')
+        second = line.find(',', first + 1) if first > 0 else -1
+        if first <= 0 or second <= first:
+            problems.append((number, f"not NOTE,BANK,FILE, ignored: {line!r}"))
+            continue
+
+        fields = {'note': line[:first].strip(), 'bank': line[first + 1:second].strip()}
+        values = {}
+        for name, text in fields.items():
+            values[name] = _to_int(text) & 0xFF   # Stored in a byte
+            if not text.isdigit() or int(text) > 127:
+                problems.append((number, f"{name} {text!r} is not 0-127, the firmware reads it as {values[name]}"))
+
+        filename = line[second + 1:]
+        if len(filename) > FILENAME_LENGTH:
+            problems.append((number, f"file name {filename!r} is longer than {FILENAME_LENGTH} characters, "
+                                     f"the firmware opens {filename[:FILENAME_LENGTH]!r}"))
+            filename = filename[:FILENAME_LENGTH]
+        elif not SHORT_NAME.match(filename):
+            problems.append((number, f"file name {filename!r} is not an 8.3 name"))
+        mappings.append(Mapping(len(mappings), number, values['note'], values['bank'], filename))
+
+    if skipped:
+        problems.append((skipped[0], f"{len(skipped)} mappings from here on (lines {skipped[0]}-{skipped[-1]}) "
+                                     f"are beyond MAX_MAPPINGS ({MAX_MAPPINGS}), skipped by the firmware"))
+    return mappings, problems
+
+
+class MediaLibrary:
+    """
+    The map files and media folders under `root` (None for an empty library), with O(1)
+    (bank, note) lookup per kind ('video' or 'image').
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self.mappings = {kind: [] for kind in MAP_FILES}
+        self.index = {kind: {} for kind in MAP_FILES}
+        self.parse_problems = {kind: [] for kind in MAP_FILES}
+        self.missing_maps = []
+        for kind, name in MAP_FILES.items():
+            path = os.path.join(root, name) if root is not None else None
+            if path is None or not os.path.exists(path):
+                self.missing_maps.append(name)
+                continue
+            with open(path, 'r', errors='replace') as f:
+                self.load_map(kind, f.read().split('\n'))
+
+    def load_map(self, kind, lines):
+        """Replace the mappings of one kind with parsed map file lines"""
+        self.mappings[kind], self.parse_problems[kind] = parse_map(lines)
+        index = {}
+        for mapping in self.mappings[kind]:
+            index.setdefault((mapping.bank, mapping.note), mapping)
+        self.index[kind] = index
+
+    def lookup(self, kind, bank, note):
+        """The mapping the firmware plays for `note` in `bank`, or None"""
+        return self.index[kind].get((bank, note))
+
+    def path(self, kind, mapping):
+        """Where the firmware opens the mapping's file, /<kind>/<bank>/<filename> on the card"""
+        return os.path.join(self.root or '', kind, str(mapping.bank), mapping.filename)
+
+    def open_clip(self, bank, note):
+        """Memory-mapped video for `note` in `bank` (video_bin_stream.BinVideo), or None if unmapped"""
+        from video_bin_stream import BinVideo
+
+        mapping = self.lookup('video', bank, note)
+        return BinVideo(self.path('video', mapping)) if mapping else None
+
+    def validate(self, check_files=True):
+        """Every problem with the card layout as '<map file>:<line>: message' strings"""
+        problems = [f"{name}: missing" for name in self.missing_maps if self.root is not None]
+        for kind, name in MAP_FILES.items():
+            messages = list(self.parse_problems[kind])
+            for mapping in self.mappings[kind]:
+                first = self.index[kind][(mapping.bank, mapping.note)]
+                if first is not mapping:
+                    messages.append((mapping.line, f"bank {mapping.bank} note {mapping.note} is already mapped "
+                                                   f"on line {first.line}, never played"))
+                elif check_files:
+                    messages.extend((mapping.line, message) for message in self._check_file(kind, mapping))
+            problems.extend(f"{name}:{line}: {message}" for line, message in sorted(messages))
+        return problems
+
+    def _check_file(self, kind, mapping):
+        path = self.path(kind, mapping)
+        if not os.path.isfile(path):
+            return [f"{path} not found"]
+        size = os.path.getsize(path)
+        if kind == 'video' and (size < FRAME_SIZE or size % FRAME_SIZE):
+            return [f"{path} is {size} bytes, not a whole number of {FRAME_SIZE}-byte frames"]
+        if kind == 'image' and size < FRAME_SIZE:
+            return [f"{path} is {size} bytes, images need {FRAME_SIZE}"]
+        return []
+
+    def unmapped_files(self):
+        """Media files on the card no mapping points at"""
+        mapped = {self.path(kind, mapping) for kind in MAP_FILES for mapping in self.mappings[kind]}
+        unmapped = []
+        for kind in MAP_FILES:
+            for folder, _, files in os.walk(os.path.join(self.root or '', kind)):
+                unmapped.extend(path for path in (os.path.join(folder, name) for name in sorted(files))
+                                if path not in mapped)
+        return unmapped
+
+    def summary(self):
+        parts = []
+        for kind in MAP_FILES:
+            banks = {mapping.bank for mapping in self.mappings[kind]}
+            parts.append(f"{len(self.mappings[kind])}/{MAX_MAPPINGS} {kind} mappings in {len(banks)} banks")
+        return ', '.join(parts)
+
+
+def check(root, check_files=True):
+    library = MediaLibrary(root)
+    print(library.summary())
+    problems = library.validate(check_files)
+    for problem in problems:
+        print(problem)
+    if check_files:
+        unmapped = library.unmapped_files()
+        if unmapped:
+            print(f"{len(unmapped)} files are not mapped: {', '.join(os.path.relpath(path, root) for path in unmapped)}")
+    print(f"{len(problems)} problems" if problems else "OK")
+    return problems
+
+
+def list_mappings(root):
+    library = MediaLibrary(root)
+    for kind in MAP_FILES:
+        for (bank, note), mapping in sorted(library.index[kind].items()):
+            print(f"{kind} bank {bank:3d} note {note:3d}: {mapping.filename}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check and play the SD card media layout from the host')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = subparsers.add_parser('check', help='Validate map files and media before a show')
+    check_parser.add_argument('root', help='SD card root (or a copy of it)')
+    check_parser.add_argument('--no-files', action='store_true', help='Only check the map files')
+
+    list_parser = subparsers.add_parser('list', help='Print what every bank/note plays')
+    list_parser.add_argument('root', help='SD card root (or a copy of it)')
+
+    play_parser = subparsers.add_parser('play', help='Stream a mapped video over serial')
+    play_parser.add_argument('root', help='SD card root (or a copy of it)')
+    play_parser.add_argument('--bank', type=int, default=0, help='Video bank')
+    play_parser.add_argument('--note', type=int, required=True, help='MIDI note')
+    play_parser.add_argument('--port', default='/dev/cu.usbmodem144533101', help='Serial port')
+    play_parser.add_argument('--fps', type=float, default=30, help='Clip frame rate')
+
+    args = parser.parse_args()
+    if args.command == 'check':
+        sys.exit(1 if check(args.root, not args.no_files) else 0)
+    elif args.command == 'list':
+        list_mappings(args.root)
+    else:
+        from video_bin_stream import stream_bin_file
+
+        library = MediaLibrary(args.root)
+        mapping = library.lookup('video', args.bank, args.note)
+        if mapping is None:
+            sys.exit(f"No video mapped to bank {args.bank} note {args.note}")
+        stream_bin_file(library.path('video', mapping), args.port, fps=args.fps)
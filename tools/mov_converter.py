@@ -3,10 +3,12 @@ import numpy as np
 import os
 import argparse
 
-BRIGHTNESS_THRESHOLD = 0.10  # 5% brightness threshold
+from clip_format import FORMATS, open_writer
+from pipeline import load_pipeline
+
 TARGET_FPS = 30  # Target frame rate for LED display
 
-def convert_mov(input_file, output_name=None, high_contrast=False):
+def convert_mov(input_file, output_name=None, high_contrast=False, fmt='raw', hsv=None):
     # Check if input file exists
     if not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' not found")
@@ -33,36 +35,14 @@ def convert_mov(input_file, output_name=None, high_contrast=False):
     # Calculate frame skip to maintain proper speed
     frame_skip = max(1, round(source_fps / TARGET_FPS))
 
-    # Create binary output file
-    binary_output = open(os.path.join(output_dir, f'{output_name}.bin'), 'wb')
-
-    def apply_black_threshold(image, high_contrast=False):
-        # Convert to HSV for better brightness handling
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
-        # Normalize V channel to 0-1 range
-        v_channel = hsv[:, :, 2].astype(float) / 255
-
-        if high_contrast:
-            # More aggressive brightness adjustment for high contrast mode
-            v_channel = np.power(v_channel, 1.5)  # Darken mid-tones
-            threshold = 0.20  # Higher threshold for black
-        else:
-            threshold = BRIGHTNESS_THRESHOLD
-
-        # Create mask where brightness is below threshold
-        dark_mask = v_channel < threshold
-
-        # Create output array
-        output = image.copy()
-
-        if high_contrast:
-            # Boost contrast of non-black areas
-            output = cv2.convertScaleAbs(output, alpha=1.4, beta=-20)
-
-        # Set all channels to 0 where mask is True
-        output[dark_mask] = 0
+    # Create binary output file (raw .bin or compressed .rle)
+    output_path = os.path.join(output_dir, output_name + FORMATS[fmt][0])
+    binary_output = open_writer(os.path.join(output_dir, output_name), fmt, fps=TARGET_FPS)
 
-        return output
+    # RGB, black threshold on the full frame, resize, CLAHE. High contrast mode darkens mid-tones
+    # (V ** 1.5) before a 0.20 threshold, boosts the kept pixels and runs a stronger CLAHE, see pipeline.py.
+    # hsv optionally bakes the firmware's HSV adjustment in
+    led_pipeline = load_pipeline('mov_high_contrast' if high_contrast else 'mov', hsv)
 
     # Process each frame
     frame_count = 0
@@ -76,37 +56,11 @@ def convert_mov(input_file, output_name=None, high_contrast=False):
             frame_count += 1
             continue
 
-        # Convert to RGB for LED display
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Apply black threshold with high contrast if enabled
-        frame_thresholded = apply_black_threshold(frame_rgb, high_contrast)
-
-        # Resize directly to LED display dimensions (40x96)
-        final = cv2.resize(frame_thresholded, (40, 96))
-
-        # Enhance contrast
-        lab = cv2.cvtColor(final, cv2.COLOR_RGB2LAB)
-        l, a, b = cv2.split(lab)
-
-        # Apply CLAHE with different settings based on mode
-        if high_contrast:
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(2,2))  # More aggressive CLAHE
-            cl = clahe.apply(l)
-            # Additional contrast boost for light areas
-            cl = cv2.convertScaleAbs(cl, alpha=1.3, beta=-10)
-        else:
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-            cl = clahe.apply(l)
-
-        # Merge channels
-        limg = cv2.merge((cl,a,b))
-
-        # Convert back to RGB
-        enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
+        # Threshold, resize directly to LED display dimensions (40x96) and enhance contrast
+        enhanced = led_pipeline.run(frame)
 
         # Write to binary file
-        binary_output.write(enhanced.astype(np.uint8).tobytes())
+        binary_output.write(enhanced.astype(np.uint8))
 
         # Progress indication
         frame_count += 1
@@ -120,7 +74,7 @@ def convert_mov(input_file, output_name=None, high_contrast=False):
     binary_output.close()
 
     print(f"\nConversion complete!")
-    print(f"Binary file generated: {os.path.join(output_dir, f'{output_name}.bin')}")
+    print(f"Binary file generated: {output_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Convert MOV video to LED display binary format')
@@ -128,6 +82,10 @@ if __name__ == "__main__":
     parser.add_argument('--output', help='Output filename (without extension)', default=None)
     parser.add_argument('--high-contrast', action='store_true',
                       help='Enable high contrast mode for more dramatic black levels')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='raw',
+                      help='raw .bin frames or compressed .rle clip')
+    parser.add_argument('--hsv', type=int, nargs=3, metavar=('HUE', 'SAT', 'VAL'), default=None,
+                      help='Bake the firmware HSV adjustment (0-255 each) into the frames')
 
     args = parser.parse_args()
-    convert_mov(args.input, args.output, args.high_contrast)
\ No newline at end of file
+    convert_mov(args.input, args.output, args.high_contrast, args.format, tuple(args.hsv) if args.hsv else None)
\ No newline at end of file
@@ -0,0 +1,232 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+# Struct-of-arrays particle system for the generators. A Particles set keeps positions,
+# velocities, colours, radii, birth frames and lifetimes as NumPy arrays, so moving, fading and
+# drawing thousands of particles is a handful of array operations per frame instead of a Python
+# loop with a cv2.circle call and a colour tuple per particle.
+#
+# Ballistic particles have closed-form positions (at birth + velocity * age), so an effect can
+# draw any frame without replaying the ones before it, as generator.py requires. Particles that
+# bounce off walls step frame by frame with update().
+#
+# splat() stamps filled discs with the exact pixel shape cv2.circle draws, later particles over
+# earlier ones, so it can replace a loop of cv2.circle calls without changing the picture.
+# `python particles.py verify` checks that, `bench` compares it with the per-particle loop.
+
+_stamps = {}
+
+
+def _stamp(radius):
+    """(dy, dx) offsets of the pixels a filled cv2.circle of `radius` covers around its centre"""
+    if radius not in _stamps:
+        patch = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+        cv2.circle(patch, (radius, radius), radius, 1, -1)
+        dy, dx = np.nonzero(patch)
+        _stamps[radius] = ((dy - radius).astype(np.int32), (dx - radius).astype(np.int32))
+    return _stamps[radius]
+
+
+def splat(img, centers, radii, colors):
+    """
+    Draw filled discs into a (height, width, 3) uint8 image, same pixels as calling
+    cv2.circle(img, center, radius, color, -1) for each in order. centers (N, 2) integer pixel
+    positions, radii an int or (N,) ints, colors one BGR tuple or (N, 3).
+    """
+    centers = np.asarray(centers).astype(np.int64, copy=False).reshape(-1, 2)
+    count = len(centers)
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.int64), (count,))
+    # Each BGR triple as one 3-byte scalar, so a pixel is written with one element assignment
+    colors = np.ascontiguousarray(np.broadcast_to(np.asarray(colors, dtype=np.uint8), (count, 3))).view('V3')[:, 0]
+    height, width = img.shape[:2]
+
+    x, y = centers[:, 0], centers[:, 1]
+    visible = (x + radii >= 0) & (x - radii < width) & (y + radii >= 0) & (y - radii < height)
+    if not visible.all():
+        x, y, radii, colors = x[visible], y[visible], radii[visible], colors[visible]
+    if len(x) == 0:
+        return img
+
+    # One row of pixel offsets per particle, padded to the largest stamp and masked to its own,
+    # so rows stay in particle order and overlaps resolve like the loop
+    unique, which = np.unique(radii, return_inverse=True)
+    stamps = [_stamp(radius) for radius in unique.tolist()]
+    size = max(len(dy) for dy, _ in stamps)
+    dys = np.zeros((len(stamps), size), dtype=np.int32)
+    dxs = np.zeros((len(stamps), size), dtype=np.int32)
+    mask = np.zeros((len(stamps), size), dtype=bool)
+    for n, (dy, dx) in enumerate(stamps):
+        dys[n, :len(dy)], dxs[n, :len(dx)], mask[n, :len(dy)] = dy, dx, True
+    pixels = (y * width + x).astype(np.int32)[:, None] + (dys * width + dxs)[which]
+
+    # Only discs crossing the edge need a per-pixel bounds check
+    edge = np.flatnonzero((x < radii) | (x + radii >= width) | (y < radii) | (y + radii >= height))
+    if len(stamps) > 1 or len(edge):
+        valid = mask[which]
+        if len(edge):
+            ex = x[edge, None] + dxs[which[edge]]
+            ey = y[edge, None] + dys[which[edge]]
+            valid[edge] &= (ex >= 0) & (ex < width) & (ey >= 0) & (ey < height)
+        pixels, colors = pixels[valid], np.broadcast_to(colors[:, None], valid.shape)[valid]
+    else:
+        pixels, colors = pixels.ravel(), np.repeat(colors, size)
+
+    # Repeated indices are assigned in order, the last particle on a pixel wins
+    img.reshape(-1, 3).view('V3')[:, 0][pixels] = colors
+    return img
+
+
+class Particles:
+    """
+    N particles: pos and vel (N, 2) float64 in pixels and pixels per frame, color (N, 3) BGR,
+    size (N,) disc radius, born (N,) frame pos is at, life (N,) frames over which the particle
+    fades out (inf to never fade).
+    """
+
+    def __init__(self, pos, vel, color, size, born=0, life=np.inf):
+        self.pos = np.array(pos, dtype=np.float64).reshape(-1, 2)
+        count = len(self.pos)
+        self.vel = np.array(np.broadcast_to(vel, (count, 2)), dtype=np.float64)
+        self.color = np.array(np.broadcast_to(color, (count, 3)), dtype=np.int64)
+        self.size = np.array(np.broadcast_to(size, (count,)), dtype=np.int64)
+        self.born = np.array(np.broadcast_to(born, (count,)), dtype=np.float64)
+        self.life = np.array(np.broadcast_to(life, (count,)), dtype=np.float64)
+
+    @classmethod
+    def burst(cls, count, center, max_speed, colors, sizes=1, rng=None, born=0, life=np.inf):
+        """
+        `count` particles leaving `center` at frame `born`, each velocity component uniform in
+        [-max_speed, max_speed], colour picked from `colors` and radius from `sizes` (an int or
+        a list to choose from).
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        vel = rng.uniform(-max_speed, max_speed, (count, 2))
+        color = np.asarray(colors)[rng.integers(len(colors), size=count)]
+        size = rng.choice(sizes, count) if np.ndim(sizes) else sizes
+        return cls(np.broadcast_to(center, (count, 2)), vel, color, size, born, life)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def extend(self, other):
+        """Add another set's particles after these, e.g. a new burst from an emitter"""
+        for name in ('pos', 'vel', 'color', 'size', 'born', 'life'):
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+        return self
+
+    def positions(self, frame):
+        """Where ballistic particles are at `frame`, closed form"""
+        return self.pos + self.vel * (frame - self.born)[:, None]
+
+    def alpha(self, frame):
+        """Fade 255 at birth down to 0 after `life` frames, int(255 * (1 - age / life)), 0 before birth"""
+        age = frame - self.born
+        alpha = np.floor(255 * (1 - age / self.life))
+        return np.where(age >= 0, np.clip(alpha, 0, 255), 0).astype(np.int64)
+
+    def colors(self, frame):
+        """Colours faded by alpha(), int(c * alpha / 255) per channel like the per-particle scripts"""
+        return self.color * self.alpha(frame)[:, None] // 255
+
+    def update(self, bounds=None):
+        """
+        Step every particle by one frame of velocity. With bounds (x_min, y_min, x_max, y_max) a
+        particle whose disc touches a wall is sent back inwards. Returns the particles that hit
+        (left, right, top, bottom) as boolean arrays (all False without bounds).
+        """
+        self.pos += self.vel
+        self.born += 1
+        if bounds is None:
+            none = np.zeros(len(self), dtype=bool)
+            return none, none, none, none
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        left = x - self.size <= bounds[0]
+        right = ~left & (x + self.size >= bounds[2])
+        top = y - self.size <= bounds[1]
+        bottom = ~top & (y + self.size >= bounds[3])
+        self.vel[left, 0] = np.abs(self.vel[left, 0])
+        self.vel[right, 0] = -np.abs(self.vel[right, 0])
+        self.vel[top, 1] = np.abs(self.vel[top, 1])
+        self.vel[bottom, 1] = -np.abs(self.vel[bottom, 1])
+        return left, right, top, bottom
+
+    def draw(self, img, frame=None):
+        """Splat the particles alive at `frame` (default: their current positions, unfaded)"""
+        if frame is None:
+            return splat(img, self.pos.astype(np.int64), self.size, self.color)
+        alive = frame >= self.born
+        centers = self.positions(frame)[alive].astype(np.int64)     # Truncates like int()
+        return splat(img, centers, self.size[alive], self.colors(frame)[alive])
+
+
+def _loop_draw(img, particles, frame):
+    # Per-particle version the scripts used, the reference for verify() and bench()
+    for n in range(len(particles)):
+        if frame < particles.born[n]:
+            continue
+        x, y = particles.pos[n] + particles.vel[n] * (frame - particles.born[n])
+        alpha = int(255 * (1 - (frame - particles.born[n]) / particles.life[n]))
+        color = tuple(int(c * alpha / 255) for c in particles.color[n])
+        cv2.circle(img, (int(x), int(y)), int(particles.size[n]), color, -1)
+    return img
+
+
+def _test_particles(count, rng, width=400, height=960):
+    colors = [(255, 0, 0), (0, 0, 255), (255, 255, 0)]
+    particles = Particles.burst(count, (width // 2, height // 2), 15, colors, [1, 2, 3], rng, life=60)
+    return particles.extend(Particles.burst(count // 4, (50, 80), 6, colors, 4, rng, born=10, life=40))
+
+
+def verify(frames=40, count=500, seed=1):
+    """splat and Particles.draw against cv2.circle loops, including discs partly off the image"""
+    rng = np.random.default_rng(seed)
+    particles = _test_particles(count, rng)
+    mismatches = 0
+    for frame in range(frames):
+        expected = _loop_draw(np.zeros((960, 400, 3), np.uint8), particles, frame)
+        actual = particles.draw(np.zeros((960, 400, 3), np.uint8), frame)
+        mismatches += int(np.any(expected != actual))
+    for radius in range(0, 20):
+        centers = rng.integers(-30, 60, (50, 2))
+        colors = rng.integers(0, 256, (50, 3))
+        expected = np.zeros((40, 40, 3), np.uint8)
+        for center, color in zip(centers.tolist(), colors.tolist()):
+            cv2.circle(expected, tuple(center), radius, tuple(color), -1)
+        mismatches += int(np.any(splat(np.zeros((40, 40, 3), np.uint8), centers, radius, colors) != expected))
+    print(f"{frames} particle frames and 20 radii: {'OK' if mismatches == 0 else f'{mismatches} MISMATCHES'}")
+    return mismatches == 0
+
+
+def benchmark(counts=(300, 3000, 30000), frames=30, fps=30):
+    """Frames per second drawing a fading burst, per-particle loop against draw()"""
+    for count in counts:
+        particles = _test_particles(count, np.random.default_rng(0))
+        timings = {}
+        for label, draw in (('loop', _loop_draw), ('vectorized', lambda img, p, f: p.draw(img, f))):
+            start = time.perf_counter()
+            for frame in range(frames):
+                draw(np.zeros((960, 400, 3), np.uint8), particles, frame)
+            timings[label] = (time.perf_counter() - start) / frames
+        loop, vectorized = timings['loop'], timings['vectorized']
+        print(f"{len(particles):6d} particles: loop {1 / loop:7.1f} fps, vectorized {1 / vectorized:7.1f} fps "
+              f"({1 / vectorized / fps:.1f}x realtime), speedup {loop / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vectorized particle engine for the generators')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = subparsers.add_parser('verify', help='Check splat against cv2.circle pixel for pixel')
+    verify_parser.add_argument('--frames', type=int, default=40, help='Burst frames to compare')
+
+    bench_parser = subparsers.add_parser('bench', help='Compare with the per-particle loop')
+    bench_parser.add_argument('--particles', type=int, nargs='+', default=[300, 3000, 30000], help='Burst sizes')
+    bench_parser.add_argument('--frames', type=int, default=30, help='Frames per measurement')
+
+    args = parser.parse_args()
+    if args.command == 'verify':
+        raise SystemExit(0 if verify(args.frames) else 1)
+    benchmark(args.particles, args.frames)
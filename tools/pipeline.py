@@ -0,0 +1,556 @@
+import argparse
+import sys
+import time
+import cv2
+import numpy as np
+
+from fastled import adjust_hsv
+
+# Declarative LED post-processing shared by the generators and converters.
+#
+# A pipeline is a list of steps, each a dict naming the step plus its parameters:
+#
+#   [{'step': 'resize', 'width': 40, 'height': 96},
+#    {'step': 'rgb'},
+#    {'step': 'clahe', 'clip_limit': 2.0},
+#    {'step': 'contrast', 'contrast': 1.2, 'brightness': -10},
+#    {'step': 'threshold', 'threshold': 20}]
+#
+# Steps:
+#   resize         cv2.resize every frame to width x height
+#   crop           scale to cover width x height keeping the aspect ratio, centre crop (video_converter)
+#   rgb            BGR -> RGB
+#   clahe          CLAHE on the LAB L channel, clip_limit, tile_grid, optional l_scale (alpha, beta)
+#                  convertScaleAbs on the equalised L channel
+#   contrast       addWeighted(frame, contrast, frame, 0, brightness)
+#   threshold      zero every channel value below threshold
+#   gamma          255 * (value / 255) ** gamma
+#   hsv_threshold  zero pixels whose HSV value (max of R, G, B) / 255, raised to gamma, is below
+#                  threshold; optional scale (alpha, beta) convertScaleAbs on the kept pixels (mov_converter)
+#   hsv_adjust     the firmware's per-layer HSV adjustment (fastled.adjust_hsv) with hue, saturation and
+#                  value in firmware units (0-255), bakes what the wall would show into the frames
+#
+# Consecutive per-value steps (contrast, threshold, gamma) are fused into one 256-entry LUT built by
+# running the same operations on a 0..255 ramp, colour conversions and LUTs run once over the whole
+# batch, only resize/crop and CLAHE need a loop over frames. hsv_threshold is integer-only (uint8 max
+# plus a mask LUT). `python pipeline.py verify` checks every preset bit-for-bit against the per-script
+# code it replaced, and hsv_threshold against the HSV/float version over all 2^24 colours.
+
+WIDTH, HEIGHT = 40, 96
+RAMP = np.arange(256, dtype=np.uint8).reshape(1, 256)
+
+
+def enhance_steps(contrast=1.2, brightness=-10, threshold=20, clip_limit=2.0):
+    """LED enhancement of RGB frames: CLAHE (unless clip_limit is None), contrast, threshold. All in place."""
+    steps = []
+    if clip_limit is not None:
+        steps.append({'step': 'clahe', 'clip_limit': clip_limit})
+    steps.append({'step': 'contrast', 'contrast': contrast, 'brightness': brightness})
+    steps.append({'step': 'threshold', 'threshold': threshold})
+    return steps
+
+
+def led_steps(contrast=1.2, brightness=-10, threshold=20, clip_limit=2.0, width=WIDTH, height=HEIGHT):
+    """Steps used by the generators: resize, RGB, then enhance_steps()."""
+    steps = [{'step': 'resize', 'width': width, 'height': height}, {'step': 'rgb'}]
+    return steps + enhance_steps(contrast, brightness, threshold, clip_limit)
+
+
+PRESETS = {
+    'generator': led_steps(1.2, -10, 20),
+    'generator_dim': led_steps(0.9, -20, 20),
+    'generator_flat': led_steps(1.2, -10, 20, clip_limit=None),
+    'video': [
+        {'step': 'crop', 'width': WIDTH, 'height': HEIGHT},
+        {'step': 'rgb'},
+        {'step': 'clahe', 'clip_limit': 2.0},
+        {'step': 'contrast', 'contrast': 1.2, 'brightness': -10},
+        {'step': 'hsv_threshold', 'threshold': 0.05},
+    ],
+    'mov': [
+        {'step': 'rgb'},
+        {'step': 'hsv_threshold', 'threshold': 0.10},
+        {'step': 'resize', 'width': WIDTH, 'height': HEIGHT},
+        {'step': 'clahe', 'clip_limit': 2.0},
+    ],
+    'mov_high_contrast': [
+        {'step': 'rgb'},
+        {'step': 'hsv_threshold', 'threshold': 0.20, 'gamma': 1.5, 'scale': (1.4, -20)},
+        {'step': 'resize', 'width': WIDTH, 'height': HEIGHT},
+        {'step': 'clahe', 'clip_limit': 3.0, 'l_scale': (1.3, -10)},
+    ],
+}
+
+
+# Per-value steps, each maps a uint8 LUT (values 0..255 so far) to the next one
+def _contrast_lut(lut, contrast=1.0, brightness=0):
+    return cv2.addWeighted(lut, contrast, lut, 0, brightness)
+
+
+def _threshold_lut(lut, threshold=0):
+    return np.where(lut < threshold, 0, lut).astype(np.uint8)
+
+
+def _gamma_lut(lut, gamma=1.0):
+    return np.clip(np.round(255 * np.power(lut / 255, gamma)), 0, 255).astype(np.uint8)
+
+
+LUT_STEPS = {'contrast': _contrast_lut, 'threshold': _threshold_lut, 'gamma': _gamma_lut}
+
+
+class _Resize:
+    inplace = False
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.size = (width, height)
+
+    def __call__(self, frames):
+        width, height = self.size
+        out = np.empty((len(frames), height, width, 3), dtype=np.uint8)
+        for n, frame in enumerate(frames):
+            out[n] = cv2.resize(frame, self.size)
+        return out
+
+
+class _Crop:
+    """Resize to cover the target keeping the aspect ratio, crop the centre, final resize to exact size"""
+    inplace = False
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+
+    def __call__(self, frames):
+        out = np.empty((len(frames), self.height, self.width, 3), dtype=np.uint8)
+        height, width = frames[0].shape[:2]
+        aspect_ratio = width / height
+        if aspect_ratio > self.width / self.height:
+            resize_height = self.height
+            resize_width = int(resize_height * aspect_ratio)
+        else:
+            resize_width = self.width
+            resize_height = int(resize_width / aspect_ratio)
+        y_start = (resize_height - self.height) // 2
+        x_start = (resize_width - self.width) // 2
+
+        for n, frame in enumerate(frames):
+            resized = cv2.resize(frame, (resize_width, resize_height))
+            cropped = resized[y_start:y_start + self.height, x_start:x_start + self.width]
+            out[n] = cv2.resize(cropped, (self.width, self.height))
+        return out
+
+
+class _Rgb:
+    inplace = False
+
+    def __call__(self, frames):
+        # One cvtColor call for the whole batch, stacked as a single tall image
+        flat = frames.reshape(-1, frames.shape[2], 3)
+        return cv2.cvtColor(flat, cv2.COLOR_BGR2RGB).reshape(frames.shape)
+
+
+class _Clahe:
+    inplace = True
+
+    def __init__(self, clip_limit=2.0, tile_grid=(2, 2), l_scale=None):
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tuple(tile_grid))
+        self.l_lut = cv2.convertScaleAbs(RAMP, alpha=l_scale[0], beta=l_scale[1]) if l_scale else None
+        self.shape = None
+
+    def __call__(self, frames):
+        # LAB and L buffers are kept between calls and only reallocated when the batch shape changes
+        if frames.shape != self.shape:
+            self.shape = frames.shape
+            self.lab = np.empty((frames.shape[0] * frames.shape[1], frames.shape[2], 3), dtype=np.uint8)
+            self.l = np.empty(frames.shape[:3], dtype=np.uint8)
+        flat = frames.reshape(self.lab.shape)
+        l = self.l.reshape(self.lab.shape[:2])
+        cv2.cvtColor(flat, cv2.COLOR_RGB2LAB, dst=self.lab)
+        cv2.extractChannel(self.lab, 0, dst=l)
+        # CLAHE tiles are per frame, everything around it runs on the whole batch
+        for n in range(len(frames)):
+            self.clahe.apply(self.l[n], dst=self.l[n])
+        if self.l_lut is not None:
+            cv2.LUT(l, self.l_lut, dst=l)
+        cv2.insertChannel(l, self.lab, 0)
+        cv2.cvtColor(self.lab, cv2.COLOR_LAB2RGB, dst=flat)
+        return frames
+
+
+class _HsvThreshold:
+    inplace = True
+
+    def __init__(self, threshold=0.05, gamma=1.0, scale=None):
+        # Integer-only: V is max(R, G, B), so the float V / 255 (** gamma) < threshold test only
+        # ever sees 256 inputs. Evaluate it once per value with the same float arithmetic the
+        # HSV version used and keep the result as a 0/255 mask LUT.
+        v_channel = np.arange(256).astype(float) / 255
+        if gamma != 1.0:
+            v_channel = np.power(v_channel, gamma)
+        self.keep = np.where(v_channel < threshold, 0, 255).astype(np.uint8).reshape(1, 256)
+        self.scale = cv2.convertScaleAbs(RAMP, alpha=scale[0], beta=scale[1]) if scale else None
+
+    def __call__(self, frames):
+        flat = frames.reshape(-1, frames.shape[2], 3)
+        # For 8-bit RGB, OpenCV's HSV V channel is exactly the max of the three channels
+        value = np.maximum(np.maximum(flat[..., 0], flat[..., 1]), flat[..., 2])
+        mask = cv2.LUT(value, self.keep)
+        # The boost is a per-value LUT too, the mask comes from the values before it
+        if self.scale is not None:
+            cv2.LUT(flat, self.scale, dst=flat)
+        cv2.bitwise_and(flat, cv2.merge((mask, mask, mask)), dst=flat)
+        return frames
+
+
+class _Lut:
+    inplace = True
+
+    def __init__(self, lut):
+        self.lut = lut
+
+    def __call__(self, frames):
+        flat = frames.reshape(-1, frames.shape[2], 3)
+        cv2.LUT(flat, self.lut, dst=flat)
+        return frames
+
+
+class _HsvAdjust:
+    inplace = False
+
+    def __init__(self, hue=0, saturation=255, value=255):
+        self.adjustment = (hue, saturation, value)
+
+    def __call__(self, frames):
+        return adjust_hsv(frames, *self.adjustment)
+
+
+STAGES = {'resize': _Resize, 'crop': _Crop, 'rgb': _Rgb, 'clahe': _Clahe, 'hsv_threshold': _HsvThreshold,
+          'hsv_adjust': _HsvAdjust}
+
+
+class Pipeline:
+    """
+    Runs a list of steps (see the top of this file) over batches of uint8 frames. Input frames are
+    never modified. Holds CLAHE state, so use one instance per thread.
+    """
+
+    def __init__(self, steps):
+        self.steps = [dict(step) for step in steps]
+        self.stages = []
+        lut = None
+        for step in self.steps:
+            params = {key: value for key, value in step.items() if key != 'step'}
+            name = step['step']
+            if name in LUT_STEPS:
+                lut = LUT_STEPS[name](RAMP if lut is None else lut, **params)
+                continue
+            if name not in STAGES:
+                raise ValueError(f"Unknown pipeline step: {name}")
+            self._add_lut(lut)
+            lut = None
+            self.stages.append(STAGES[name](**params))
+        self._add_lut(lut)
+
+    def _add_lut(self, lut):
+        # Identity LUTs (e.g. contrast 1.0, threshold 0) are dropped
+        if lut is not None and not np.array_equal(lut, RAMP):
+            self.stages.append(_Lut(lut))
+
+    def run_batch(self, frames):
+        """Process a (N, height, width, 3) array or a list of same-sized frames, returns a new array."""
+        frames = np.ascontiguousarray(np.asarray(frames, dtype=np.uint8))
+        owned = False
+        for stage in self.stages:
+            if stage.inplace and not owned:
+                frames = frames.copy()
+            frames = stage(frames)
+            owned = True
+        return frames if owned else frames.copy()
+
+    def run(self, frame):
+        """Process a single frame"""
+        return self.run_batch(frame[np.newaxis])[0]
+
+    def process(self, frames):
+        """
+        Process a contiguous uint8 (N, height, width, 3) batch or single frame in place and return
+        it, without the copies run_batch makes. Every stage has to work in place, as the
+        enhance_steps() ones do.
+        """
+        if not all(stage.inplace for stage in self.stages):
+            raise ValueError("process() needs in-place steps only (clahe, hsv_threshold, contrast, threshold, gamma)")
+        batch = frames if frames.ndim == 4 else frames[np.newaxis]
+        for stage in self.stages:
+            stage(batch)
+        return frames
+
+
+def load_pipeline(config, hsv=None):
+    """
+    Build a Pipeline from a preset name or a list of step dicts. `hsv` is an optional
+    (hue, saturation, value) firmware adjustment appended as a final hsv_adjust step.
+    """
+    if isinstance(config, str):
+        if config not in PRESETS:
+            raise ValueError(f"Unknown pipeline preset: {config} (known: {', '.join(sorted(PRESETS))})")
+        config = PRESETS[config]
+    if hsv is not None:
+        hue, saturation, value = hsv
+        config = list(config) + [{'step': 'hsv_adjust', 'hue': hue, 'saturation': saturation, 'value': value}]
+    return Pipeline(config)
+
+
+# Golden references: the per-frame code each preset replaced, copied from the scripts
+def _golden_generator(img, contrast, brightness, threshold, clahe=True):
+    frame_rgb = cv2.cvtColor(cv2.resize(img, (40, 96)), cv2.COLOR_BGR2RGB)
+    return _golden_enhance(frame_rgb, contrast, brightness, threshold, clahe)
+
+
+def _golden_enhance(frame_rgb, contrast, brightness, threshold, clahe=True):
+    # The enhancement every generator and converter ran per frame, CLAHE object and all
+    enhanced = frame_rgb
+    if clahe:
+        lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
+        l, a, b = cv2.split(lab)
+        cl = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2, 2)).apply(l)
+        enhanced = cv2.cvtColor(cv2.merge((cl, a, b)), cv2.COLOR_LAB2RGB)
+    adjusted = cv2.addWeighted(enhanced, contrast, enhanced, 0, brightness)
+    return np.where(adjusted < threshold, 0, adjusted).astype(np.uint8)
+
+
+def _golden_video(frame):
+    height, width = frame.shape[:2]
+    aspect_ratio = width / height
+    if aspect_ratio > 40 / 96:
+        resize_height = 96
+        resize_width = int(resize_height * aspect_ratio)
+    else:
+        resize_width = 40
+        resize_height = int(resize_width / aspect_ratio)
+    resized = cv2.resize(frame, (resize_width, resize_height))
+    y_start = (resize_height - 96) // 2
+    x_start = (resize_width - 40) // 2
+    final = cv2.resize(resized[y_start:y_start + 96, x_start:x_start + 40], (40, 96))
+    frame_rgb = cv2.cvtColor(final, cv2.COLOR_BGR2RGB)
+
+    lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+    cl = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2, 2)).apply(l)
+    enhanced = cv2.cvtColor(cv2.merge((cl, a, b)), cv2.COLOR_LAB2RGB)
+    adjusted = cv2.addWeighted(enhanced, 1.2, enhanced, 0, -10)
+
+    v_channel = cv2.cvtColor(adjusted, cv2.COLOR_RGB2HSV)[:, :, 2].astype(float) / 255
+    output = adjusted.copy()
+    output[v_channel < 0.05] = 0
+    return output
+
+
+def _golden_mov(frame, high_contrast):
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    v_channel = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2HSV)[:, :, 2].astype(float) / 255
+    if high_contrast:
+        v_channel = np.power(v_channel, 1.5)
+    dark_mask = v_channel < (0.20 if high_contrast else 0.10)
+    output = frame_rgb.copy()
+    if high_contrast:
+        output = cv2.convertScaleAbs(output, alpha=1.4, beta=-20)
+    output[dark_mask] = 0
+
+    final = cv2.resize(output, (40, 96))
+    lab = cv2.cvtColor(final, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+    cl = cv2.createCLAHE(clipLimit=3.0 if high_contrast else 2.0, tileGridSize=(2, 2)).apply(l)
+    if high_contrast:
+        cl = cv2.convertScaleAbs(cl, alpha=1.3, beta=-10)
+    return cv2.cvtColor(cv2.merge((cl, a, b)), cv2.COLOR_LAB2RGB)
+
+
+def _golden_hsv_threshold(image, threshold, gamma=1.0, scale=None):
+    # The HSV + float64 black threshold video_converter and mov_converter used
+    v_channel = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)[:, :, 2].astype(float) / 255
+    if gamma != 1.0:
+        v_channel = np.power(v_channel, gamma)
+    dark_mask = v_channel < threshold
+    output = image.copy()
+    if scale is not None:
+        output = cv2.convertScaleAbs(output, alpha=scale[0], beta=scale[1])
+    output[dark_mask] = 0
+    return output
+
+
+# hsv_threshold parameters used by the presets
+HSV_THRESHOLDS = [
+    {'threshold': 0.05},
+    {'threshold': 0.10},
+    {'threshold': 0.20, 'gamma': 1.5, 'scale': (1.4, -20)},
+]
+
+
+GOLDEN = {
+    'generator': (lambda img: _golden_generator(img, 1.2, -10, 20), (960, 400)),
+    'generator_dim': (lambda img: _golden_generator(img, 0.9, -20, 20), (960, 400)),
+    'generator_flat': (lambda img: _golden_generator(img, 1.2, -10, 20, clahe=False), (960, 400)),
+    'video': (_golden_video, (360, 640)),
+    'mov': (lambda frame: _golden_mov(frame, False), (360, 640)),
+    'mov_high_contrast': (lambda frame: _golden_mov(frame, True), (360, 640)),
+}
+
+
+def synthetic_frames(num_frames, height, width, seed=0):
+    """Noise over moving gradients and shapes, covers dark, mid and saturated values"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = np.empty((num_frames, height, width, 3), dtype=np.uint8)
+    for n in range(num_frames):
+        base = np.stack([(x * 255 // width + n * 7) % 256, (y * 255 // height) % 256,
+                         ((x + y + n * 11) % 256)], axis=-1)
+        frame = (base * (n % 4) // 3).astype(np.uint8)
+        cv2.circle(frame, (int(rng.integers(width)), int(rng.integers(height))), height // 5,
+                   tuple(int(c) for c in rng.integers(0, 256, 3)), -1)
+        noise = rng.integers(0, 32, frame.shape, dtype=np.uint8)
+        frames[n] = cv2.add(frame, noise)
+    return frames
+
+
+def all_colors():
+    """Every 24-bit RGB colour once, as a 4096x4096 image"""
+    values = np.arange(1 << 24, dtype=np.uint32)
+    return np.stack([values >> 16, (values >> 8) & 0xFF, values & 0xFF], axis=-1).astype(np.uint8).reshape(4096, 4096, 3)
+
+
+def verify_hsv_threshold():
+    """Exhaustive check of the LUT hsv_threshold step against the HSV/float version. Returns failures."""
+    colors = all_colors()
+    failures = []
+    for params in HSV_THRESHOLDS:
+        expected = _golden_hsv_threshold(colors, **params)
+        actual = _HsvThreshold(**params)(colors[np.newaxis].copy())[0]
+        differ = int((actual != expected).any(axis=-1).sum())
+        print(f"hsv_threshold {params}: {'OK, all 2^24 colours match' if not differ else f'FAILED, {differ} colours differ'}")
+        if differ:
+            failures.append(f"hsv_threshold {params}: {differ} colours differ")
+    return failures
+
+
+def verify(presets=None, num_frames=8):
+    """Compare each preset, single frame and batched, against its golden reference. Returns failures."""
+    failures = []
+    for name in presets or GOLDEN:
+        golden, (height, width) = GOLDEN[name]
+        frames = synthetic_frames(num_frames, height, width)
+        expected = np.stack([golden(frame) for frame in frames])
+        pipeline = load_pipeline(name)
+
+        batch = pipeline.run_batch(frames)
+        single = np.stack([pipeline.run(frame) for frame in frames])
+        problems = []
+        if not np.array_equal(batch, expected):
+            problems.append(f"batch differs in {int((batch != expected).any(axis=-1).sum())} pixels")
+        if not np.array_equal(single, expected):
+            problems.append(f"single-frame differs in {int((single != expected).any(axis=-1).sum())} pixels")
+        if not np.array_equal(frames, synthetic_frames(num_frames, height, width)):
+            problems.append("input frames were modified")
+
+        print(f"{name}: {'OK' if not problems else 'FAILED, ' + '; '.join(problems)}")
+        failures.extend(f"{name}: {problem}" for problem in problems)
+    if not presets:
+        failures.extend(verify_hsv_threshold())
+    return failures
+
+
+def benchmark(batch_size=32, repeats=5):
+    """Per-frame golden code vs pipeline single frame vs pipeline batch, per preset."""
+    for name, (golden, (height, width)) in GOLDEN.items():
+        frames = synthetic_frames(batch_size, height, width)
+        pipeline = load_pipeline(name)
+        # Warm up OpenCV and the pipeline buffers before timing
+        golden(frames[0])
+        pipeline.run(frames[0])
+        timings = []
+        for run in (lambda: [golden(frame) for frame in frames],
+                    lambda: [pipeline.run(frame) for frame in frames],
+                    lambda: pipeline.run_batch(frames)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                run()
+            timings.append((time.perf_counter() - start) / (repeats * batch_size))
+        before, single, batch = timings
+        print(f"{name} ({width}x{height} in): per-script {before * 1e6:.0f} us/frame, "
+              f"pipeline {single * 1e6:.0f} us/frame, batch of {batch_size} {batch * 1e6:.0f} us/frame "
+              f"({before / batch:.1f}x)")
+
+
+def benchmark_enhance(repeats=2000):
+    """Per-frame enhancement code vs an enhance_steps() pipeline in place, on 40x96 RGB frames."""
+    frames = synthetic_frames(16, HEIGHT, WIDTH)
+    for contrast, brightness, threshold in ((1.2, -10, 20), (0.9, -20, 20)):
+        enhancer = load_pipeline(enhance_steps(contrast, brightness, threshold))
+        out = np.empty_like(frames[0])
+        for frame in frames:
+            np.copyto(out, frame)
+            if not np.array_equal(enhancer.process(out), _golden_enhance(frame, contrast, brightness, threshold)):
+                raise AssertionError(f"enhancement differs for contrast {contrast} brightness {brightness}")
+
+        def in_place(frame):
+            np.copyto(out, frame)   # Fresh input each time, and the copy a caller keeping its frame pays
+            return enhancer.process(out)
+
+        timings = []
+        for run in (lambda frame: _golden_enhance(frame, contrast, brightness, threshold), in_place):
+            start = time.perf_counter()
+            for n in range(repeats):
+                run(frames[n % len(frames)])
+            timings.append((time.perf_counter() - start) / repeats)
+        before, after = timings
+        print(f"enhance contrast {contrast} brightness {brightness} threshold {threshold} 40x96: "
+              f"per-frame {before * 1e6:.1f} us/frame, in place {after * 1e6:.1f} us/frame "
+              f"({before / after:.1f}x), bit-exact")
+
+
+def benchmark_hsv_threshold(repeats=20):
+    """HSV/float black threshold vs the LUT step on source-sized and LED-sized frames."""
+    for height, width in ((1080, 1920), (96, 40)):
+        frames = synthetic_frames(4, height, width)
+        for params in HSV_THRESHOLDS:
+            stage = _HsvThreshold(**params)
+            timings = []
+            for run in (lambda frame: _golden_hsv_threshold(frame, **params),
+                        lambda frame: stage(frame[np.newaxis].copy())):
+                start = time.perf_counter()
+                for n in range(repeats):
+                    run(frames[n % len(frames)])
+                timings.append((time.perf_counter() - start) / repeats)
+            before, after = timings
+            print(f"hsv_threshold {params} {width}x{height}: HSV/float {before * 1e6:.0f} us/frame, "
+                  f"LUT {after * 1e6:.0f} us/frame ({before / after:.1f}x, "
+                  f"{height * width / after / 1e6:.0f} Mpixel/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Shared LED post-processing pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = subparsers.add_parser('verify', help='Check presets bit-for-bit against the per-script code')
+    verify_parser.add_argument('presets', nargs='*', help=f"Presets to check (default: all of {', '.join(GOLDEN)})")
+    verify_parser.add_argument('--frames', type=int, default=8, help='Synthetic frames per preset')
+
+    bench_parser = subparsers.add_parser('bench', help='Time per-script, single-frame and batched processing')
+    bench_parser.add_argument('--batch', type=int, default=32, help='Frames per batch')
+
+    subparsers.add_parser('list', help='Print the preset step lists')
+
+    args = parser.parse_args()
+    if args.command == 'verify':
+        unknown = set(args.presets) - set(GOLDEN)
+        if unknown:
+            parser.error(f"unknown presets: {', '.join(sorted(unknown))}")
+        sys.exit(1 if verify(args.presets, args.frames) else 0)
+    elif args.command == 'bench':
+        benchmark(args.batch)
+        benchmark_enhance()
+        benchmark_hsv_threshold()
+    else:
+        for name, steps in PRESETS.items():
+            print(f"{name}:")
+            for step in steps:
+                print(f"  {step}")
@@ -0,0 +1,315 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from media_library import FRAME_SIZE, MAP_FILES, MediaLibrary
+
+# Single-file archive of everything the map files point at, so the player opens one file once
+# instead of SD.open per note and finds clips and image brightness through a table. Little-endian:
+#
+#   header   magic b'LEDP', version u16, entry_count u16, width u16, height u16,
+#            alignment u32, data_offset u32, total_size u32
+#   table    entry_count entries of (kind u8, note u8, bank u8, brightness u8, filename char[13],
+#            3 pad bytes, offset u32, size u32, frame_count u32, crc32 u32)
+#   data     media files, each starting on an `alignment` boundary (default one SD sector)
+#
+# Entries are sorted by (kind, bank, note), one per reachable mapping (the first line for a
+# bank/note, like the firmware scan). A file mapped from several notes is stored once and shared.
+# kind is the position in MAP_FILES (0 video, 1 image). Offsets are absolute file offsets.
+MAGIC = b'LEDP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHHIII')
+ENTRY = struct.Struct('<BBBB13s3xIIII')
+SECTOR = 512
+MAX_SIZE = 0xFFFFFFFF       # u32 offsets and sizes, also the largest file FAT32 can hold
+WIDTH, HEIGHT = 40, 96
+KINDS = list(MAP_FILES)
+
+
+def _align(offset, alignment):
+    return -(-offset // alignment) * alignment
+
+
+class Entry:
+    """One table entry, `kind` as a MAP_FILES key"""
+
+    __slots__ = ('kind', 'bank', 'note', 'brightness', 'filename', 'offset', 'size', 'frame_count', 'crc')
+
+    def __init__(self, kind, bank, note, brightness, filename, offset, size, frame_count, crc):
+        self.kind = kind
+        self.bank = bank
+        self.note = note
+        self.brightness = brightness
+        self.filename = filename
+        self.offset = offset
+        self.size = size
+        self.frame_count = frame_count
+        self.crc = crc
+
+    def pack(self):
+        return ENTRY.pack(KINDS.index(self.kind), self.note, self.bank, self.brightness,
+                          self.filename.encode('ascii', 'replace'), self.offset, self.size,
+                          self.frame_count, self.crc)
+
+    @classmethod
+    def unpack(cls, data):
+        kind, note, bank, brightness, filename, offset, size, frame_count, crc = ENTRY.unpack(data)
+        return cls(KINDS[kind], bank, note, brightness, filename.split(b'\0', 1)[0].decode('ascii', 'replace'),
+                   offset, size, frame_count, crc)
+
+    def __repr__(self):
+        return (f"{self.kind} bank {self.bank:3d} note {self.note:3d}: {self.filename:<12} "
+                f"@{self.offset:#010x} {self.frame_count:5d} frames ({self.size} bytes) brightness {self.brightness}")
+
+
+def pack(root, output, brightness=None, alignment=SECTOR):
+    """
+    Pack the media mapped under SD card `root` into `output`. `brightness` maps (kind, bank, note)
+    to a stored brightness, 255 otherwise. Mappings whose file is missing are left out. Returns
+    (entries, skipped) with skipped as 'kind bank/note: path' strings. Raises ValueError before
+    writing anything if the archive would not fit the format.
+    """
+    if alignment <= 0:
+        raise ValueError(f"alignment must be positive, not {alignment}")
+    library = MediaLibrary(root)
+    brightness = brightness or {}
+    mappings = []
+    skipped = []
+    for kind in KINDS:
+        for (bank, note), mapping in sorted(library.index[kind].items()):
+            path = library.path(kind, mapping)
+            if os.path.isfile(path):
+                mappings.append((kind, mapping, path))
+            else:
+                skipped.append(f"{kind} {bank}/{note}: {path} not found")
+
+    # Lay out each distinct file once, after the header and table
+    data_offset = _align(HEADER.size + ENTRY.size * len(mappings), alignment)
+    placed = {}
+    offset = data_offset
+    for _, _, path in mappings:
+        key = os.path.realpath(path)
+        if key not in placed:
+            size = os.path.getsize(path)
+            placed[key] = (offset, size)
+            offset = _align(offset + size, alignment)
+    total_size = offset
+    if total_size > MAX_SIZE:
+        raise ValueError(f"the archive would be {total_size} bytes, over the {MAX_SIZE}-byte limit of "
+                         f"its u32 offsets (and of a FAT32 file), pack fewer or shorter clips")
+
+    entries = []
+    with open(output, 'wb') as f:
+        f.write(b'\0' * data_offset)
+        crcs = {}
+        for key, (start, size) in sorted(placed.items(), key=lambda item: item[1]):
+            f.seek(start)
+            crc = 0
+            with open(key, 'rb') as src:
+                while True:
+                    chunk = src.read(1 << 20)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    f.write(chunk)
+            crcs[key] = crc
+        f.truncate(total_size)
+
+        for kind, mapping, path in mappings:
+            key = os.path.realpath(path)
+            start, size = placed[key]
+            entries.append(Entry(kind, mapping.bank, mapping.note,
+                                 brightness.get((kind, mapping.bank, mapping.note), 255),
+                                 mapping.filename, start, size, size // FRAME_SIZE, crcs[key]))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), WIDTH, HEIGHT, alignment, data_offset, total_size))
+        for entry in entries:
+            f.write(entry.pack())
+    return entries, skipped
+
+
+class PackedClip:
+    """A clip inside a pack, same interface as video_bin_stream.BinVideo (zero-copy frame views)"""
+
+    def __init__(self, view, entry, frame_size=FRAME_SIZE):
+        self.frame_size = frame_size
+        self.entry = entry
+        self.file_size = entry.size
+        self.total_frames = entry.frame_count
+        if self.total_frames == 0:
+            raise ValueError(f"{entry.filename} is smaller than one frame ({frame_size} bytes)")
+        self.view = view[entry.offset:entry.offset + entry.size]
+
+    def frame(self, index):
+        start = (index % self.total_frames) * self.frame_size
+        return self.view[start:start + self.frame_size]
+
+    def close(self):
+        self.view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MediaPack:
+    """Memory-mapped pack with (bank, note) lookup per kind, like MediaLibrary"""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        try:
+            magic, version, count, self.width, self.height, self.alignment, self.data_offset, total_size = \
+                HEADER.unpack_from(self.view)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{filename} is not a version {VERSION} media pack")
+            if total_size != len(self.view):
+                raise ValueError(f"{filename} is {len(self.view)} bytes, the header says {total_size}")
+        except (ValueError, struct.error):
+            self.close()
+            raise
+        self.entries = [Entry.unpack(self.view[HEADER.size + i * ENTRY.size:HEADER.size + (i + 1) * ENTRY.size])
+                        for i in range(count)]
+        self.index = {kind: {} for kind in KINDS}
+        for entry in self.entries:
+            self.index[entry.kind][(entry.bank, entry.note)] = entry
+
+    def lookup(self, kind, bank, note):
+        return self.index[kind].get((bank, note))
+
+    def data(self, entry):
+        """The entry's file contents as a zero-copy memoryview"""
+        return self.view[entry.offset:entry.offset + entry.size]
+
+    def open_clip(self, bank, note):
+        """PackedClip for the video on `note` in `bank`, or None if unmapped"""
+        entry = self.lookup('video', bank, note)
+        return PackedClip(self.view, entry) if entry else None
+
+    def brightness(self, bank, note):
+        """Stored brightness of the image on `note` in `bank`, or None if unmapped"""
+        entry = self.lookup('image', bank, note)
+        return entry.brightness if entry else None
+
+    def close(self):
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # A frame view is still referenced (e.g. by the traceback of an interrupted send),
+            # the map is released when that view is collected
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def verify(pack_file, root):
+    """
+    Round-trip check: every mapping the card can play is in the pack, byte-exact, aligned and
+    with matching frame count and CRC. Returns a list of problems.
+    """
+    library = MediaLibrary(root)
+    problems = []
+    with MediaPack(pack_file) as packed:
+        for kind in KINDS:
+            for key, mapping in sorted(library.index[kind].items()):
+                path = library.path(kind, mapping)
+                entry = packed.lookup(kind, *key)
+                if not os.path.isfile(path):
+                    if entry is not None:
+                        problems.append(f"{kind} {key[0]}/{key[1]}: packed but {path} is missing")
+                    continue
+                if entry is None:
+                    problems.append(f"{kind} {key[0]}/{key[1]}: {path} not in the pack")
+                    continue
+                with open(path, 'rb') as f:
+                    original = f.read()
+                data = packed.data(entry)
+                if entry.offset % packed.alignment:
+                    problems.append(f"{entry!r}: not {packed.alignment}-byte aligned")
+                if entry.filename != mapping.filename:
+                    problems.append(f"{entry!r}: mapped file is {mapping.filename}")
+                if entry.frame_count != len(original) // FRAME_SIZE:
+                    problems.append(f"{entry!r}: {path} has {len(original) // FRAME_SIZE} frames")
+                if zlib.crc32(data) != entry.crc:
+                    problems.append(f"{entry!r}: CRC mismatch")
+                if data != original:
+                    problems.append(f"{entry!r}: contents differ from {path}")
+                data.release()
+        extra = sum(len(index) for index in packed.index.values()) - \
+            sum(len(library.index[kind]) for kind in KINDS)
+        if extra > 0:
+            problems.append(f"{extra} packed entries are not in the map files")
+    return problems
+
+
+def _parse_brightness(values):
+    # KIND:BANK:NOTE=VALUE or BANK:NOTE=VALUE (images)
+    brightness = {}
+    for value in values:
+        key, _, level = value.partition('=')
+        parts = key.split(':')
+        if len(parts) == 2:
+            parts.insert(0, 'image')
+        if len(parts) != 3 or parts[0] not in KINDS or not level:
+            raise ValueError(f"bad brightness {value!r}, expected [KIND:]BANK:NOTE=VALUE")
+        brightness[(parts[0], int(parts[1]), int(parts[2]))] = max(0, min(255, int(level)))
+    return brightness
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pack SD card media into one aligned, indexed archive')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help='Pack everything the map files point at')
+    pack_parser.add_argument('root', help='SD card root (or a copy of it)')
+    pack_parser.add_argument('output', help='Archive to write, e.g. MEDIA.PAK')
+    pack_parser.add_argument('--align', type=int, default=SECTOR, help='Clip start alignment in bytes')
+    pack_parser.add_argument('--brightness', action='append', default=[], metavar='[KIND:]BANK:NOTE=VALUE',
+                             help='Stored brightness for one mapping (default 255, kind defaults to image)')
+
+    list_parser = subparsers.add_parser('list', help='Print the archive table')
+    list_parser.add_argument('archive')
+
+    verify_parser = subparsers.add_parser('verify', help='Check the archive against the card byte for byte')
+    verify_parser.add_argument('archive')
+    verify_parser.add_argument('root', help='SD card root the archive was packed from')
+
+    args = parser.parse_args()
+    if args.command == 'pack':
+        try:
+            brightness = _parse_brightness(args.brightness)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.align <= 0:
+            parser.error(f"--align must be positive, not {args.align}")
+        try:
+            entries, skipped = pack(args.root, args.output, brightness, args.align)
+        except ValueError as e:
+            sys.exit(f"Not packed: {e}")
+        for message in skipped:
+            print(f"skipped {message}")
+        print(f"Packed {len(entries)} mappings into {args.output} ({os.path.getsize(args.output)} bytes)")
+    elif args.command == 'list':
+        with MediaPack(args.archive) as packed:
+            print(f"{len(packed.entries)} entries, {packed.width}x{packed.height}, "
+                  f"{packed.alignment}-byte aligned, data from {packed.data_offset:#x}")
+            for entry in packed.entries:
+                print(repr(entry))
+    else:
+        problems = verify(args.archive, args.root)
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} problems" if problems else "OK, every clip round-trips byte-exactly")
+        sys.exit(1 if problems else 0)
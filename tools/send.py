@@ -3,15 +3,13 @@ import serial
 import time
 import mido
 import os
+import argparse
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 import numpy as np
 
-# Configure the serial port
-ser = serial.Serial('COM7', 2000000)  # Make sure this matches your Teensy's port
-
-print(mido.get_input_names())
-# Configure MIDI input
-midi_port = mido.open_input('port0 1')  # Replace with your MIDI port name
+from framing import FrameEncoder
 
 # Video paths
 video_folder = '../videos/'
@@ -27,92 +25,400 @@ video_files = {
     119: 'cube_explode.mp4',
 }
 
-# Global variables to control video playback
-current_video_thread = None
-video_playing = False
-current_note = None
-
-def clear_led_panel():
-    # Create a black frame
-    black_frame = np.zeros((16, 32, 3), dtype=np.uint8)
-    led_data = black_frame.reshape((-1, 3)).flatten().tobytes()
-    ser.write(led_data)
-    ser.flush()
-    print("LED panel cleared")
-
-def play_video(video_path):
-    global video_playing, current_note
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 32)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 16)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-
-    # Handle case where fps is 0, very low, or invalid
-    if fps <= 0 or not fps:
-        print(f"Warning: Invalid FPS ({fps}) detected. Using default.")
-        frame_delay = 1 / 30  # Default to 30 fps
-    else:
-        frame_delay = 1 / fps
-
-    print(f"Video: {video_path}, FPS: {fps}, Frame delay: {frame_delay}")
-
-    while video_playing:
+class LatencyHistogram:
+    """Latencies in milliseconds, printed as a text histogram"""
+    EDGES = (0.25, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def summary(self):
+        if not self.samples:
+            return f"{self.name}: no samples"
+        ordered = sorted(self.samples)
+        p50, p95 = (ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] for p in (50, 95))
+        return f"{self.name}: n={len(ordered)} p50 {p50:.2f}ms p95 {p95:.2f}ms max {ordered[-1]:.2f}ms"
+
+    def format(self, width=40):
+        lines = [self.summary()]
+        if not self.samples:
+            return lines[0]
+        counts = [0] * (len(self.EDGES) + 1)
+        for ms in self.samples:
+            counts[sum(ms >= edge for edge in self.EDGES)] += 1
+        labels = [f"<{edge}ms" for edge in self.EDGES] + [f">={self.EDGES[-1]}ms"]
+        for label, count in zip(labels, counts):
+            lines.append(f"  {label:>9} {'#' * round(width * count / len(self.samples)):<{width}} {count}")
+        return '\n'.join(lines)
+
+class ClipCache:
+    """
+    Decoded clips as (frames, fps), frames a (N, height, width, 3) uint8 array, least recently
+    used evicted first once their total size exceeds budget_bytes. Clips bigger than the whole
+    budget are not cached. Safe to use from several threads.
+    """
+
+    def __init__(self, budget_bytes=256 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.clips = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            clip = self.clips.get(key)
+            if clip is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.clips.move_to_end(key)
+            return clip
+
+    def put(self, key, frames, fps):
+        if frames.nbytes > self.budget_bytes:
+            return
+        with self.lock:
+            if key in self.clips:
+                self.nbytes -= self.clips.pop(key)[0].nbytes
+            while self.clips and self.nbytes + frames.nbytes > self.budget_bytes:
+                _, (evicted, _) = self.clips.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+            self.clips[key] = (frames, fps)
+            self.nbytes += frames.nbytes
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.clips
+
+    def summary(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            rate = self.hits / lookups if lookups else 0.0
+            frames = sum(len(frames) for frames, _ in self.clips.values())
+            return (f"clip cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+                    f"{len(self.clips)} clips / {frames} frames, {self.nbytes / 2**20:.1f} of "
+                    f"{self.budget_bytes / 2**20:.0f} MB, {self.evictions} evicted")
+
+class VideoPlayer:
+    """
+    Plays the video mapped to a MIDI note over serial while the note is held.
+
+    One playback thread owns the serial port. handle_message only posts the request and wakes it,
+    so switching videos never waits for the previous one to finish a frame or be joined. The first
+    frame of every mapped video is decoded up front and written as soon as the note arrives, the
+    capture is opened after that. Note to first byte written is recorded per note on and off.
+
+    Clips are decoded at panel size into a ClipCache keyed by file, so notes sharing a file share
+    one copy, up front with preload() or on first use: a clip that is switched away from before it
+    ends finishes decoding in the background. Cached clips play straight from RAM.
+    """
+
+    def __init__(self, ser, video_files=video_files, video_folder=video_folder, width=40, height=96, framed=False,
+                 cache_bytes=256 * 1024 * 1024):
+        self.ser = ser
+        self.video_files = video_files
+        self.video_folder = video_folder
+        self.width = width
+        self.height = height
+        self.encoder = FrameEncoder() if framed else None  # Sync header, sequence number and CRC (see framing.py)
+        self.note_on_latency = LatencyHistogram('note on -> first byte')
+        self.note_off_latency = LatencyHistogram('note off -> first byte')
+        self.cache = ClipCache(cache_bytes)
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.loading = {}    # Path -> future of each clip being finished in the background
+
+        # Latest request from the MIDI side, (kind, note, note time), picked up between frames
+        self.current_note = None
+        self.request = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+
+        self.first_frames = {}
+        for note in video_files:
+            cap = cv2.VideoCapture(self.video_path(note))
+            frame = self.read_frame(cap)
+            cap.release()
+            if frame is not None:
+                self.first_frames[note] = frame
+
+        self.thread = threading.Thread(target=self._playback_loop, daemon=True)
+        self.thread.start()
+
+    def video_path(self, note):
+        return os.path.join(self.video_folder, self.video_files[note])
+
+    def read_frame(self, cap):
         ret, frame = cap.read()
         if not ret:
-            break
-
-        frame = cv2.resize(frame, (32, 16))
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        led_data = frame_rgb.reshape((-1, 3)).flatten().tobytes()
+            return None
+        frame = cv2.resize(frame, (self.width, self.height))
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).tobytes()
 
-        ser.write(led_data)
-        ser.flush()
+    def write_frame(self, led_data):
+        if self.encoder:
+            led_data = self.encoder.encode(led_data)
+        written = time.perf_counter()
+        self.ser.write(led_data)
+        self.ser.flush()
+        return written
 
-        time.sleep(frame_delay)
+    def clear_led_panel(self):
+        # Create a black frame
+        black_frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        written = self.write_frame(black_frame.tobytes())
+        print("LED panel cleared")
+        return written
 
-    cap.release()
-    print("Video playback stopped")
+    def _post(self, request):
+        with self.lock:
+            self.request = request
+        self.wake.set()
 
-def handle_midi():
-    global video_playing, current_video_thread, current_note
-    for msg in midi_port.iter_pending():
-        print(msg)
-        if msg.type == 'note_on':
-            if msg.note in video_files:
-                # Stop current video if playing
-                if video_playing:
-                    video_playing = False
-                    if current_video_thread:
-                        current_video_thread.join()
-
-                # Start new video
+    def handle_message(self, msg, received=None):
+        """Dispatch a MIDI message, `received` is its arrival time (perf_counter) if known"""
+        received = time.perf_counter() if received is None else received
+        if msg.type == 'note_on' and msg.velocity > 0:
+            if msg.note in self.video_files:
+                self.current_note = msg.note
+                self._post(('start', msg.note, received))
                 print(f"Starting video for note {msg.note}")
-                video_path = os.path.join(video_folder, video_files[msg.note])
-                video_playing = True
-                current_note = msg.note
-                current_video_thread = threading.Thread(target=play_video, args=(video_path,), daemon=True)
-                current_video_thread.start()
-
-        elif msg.type == 'note_off':
-            if msg.note == current_note:
+        elif msg.type in ('note_on', 'note_off'):
+            if msg.note == self.current_note:
+                self.current_note = None
+                self._post(('stop', msg.note, received))
                 print(f"Stopping video for note {msg.note}")
-                video_playing = False
-                if current_video_thread:
-                    current_video_thread.join()
-                current_note = None
-                clear_led_panel()
-
-try:
-    print("Waiting for MIDI messages...")
-    while True:
-        handle_midi()
-        time.sleep(0.001)  # Small delay to prevent CPU overuse
-except KeyboardInterrupt:
-    pass
-finally:
-    video_playing = False
-    if current_video_thread:
-        current_video_thread.join()
-    clear_led_panel()
-    ser.close()
-    midi_port.close()
+        print(msg)
+
+    def preload(self):
+        """Decode every mapped video into the cache"""
+        for path in dict.fromkeys(map(self.video_path, self.video_files)):
+            if path in self.cache:
+                continue
+            cap = cv2.VideoCapture(path)
+            for _ in self._decode(path, cap, None, cap.get(cv2.CAP_PROP_FPS) or 30):
+                pass
+        print(self.cache.summary())
+
+    def _cache_limit(self):
+        # Most panel-size frames a clip can have and still be cached
+        return self.cache.budget_bytes // (self.height * self.width * 3)
+
+    @staticmethod
+    def _frame_count(cap):
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0))
+
+    def _fits(self, cap):
+        # Whether the capture's clip could be cached, as far as its reported frame count tells
+        return 0 < self._cache_limit() and self._frame_count(cap) <= self._cache_limit()
+
+    def _decode(self, path, cap, first, fps, cache=True):
+        # Yields frames from the capture. With `cache` they are kept in an array sized from the frame
+        # count and the clip is cached under its path once it has been read, unless it outgrows the
+        # cache budget: then keeping stops for good and the frames are only yielded
+        shape = (self.height, self.width, 3)
+        limit = self._cache_limit()
+        clip = None
+        if cache and self._fits(cap):
+            clip = np.empty((self._frame_count(cap) or min(64, limit),) + shape, dtype=np.uint8)
+        n = 0
+
+        def keep(frame):
+            nonlocal clip, n
+            if clip is None:
+                return
+            if n == len(clip):
+                # More frames than the capture reported, grow within the budget
+                if n >= limit:
+                    clip = None
+                    return
+                clip = np.concatenate([clip, np.empty((min(n, limit - n),) + shape, dtype=np.uint8)])
+            clip[n] = np.frombuffer(frame, dtype=np.uint8).reshape(shape)
+            n += 1
+
+        try:
+            if first is not None:
+                keep(first)
+            while True:
+                frame = self.read_frame(cap)
+                if frame is None:
+                    break
+                keep(frame)
+                yield frame
+            if clip is not None and n:
+                self.cache.put(path, clip if n == len(clip) else clip[:n].copy(), fps)
+        finally:
+            cap.release()
+
+    def _finish(self, source):
+        for _ in source:
+            if self.closed:
+                break
+        source.close()
+
+    def _stop_source(self, source, decoding):
+        # A clip still decoding from a capture is finished in the background so it ends up cached,
+        # `decoding` is its path. The load stays in self.loading until it is done
+        if decoding:
+            with self.lock:
+                self.loading[decoding] = future = self.loader.submit(self._finish, source)
+            future.add_done_callback(lambda _: self._loaded(decoding, future))
+        else:
+            source.close()
+        print("Video playback stopped")
+
+    def _loaded(self, path, future):
+        with self.lock:
+            if self.loading.get(path) is future:
+                del self.loading[path]
+
+    def _start(self, note, received):
+        path = self.video_path(note)
+        with self.lock:
+            loading = self.loading.get(path)
+        if loading is not None and path not in self.cache:
+            # Another note on the same file is still loading it in the background. Its first frame
+            # goes out now, and the rest plays from the cache if the load is done within a frame
+            first = self.first_frames.get(note)
+            if first is not None:
+                self.note_on_latency.add((self.write_frame(first) - received) * 1000)
+                received = None
+            try:
+                loading.result(timeout=1 / 30)
+            except TimeoutError:
+                pass
+        else:
+            first = None
+
+        clip = self.cache.get(path)
+        if clip is not None:
+            # Whole clip in RAM
+            frames, fps = clip
+            if received is not None:
+                self.note_on_latency.add((self.write_frame(frames[0].tobytes()) - received) * 1000)
+            print(f"Video: {path} from cache, {len(frames)} frames, FPS: {fps}")
+            return (frame.tobytes() for frame in frames[1:]), 1 / fps, False, None
+
+        # Preloaded first frame straight away, then open the capture and skip past it
+        if received is not None:
+            first = self.first_frames.get(note)
+            if first is not None:
+                self.note_on_latency.add((self.write_frame(first) - received) * 1000)
+
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        # Handle case where fps is 0, very low, or invalid
+        if fps <= 0 or not fps:
+            print(f"Warning: Invalid FPS ({fps}) detected. Using default.")
+            fps = 30
+        print(f"Video: {path}, FPS: {fps}, Frame delay: {1 / fps}")
+        if first is not None:
+            cap.grab()
+        # A file already loading in the background is only played, not decoded into the cache again.
+        # Only a clip that can be cached is worth finishing in the background when switched away
+        cache = loading is None and self._fits(cap)
+        return self._decode(path, cap, first, fps, cache), 1 / fps, first is None, path if cache else None
+
+    def _playback_loop(self):
+        source = None     # Iterator over the frames still to send
+        decoding = None   # Path of the clip source is decoding into the cache, if it is
+        pending = None    # Note time still waiting for its first frame when nothing was preloaded
+        frame_delay = 1 / 30
+        next_frame = 0.0
+        while not self.closed:
+            self.wake.clear()
+            with self.lock:
+                request, self.request = self.request, None
+
+            if request is not None:
+                kind, note, received = request
+                if source is not None:
+                    self._stop_source(source, decoding)
+                    source = None
+                if kind == 'stop':
+                    self.note_off_latency.add((self.clear_led_panel() - received) * 1000)
+                    continue
+                source, frame_delay, needs_first, decoding = self._start(note, received)
+                pending = received if needs_first else None
+                next_frame = time.perf_counter() + (0 if needs_first else frame_delay)
+
+            if source is None:
+                self.wake.wait()
+                continue
+
+            # Sleep until the next frame is due, waking early for a new note
+            if self.wake.wait(max(0.0, next_frame - time.perf_counter())):
+                continue
+
+            frame = next(source, None)
+            if frame is None:
+                source = None
+                print("Video playback stopped")
+                continue
+            written = self.write_frame(frame)
+            if pending is not None:
+                self.note_on_latency.add((written - pending) * 1000)
+                pending = None
+
+            # Frame deadlines come from one schedule, a late frame doesn't push the rest back
+            next_frame = max(next_frame + frame_delay, time.perf_counter() - frame_delay)
+
+        if source is not None:
+            source.close()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.loader.shutdown(wait=True)
+
+def run(player, midi_port_name):
+    # Messages arrive on mido's callback thread and go straight to the player, no polling
+    midi_port = mido.open_input(midi_port_name, callback=lambda msg: player.handle_message(msg, time.perf_counter()))
+    stop = threading.Event()
+    try:
+        print("Waiting for MIDI messages...")
+        while not stop.wait(0.5):  # Wakes periodically only so Ctrl-C is seen on every platform
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        midi_port.close()
+        player.close()
+        player.clear_led_panel()
+        print(player.note_on_latency.format())
+        print(player.note_off_latency.format())
+        print(player.cache.summary())
+
+def main():
+    parser = argparse.ArgumentParser(description='Play videos over serial, triggered by MIDI notes')
+    parser.add_argument('--port', default='COM7', help="Serial port, must match your Teensy's port")
+    parser.add_argument('--baud', type=int, default=2000000, help='Baud rate')
+    parser.add_argument('--midi-port', default='port0 1', help='MIDI input port name')
+    parser.add_argument('--framed', action='store_true', help='Wrap frames with sync header, sequence number and CRC')
+    parser.add_argument('--cache-mb', type=float, default=256, help='Memory budget for decoded clips')
+    parser.add_argument('--preload', action='store_true', help='Decode every mapped video at startup instead of on first use')
+    args = parser.parse_args()
+
+    # Configure the serial port
+    ser = serial.Serial(args.port, args.baud)
+    print(mido.get_input_names())
+
+    try:
+        player = VideoPlayer(ser, framed=args.framed, cache_bytes=int(args.cache_mb * 1024 * 1024))
+        if args.preload:
+            player.preload()
+        run(player, args.midi_port)
+    finally:
+        ser.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import serial
 import time
 import numpy as np
 
+from framing import FrameEncoder
+
 def create_test_pattern(width, height, frame_count):
     # Create a more interesting test pattern
     frame = np.zeros((height, width, 3), dtype=np.uint8)
@@ -18,7 +20,7 @@ def create_test_pattern(width, height, frame_count):
 
     return frame
 
-def test_stream(port='/dev/cu.usbmodem144533101', baud_rate=2000000):
+def test_stream(port='/dev/cu.usbmodem144533101', baud_rate=2000000, framed=False):
     print(f"Opening serial port {port} at {baud_rate} baud...")
     ser = serial.Serial(port, baud_rate)
     time.sleep(2)
@@ -28,6 +30,7 @@ def test_stream(port='/dev/cu.usbmodem144533101', baud_rate=2000000):
     chunk_size = 1024
     target_fps = 30
     frame_time = 1.0 / target_fps
+    encoder = FrameEncoder() if framed else None
 
     print(f"Streaming {width}x{height} @ {target_fps}fps")
     frame_count = 0
@@ -43,6 +46,8 @@ def test_stream(port='/dev/cu.usbmodem144533101', baud_rate=2000000):
 
             # Convert and send frame
             frame_bytes = frame.tobytes()
+            if encoder:
+                frame_bytes = encoder.encode(frame_bytes)
             for i in range(0, len(frame_bytes), chunk_size):
                 chunk = frame_bytes[i:i + chunk_size]
                 ser.write(chunk)
@@ -1,87 +1,176 @@
 import serial
 import time
 import argparse
-
-def stream_bin_file(filename, port='/dev/cu.usbmodem144533101', baud_rate=2000000):
+import mmap
+
+from frame_clock import FrameClock
+from framing import FrameEncoder
+from delta import DeltaEncoder
+
+FRAME_SIZE = 40 * 96 * 3  # width * height * RGB
+CHUNK_SIZE = 1024  # Send in 1KB chunks
+
+class BinVideo:
+    """Memory-mapped .bin clip, frames are zero-copy memoryview slices with O(1) random access"""
+
+    def __init__(self, filename, frame_size=FRAME_SIZE):
+        self.frame_size = frame_size
+        self.file = open(filename, 'rb')
+        self.file_size = self.file.seek(0, 2)
+        self.total_frames = self.file_size // frame_size
+        if self.total_frames == 0:
+            self.file.close()
+            raise ValueError(f"{filename} is smaller than one frame ({frame_size} bytes)")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+    def frame(self, index):
+        start = (index % self.total_frames) * self.frame_size
+        return self.view[start:start + self.frame_size]
+
+    def close(self):
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # A frame view is still referenced (e.g. by the traceback of an interrupted send),
+            # the map is released when that view is collected
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReadVideo:
+    """Same interface as BinVideo but reads each frame with a file read (seeking only on jumps)"""
+
+    def __init__(self, filename, frame_size=FRAME_SIZE):
+        self.frame_size = frame_size
+        self.file = open(filename, 'rb')
+        self.file_size = self.file.seek(0, 2)
+        self.total_frames = self.file_size // frame_size
+        if self.total_frames == 0:
+            self.file.close()
+            raise ValueError(f"{filename} is smaller than one frame ({frame_size} bytes)")
+        self.file.seek(0)
+        self.next_index = 0
+
+    def frame(self, index):
+        index %= self.total_frames
+        if index != self.next_index:
+            self.file.seek(index * self.frame_size)
+        self.next_index = index + 1
+        return self.file.read(self.frame_size)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def send_frame(ser, frame_data, chunk_size=CHUNK_SIZE):
+    # Send frame in chunks
+    for i in range(0, len(frame_data), chunk_size):
+        ser.write(frame_data[i:i + chunk_size])
+        time.sleep(0.001)  # Small delay between chunks
+
+def stream_frames(video, ser, fps=30, start_frame=0, send_fps=None, framed=False, delta=False, duration=None):
+    """
+    Play `video` at `fps` source frames per second, sending at `send_fps` (defaults to fps).
+    Which frame goes out is derived from the wall clock, so frames are dropped when
+    sending falls behind and repeated when send_fps is higher than fps.
+    With framed=True every frame is wrapped in the framing.py header and CRC, delta=True
+    additionally sends only changed pixel runs between periodic keyframes (implies framed).
+    Runs until interrupted, or for `duration` seconds.
+    """
+    clock = FrameClock(send_fps or fps)
+    encoder = FrameEncoder() if framed or delta else None
+    delta_encoder = DeltaEncoder() if delta else None
+    print(f"File size: {video.file_size} bytes")
+    print(f"Frame size: {video.frame_size} bytes")
+    print(f"Total frames: {video.total_frames}")
+    print(f"Starting stream at frame {start_frame % video.total_frames}, {fps} fps...")
+
+    frame_count = 0
+    repeated = 0
+    last_index = None
+    clock.start()
+    fps_timer = clock.start_time
+
+    while duration is None or time.perf_counter() - clock.start_time < duration:
+        tick = clock.wait_next()
+        frame_index = (start_frame + clock.source_frame(tick, fps)) % video.total_frames
+        if frame_index == last_index:
+            repeated += 1
+        last_index = frame_index
+
+        frame_data = video.frame(frame_index)
+        if delta_encoder:
+            frame_type, payload = delta_encoder.encode(frame_data)
+            frame_data = encoder.encode(payload, frame_type)
+        elif encoder:
+            frame_data = encoder.encode(frame_data)
+        send_frame(ser, frame_data)
+        frame_count += 1
+
+        # FPS and timing report
+        current_time = time.perf_counter()
+        if current_time - fps_timer >= 1.0:
+            sent_fps = frame_count / (current_time - fps_timer)
+            print(f"FPS: {sent_fps:.2f} | frame {frame_index} | dropped {clock.dropped} | "
+                  f"repeated {repeated} | {clock.jitter_summary()}")
+            clock.reset_stats()
+            frame_count = 0
+            repeated = 0
+            fps_timer = current_time
+
+def stream_bin_file(filename, port='/dev/cu.usbmodem144533101', baud_rate=2000000, fps=30,
+                    use_mmap=True, start_frame=0, send_fps=None, framed=False, delta=False):
     # Open serial connection
     print(f"Opening serial port {port} at {baud_rate} baud...")
     ser = serial.Serial(port, baud_rate)
     time.sleep(2)
     print("Serial connection established")
 
-    # Open binary file
-    print(f"Opening binary file: {filename}")
-    with open(filename, 'rb') as f:
-        # Get file size
-        f.seek(0, 2)  # Seek to end
-        file_size = f.tell()
-        f.seek(0)  # Back to start
-
-        frame_size = 40 * 96 * 3  # width * height * RGB
-        total_frames = file_size // frame_size
-
-        print(f"File size: {file_size} bytes")
-        print(f"Frame size: {frame_size} bytes")
-        print(f"Total frames: {total_frames}")
-
-        chunk_size = 1024  # Send in 1KB chunks
-        frame_count = 0
-        target_fps = 30
-        frame_time = 1.0 / target_fps
-
-        print("Starting stream...")
-        last_time = time.time()
-        fps_timer = time.time()
-
-        try:
-            while True:
-                current_time = time.time()
-
-                # Read one frame
-                frame_data = f.read(frame_size)
-                if not frame_data or len(frame_data) < frame_size:
-                    print("Reached end of file, rewinding...")
-                    f.seek(0)
-                    frame_data = f.read(frame_size)
-
-                # Send frame in chunks
-                for i in range(0, len(frame_data), chunk_size):
-                    chunk = frame_data[i:i + chunk_size]
-                    ser.write(chunk)
-                    time.sleep(0.001)  # Small delay between chunks
-
-                frame_count += 1
-
-                # FPS calculation and display
-                if current_time - fps_timer >= 1.0:
-                    fps = frame_count / (current_time - fps_timer)
-                    print(f"FPS: {fps:.1f}")
-                    frame_count = 0
-                    fps_timer = current_time
-
-                # Frame rate control
-                elapsed = time.time() - last_time
-                if elapsed < frame_time:
-                    time.sleep(frame_time - elapsed)
-                last_time = time.time()
-
-        except KeyboardInterrupt:
-            print("\nStream stopped by user")
-        except Exception as e:
-            print(f"Error: {str(e)}")
-        finally:
-            ser.close()
-            print("Stream ended")
+    try:
+        if use_mmap:
+            print(f"Mapping binary file: {filename}")
+            video = BinVideo(filename)
+        else:
+            print(f"Opening binary file: {filename}")
+            video = ReadVideo(filename)
+        with video:
+            stream_frames(video, ser, fps, start_frame, send_fps, framed, delta)
+    except KeyboardInterrupt:
+        print("\nStream stopped by user")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+    finally:
+        ser.close()
+        print("Stream ended")
 
 def main():
     parser = argparse.ArgumentParser(description='Stream binary video file to LED panel')
     parser.add_argument('file', help='Binary file to stream')
     parser.add_argument('--port', default='/dev/cu.usbmodem144533101', help='Serial port')
     parser.add_argument('--baud', type=int, default=2000000, help='Baud rate')
-    parser.add_argument('--fps', type=int, default=30, help='Target FPS')
+    parser.add_argument('--fps', type=float, default=30, help='Clip frame rate, fractional rates such as 29.97 are allowed')
+    parser.add_argument('--send-fps', type=float, default=None, help='Rate frames are sent at (default: same as --fps)')
+    parser.add_argument('--start', type=int, default=0, help='Frame index to start playback from')
+    parser.add_argument('--no-mmap', action='store_true', help='Read frames with file reads instead of a memory map')
+    parser.add_argument('--framed', action='store_true', help='Wrap frames with sync header, sequence number and CRC')
+    parser.add_argument('--delta', action='store_true', help='Send only changed pixel runs with periodic keyframes (implies --framed)')
     args = parser.parse_args()
 
-    stream_bin_file(args.file, args.port, args.baud)
+    stream_bin_file(args.file, args.port, args.baud, fps=args.fps, use_mmap=not args.no_mmap,
+                    start_frame=args.start, send_fps=args.send_fps, framed=args.framed,
+                    delta=args.delta)
 
 if __name__ == "__main__":
     main()
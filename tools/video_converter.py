@@ -2,17 +2,86 @@ import cv2
 import numpy as np
 import os
 import argparse
-
-BRIGHTNESS_THRESHOLD = 0.05
-
-def convert_video(input_file, output_name=None):
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from clip_format import FORMATS, open_writer
+from pipeline import load_pipeline
+
+# One pipeline per thread, CLAHE objects are not safe to share between pipelined workers
+_local = threading.local()
+
+def get_pipeline(hsv=None):
+    pipelines = _local.__dict__.setdefault('pipelines', {})
+    if hsv not in pipelines:
+        # Crop to the LED aspect ratio, RGB, CLAHE, contrast 1.2 / brightness -10, 5% black threshold,
+        # optionally the firmware HSV adjustment baked in
+        pipelines[hsv] = load_pipeline('video', hsv)
+    return pipelines[hsv]
+
+def process_frame(frame, hsv=None):
+    """Crop a decoded BGR frame to the LED aspect ratio and enhance it, returns 96x40 RGB."""
+    return get_pipeline(hsv).run(frame)
+
+def process_chunk(frames, hsv=None):
+    # The whole chunk goes through the pipeline as one batch
+    return list(get_pipeline(hsv).run_batch(frames))
+
+def read_frames(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+
+def read_chunks(cap, chunk_size, chunks):
+    # Decode thread: hand frames to the pool in chunks, None marks the end
+    try:
+        chunk = []
+        for frame in read_frames(cap):
+            chunk.append(frame)
+            if len(chunk) == chunk_size:
+                chunks.put(chunk)
+                chunk = []
+        if chunk:
+            chunks.put(chunk)
+    finally:
+        chunks.put(None)
+
+def process_pipelined(cap, workers, chunk_size=16, hsv=None):
+    """
+    Decode on a background thread while a pool of threads enhances chunks of frames
+    (OpenCV releases the GIL), yielding processed frames in their original order.
+    """
+    chunks = queue.Queue(maxsize=workers * 2)
+    reader = threading.Thread(target=read_chunks, args=(cap, chunk_size, chunks), daemon=True)
+    reader.start()
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            pending.append(pool.submit(process_chunk, chunk, hsv))
+            # Keep a bounded number of chunks in flight, emit the oldest first to preserve order
+            while len(pending) > workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    reader.join()
+
+def convert_video(input_file, output_name=None, fmt='raw', output_dir="../media", workers=0, hsv=None):
     # Check if input file exists
     if not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' not found")
         return
 
     # Create output directory if it doesn't exist
-    output_dir = "../media"
     os.makedirs(output_dir, exist_ok=True)
 
     # If no output name specified, use input filename without extension
@@ -26,92 +95,24 @@ def convert_video(input_file, output_name=None):
         return
 
     # Get video properties
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30   # Fractional rates are kept, the .rle header stores fps * 100
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    # Create binary output file
-    binary_output = open(os.path.join(output_dir, f'{output_name}.bin'), 'wb')
-
-    def adjust_contrast_brightness(image, contrast=1.0, brightness=0):
-        return cv2.addWeighted(image, contrast, image, 0, brightness)
+    # Create binary output file (raw .bin or compressed .rle)
+    output_path = os.path.join(output_dir, output_name + FORMATS[fmt][0])
+    binary_output = open_writer(os.path.join(output_dir, output_name), fmt, fps=fps)
 
-    def apply_black_threshold(image, brightness_threshold=0.2):
-        # Convert to HSV for better brightness handling
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
-        # Normalize V channel to 0-1 range
-        v_channel = hsv[:, :, 2].astype(float) / 255
-
-        # Create mask where brightness is below threshold
-        dark_mask = v_channel < brightness_threshold
-
-        # Create output array
-        output = image.copy()
-        # Set all channels to 0 where mask is True
-        output[dark_mask] = 0
-
-        return output
+    # Serial path processes each frame as it is decoded, pipelined path overlaps the two
+    if workers > 0:
+        frames = process_pipelined(cap, workers, hsv=hsv)
+    else:
+        frames = (process_frame(frame, hsv) for frame in read_frames(cap))
 
     # Process each frame
     frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Resize frame to match LED display aspect ratio first
-        height, width = frame.shape[:2]
-        target_height = 96
-        target_width = 40
-
-        # Calculate resize dimensions maintaining aspect ratio
-        aspect_ratio = width / height
-        target_aspect = target_width / target_height
-
-        if aspect_ratio > target_aspect:
-            # Video is wider than target, fit to height
-            resize_height = target_height
-            resize_width = int(resize_height * aspect_ratio)
-        else:
-            # Video is taller than target, fit to width
-            resize_width = target_width
-            resize_height = int(resize_width / aspect_ratio)
-
-        # Resize frame
-        resized = cv2.resize(frame, (resize_width, resize_height))
-
-        # Crop to exact dimensions
-        y_start = (resize_height - target_height) // 2
-        x_start = (resize_width - target_width) // 2
-        cropped = resized[y_start:y_start+target_height, x_start:x_start+target_width]
-
-        # Ensure exact dimensions with final resize if needed
-        final = cv2.resize(cropped, (target_width, target_height))
-
-        # Convert to RGB for LED display
-        frame_rgb = cv2.cvtColor(final, cv2.COLOR_BGR2RGB)
-
-        # Enhance image
-        lab = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2LAB)
-        l, a, b = cv2.split(lab)
-
-        # Apply CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2,2))
-        cl = clahe.apply(l)
-
-        # Merge channels
-        limg = cv2.merge((cl,a,b))
-
-        # Convert back to RGB
-        enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2RGB)
-
-        # Adjust contrast and brightness
-        adjusted = adjust_contrast_brightness(enhanced, contrast=1.2, brightness=-10)
-
-        # Apply brightness-based black threshold
-        final = apply_black_threshold(adjusted, brightness_threshold=BRIGHTNESS_THRESHOLD)
-
+    for final in frames:
         # Write to binary file
-        binary_output.write(final.astype(np.uint8).tobytes())
+        binary_output.write(final)
 
         # Progress indication
         frame_count += 1
@@ -124,12 +125,52 @@ def convert_video(input_file, output_name=None):
     binary_output.close()
 
     print(f"\nConversion complete!")
-    print(f"Binary file generated: {os.path.join(output_dir, f'{output_name}.bin')}")
+    print(f"Binary file generated: {output_path}")
+
+def benchmark(workers, num_frames=240, width=1920, height=1080):
+    """Compare serial and pipelined conversion of a synthetic clip and check the outputs match."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'synthetic.mp4')
+        out = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), 30, (width, height))
+        for frame in range(num_frames):
+            img = np.zeros((height, width, 3), dtype=np.uint8)
+            cv2.circle(img, (frame * 8 % width, height // 2), height // 4, (0, 128 + frame % 128, 255), -1)
+            cv2.rectangle(img, (width // 3, frame * 4 % height), (width // 2, frame * 4 % height + 200), (255, 64, 0), -1)
+            out.write(img)
+        out.release()
+
+        results = {}
+        for label, worker_count in (('serial', 0), (f'pipelined x{workers}', workers)):
+            start = time.perf_counter()
+            convert_video(source, label.split()[0], output_dir=tmp, workers=worker_count)
+            elapsed = time.perf_counter() - start
+            results[label] = elapsed
+            print(f"{label}: {num_frames / elapsed:.1f} frames/s")
+
+        with open(os.path.join(tmp, 'serial.bin'), 'rb') as a, open(os.path.join(tmp, 'pipelined.bin'), 'rb') as b:
+            identical = a.read() == b.read()
+        serial, pipelined = results.values()
+        print(f"\n{width}x{height}, {num_frames} frames: speedup {serial / pipelined:.2f}x, "
+              f"outputs {'identical' if identical else 'DIFFER'}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Convert video to LED display binary format')
-    parser.add_argument('input', help='Input video file path')
+    parser.add_argument('input', nargs='?', help='Input video file path')
     parser.add_argument('--output', help='Output filename (without extension)', default=None)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='raw',
+                      help='raw .bin frames or compressed .rle clip')
+    parser.add_argument('--workers', type=int, default=0,
+                      help='Enhance frames on this many worker threads while decoding (0 = serial)')
+    parser.add_argument('--hsv', type=int, nargs=3, metavar=('HUE', 'SAT', 'VAL'), default=None,
+                      help='Bake the firmware HSV adjustment (0-255 each) into the frames')
+    parser.add_argument('--benchmark', action='store_true',
+                      help='Compare serial and pipelined conversion on a synthetic clip')
 
     args = parser.parse_args()
-    convert_video(args.input, args.output)
\ No newline at end of file
+    if args.benchmark:
+        benchmark(args.workers or os.cpu_count())
+    elif args.input is None:
+        parser.error('input is required')
+    else:
+        convert_video(args.input, args.output, args.format, workers=args.workers,
+                      hsv=tuple(args.hsv) if args.hsv else None)
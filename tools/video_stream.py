@@ -5,51 +5,79 @@ import numpy as np
 import argparse
 import os
 import warnings
+import queue
+import threading
+
+from frame_clock import FrameClock
+from framing import FrameEncoder
 
 # Suppress macOS camera warnings
 os.environ['OPENCV_VIDEOIO_MACH_NEW_API'] = '0'
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
+class StageTimer:
+    """Accumulates time spent per pipeline stage so the FPS printout shows which stage is the bottleneck"""
+    STAGES = ('decode', 'resize', 'write', 'wait')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = {stage: 0.0 for stage in self.STAGES}
+        self.counts = {stage: 0 for stage in self.STAGES}
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+        self.counts[stage] += 1
+
+    def summary(self):
+        parts = []
+        for stage in self.STAGES:
+            avg = self.totals[stage] / self.counts[stage] if self.counts[stage] else 0.0
+            parts.append(f"{stage} {avg * 1000:.1f}ms")
+        return ' | '.join(parts)
+
 class VideoStreamer:
-    def __init__(self, port='/dev/cu.usbmodem144533101', baud_rate=2000000, width=40, height=96):
+    def __init__(self, port='/dev/cu.usbmodem144533101', baud_rate=2000000, width=40, height=96,
+                 num_buffers=3, chunk_interval=0.001, framed=False, ser=None):
         self.width = width
         self.height = height
         self.frame_size = width * height * 3
         self.chunk_size = 1024  # Send in 1KB chunks
-
-        # Open serial connection
+        self.chunk_interval = chunk_interval  # Minimum spacing between chunk starts
+        self.encoder = FrameEncoder() if framed else None  # Sync header, sequence number and CRC per frame
+
+        # Ring of preallocated frame buffers shared by the decode and writer threads
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(num_buffers)]
+        self.preview_frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.preview_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.timer = StageTimer()
+
+        # Open serial connection, unless an already open port (e.g. fake_teensy.py) is passed in
+        if ser is not None:
+            self.ser = ser
+            return
         print(f"Opening serial port {port} at {baud_rate} baud...")
         self.ser = serial.Serial(port, baud_rate)
         time.sleep(2)  # Wait for connection to establish
         print("Serial connection established")
 
-    def stream_video(self, source):
-        # Open video source (0 for webcam, or file path)
-        print(f"Opening video source: {source}")
-        cap = cv2.VideoCapture(source)
-        if not cap.isOpened():
-            print("Error: Could not open video source")
-            return
-
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        print(f"Video properties - FPS: {fps}, Total frames: {total_frames}")
-
-        target_fps = 30
-        frame_time = 1.0 / target_fps
-
-        print("Starting video stream...")
-        frame_count = 0
-        last_time = time.time()
-        fps_timer = time.time()
-
+    def _decode_loop(self, cap, source):
+        resized = np.empty((self.height, self.width, 3), dtype=np.uint8)
         try:
-            while True:
-                current_time = time.time()
+            while not self.stop_event.is_set():
+                try:
+                    index = self.free_buffers.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                start = time.perf_counter()
                 ret, frame = cap.read()
+                decoded = time.perf_counter()
 
                 if not ret:
+                    self.free_buffers.put(index)
                     if isinstance(source, str):  # If it's a file, rewind
                         print("Reached end of video, rewinding...")
                         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
@@ -58,46 +86,112 @@ class VideoStreamer:
                         print("Failed to read frame from webcam")
                         break
 
-                # Resize to panel dimensions
-                frame = cv2.resize(frame, (self.width, self.height))
-
-                # Convert to RGB
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # Resize to panel dimensions and convert to RGB straight into the ring buffer
+                cv2.resize(frame, (self.width, self.height), dst=resized)
+                cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self.buffers[index])
 
-                # Show preview
-                preview = cv2.resize(frame, (self.width * 4, self.height * 4))
-                cv2.imshow('Preview', preview)
+                self.timer.add('decode', decoded - start)
+                self.timer.add('resize', time.perf_counter() - decoded)
+                self.ready_buffers.put(index)
+        finally:
+            # Wake the writer so it can exit
+            self.ready_buffers.put(None)
 
-                # Send frame in chunks
-                frame_bytes = frame.tobytes()
-                for i in range(0, len(frame_bytes), self.chunk_size):
-                    chunk = frame_bytes[i:i + self.chunk_size]
-                    self.ser.write(chunk)
-                    time.sleep(0.001)  # Small delay between chunks
+    def _write_loop(self, target_fps):
+        clock = FrameClock(target_fps)
+        frame_count = 0
+        clock.start()
+        fps_timer = clock.start_time
+
+        while not self.stop_event.is_set():
+            wait_start = time.perf_counter()
+            index = self.ready_buffers.get()
+            if index is None:
+                break
+
+            # Sleep until this frame's deadline on the shared clock
+            clock.wait_next()
+            frame_start = time.perf_counter()
+            self.timer.add('wait', frame_start - wait_start)
+
+            # Send frame in chunks, each chunk paced against its own deadline
+            frame = self.buffers[index]
+            frame_bytes = memoryview(frame).cast('B')
+            if self.encoder:
+                frame_bytes = self.encoder.encode(frame_bytes)
+            for n, i in enumerate(range(0, len(frame_bytes), self.chunk_size)):
+                delay = frame_start + n * self.chunk_interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self.ser.write(frame_bytes[i:i + self.chunk_size])
+            self.timer.add('write', time.perf_counter() - frame_start)
+
+            with self.preview_lock:
+                np.copyto(self.preview_frame, frame)
+            self.free_buffers.put(index)
+
+            frame_count += 1
+
+            # FPS calculation and display
+            current_time = time.perf_counter()
+            if current_time - fps_timer >= 1.0:
+                fps = frame_count / (current_time - fps_timer)
+                print(f"FPS: {fps:.1f} | {self.timer.summary()} | dropped {clock.dropped} | {clock.jitter_summary()}")
+                self.timer.reset()
+                clock.reset_stats()
+                frame_count = 0
+                fps_timer = current_time
+
+        self.stop_event.set()
+
+    def stream_video(self, source, target_fps=30, preview=True, duration=None):
+        # Open video source (0 for webcam, or file path)
+        print(f"Opening video source: {source}")
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print("Error: Could not open video source")
+            return
 
-                frame_count += 1
+        # Get video properties
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        print(f"Video properties - FPS: {fps}, Total frames: {total_frames}")
 
-                # FPS calculation and display
-                if current_time - fps_timer >= 1.0:
-                    fps = frame_count / (current_time - fps_timer)
-                    print(f"FPS: {fps:.1f}")
-                    frame_count = 0
-                    fps_timer = current_time
+        print("Starting video stream...")
+        self.stop_event.clear()
+        self.free_buffers = queue.Queue()
+        self.ready_buffers = queue.Queue()
+        for index in range(len(self.buffers)):
+            self.free_buffers.put(index)
+
+        # Decode and serial transmission run on their own threads so they overlap
+        decoder = threading.Thread(target=self._decode_loop, args=(cap, source), daemon=True)
+        writer = threading.Thread(target=self._write_loop, args=(target_fps,), daemon=True)
+        decoder.start()
+        writer.start()
 
-                # Frame rate control
-                elapsed = time.time() - last_time
-                if elapsed < frame_time:
-                    time.sleep(frame_time - elapsed)
-                last_time = time.time()
+        try:
+            if not preview:
+                # Headless, stream until the writer stops or duration runs out
+                self.stop_event.wait(duration)
+            # GUI stays on the main thread (required on macOS)
+            while preview and not self.stop_event.is_set():
+                with self.preview_lock:
+                    preview = cv2.resize(self.preview_frame, (self.width * 4, self.height * 4))
+                cv2.imshow('Preview', preview)
 
                 # Check for quit command
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                if cv2.waitKey(int(1000 / target_fps)) & 0xFF == ord('q'):
                     print("Quit command received")
                     break
 
         finally:
+            self.stop_event.set()
+            decoder.join()
+            writer.join()
             cap.release()
-            cv2.destroyAllWindows()
+            if preview:
+                cv2.destroyAllWindows()
             self.ser.close()
             print("Stream ended")
 
@@ -106,6 +200,10 @@ def main():
     parser.add_argument('--port', default='/dev/cu.usbmodem144533101', help='Serial port')
     parser.add_argument('--source', default='0', help='Video source (0 for webcam, or path to video file)')
     parser.add_argument('--baud', type=int, default=2000000, help='Baud rate')
+    parser.add_argument('--fps', type=float, default=30, help='Target FPS')
+    parser.add_argument('--buffers', type=int, default=3, help='Number of frames decoded ahead of the serial writer')
+    parser.add_argument('--framed', action='store_true', help='Wrap frames with sync header, sequence number and CRC')
+    parser.add_argument('--no-preview', action='store_true', help='Stream without the preview window')
     args = parser.parse_args()
 
     # Convert source to int if it's a webcam index
@@ -113,8 +211,8 @@ def main():
     if isinstance(source, str) and source.isdigit():
         source = int(source)
 
-    streamer = VideoStreamer(port=args.port, baud_rate=args.baud)
-    streamer.stream_video(source)
+    streamer = VideoStreamer(port=args.port, baud_rate=args.baud, num_buffers=args.buffers, framed=args.framed)
+    streamer.stream_video(source, target_fps=args.fps, preview=not args.no_preview)
 
 if __name__ == "__main__":
     main()